@@ -1,34 +1,40 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import LRUCache
 from app.config import get_settings
 from app.database import get_db
 from app.models import User
-from app.schemas import TokenData
+from app.schemas import CurrentUser, TokenData
 
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a bcrypt hash."""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-
-def get_password_hash(password: str) -> str:
-    """Hash a password using bcrypt."""
+def _password_bytes(password: str) -> bytes:
     # Bcrypt has a 72-byte limit, ensure password is within limit
     password_bytes = password.encode('utf-8')
     if len(password_bytes) > 72:
         password_bytes = password_bytes[:72]
-    
+    return password_bytes
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a bcrypt hash."""
+    return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode('utf-8'))
+
+
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    """Hash a password using bcrypt (BCRYPT_ROUNDS unless `rounds` is given)."""
     # Generate salt and hash
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(_password_bytes(password), salt)
     return hashed.decode('utf-8')
 
 
@@ -43,14 +49,65 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Decoded tokens by signature, and users by token subject. Per process, so
+# changes made by other processes are picked up when entries expire.
+_token_cache = LRUCache(max_entries=settings.AUTH_CACHE_MAX_ENTRIES, ttl_seconds=settings.AUTH_TOKEN_CACHE_TTL_SECONDS)
+_user_cache = LRUCache(max_entries=settings.AUTH_CACHE_MAX_ENTRIES, ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS)
+
+
+def _decode_token(token: str) -> dict:
+    """Verify and decode a JWT, reusing the result for the same token for a few seconds."""
+    if not settings.AUTH_CACHE_ENABLED:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    
+    signing_input, _, signature = token.rpartition(".")
+    cached = _token_cache.get(signature)
+    # A signature only vouches for the header and payload it was issued with
+    if cached is not None and cached[0] == signing_input and cached[1].get("exp", float("inf")) > time.time():
+        return cached[1]
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    _token_cache.set(signature, (signing_input, payload))
+    return payload
+
+
+async def _load_user(db: AsyncSession, username: str, user_id: Optional[int]) -> Optional[CurrentUser]:
+    if user_id is not None:
+        # Tokens issued with a "uid" claim are looked up by primary key
+        user = await db.get(User, user_id)
+        if user is not None and user.username != username:
+            user = None
+    else:
+        user = await db.scalar(select(User).where(User.username == username).limit(1))
+    if user is None:
+        return None
+    current_user = CurrentUser.model_validate(user)
+    # End the read so the connection goes back to the pool; handlers such
+    # as generation may not touch the database again for a long time
+    await db.rollback()
+    return current_user
+
+
+def invalidate_cached_user(username: str):
+    """Forget a cached user so the next request reloads it from the database."""
+    _user_cache.delete(username)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    usernames = {target.username, *inspect(target).attrs.username.history.deleted}
+    for username in usernames:
+        invalidate_cached_user(username)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = _decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -58,8 +115,16 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == token_data.username).first()
+    # Cached users skip the database entirely
+    user = _user_cache.get(token_data.username) if settings.AUTH_CACHE_ENABLED else None
     if user is None:
+        user = await _load_user(db, token_data.username, payload.get("uid"))
+        if user is None:
+            raise credentials_exception
+        if settings.AUTH_CACHE_ENABLED:
+            _user_cache.set(token_data.username, user)
+    
+    # The token belongs to an account that has since been replaced
+    if payload.get("uid", user.id) != user.id:
         raise credentials_exception
     return user
-
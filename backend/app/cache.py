@@ -0,0 +1,162 @@
+"""
+Small caching primitives shared by the services.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, List, Optional
+
+# Temp files older than this were left by an abandoned or crashed writer
+STALE_TEMP_SECONDS = 60 * 60
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional per-entry time-to-live.
+
+    Entries beyond `max_entries` are evicted least-recently-used first.
+    A `ttl_seconds` of None keeps entries until they are evicted.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def values(self) -> List[Any]:
+        """Unexpired values, least recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                value for value, expires_at in self._data.values()
+                if expires_at is None or expires_at > now
+            ]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskLRUCache:
+    """Files in one directory, bounded in total size.
+
+    Files are written to a temp file and renamed into place, so readers
+    (including other processes) never see partial files. A file's
+    modification time is bumped when it is read; when the directory grows
+    past `max_bytes`, the least recently used files are evicted first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def file(self, name: str) -> Optional[Path]:
+        """Path of a cached file, or None if it is not cached."""
+        path = self.directory / name
+        try:
+            # The modification time doubles as the LRU timestamp
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def read(self, name: str) -> Optional[bytes]:
+        path = self.file(name)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write(self, name: str, data: bytes) -> Path:
+        tmp_path = self.temp_path()
+        try:
+            tmp_path.write_bytes(data)
+            return self.commit_file(name, tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def temp_path(self) -> Path:
+        """A new empty file in the cache directory to write a cached file into."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        return Path(tmp_path)
+
+    def commit_file(self, name: str, tmp_path: Path) -> Path:
+        """Move a fully written temp_path() file into the cache as `name`."""
+        path = self.directory / name
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def remove(self, pattern: str):
+        """Remove every cached file matching a glob pattern."""
+        for path in self.directory.glob(pattern):
+            path.unlink(missing_ok=True)
+
+    def _evict(self, keep: Path):
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.directory.iterdir():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if not path.is_file():
+                    continue
+                if path.suffix == ".tmp":
+                    if stat.st_mtime < time.time() - STALE_TEMP_SECONDS:
+                        path.unlink(missing_ok=True)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= size
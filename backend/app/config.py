@@ -19,16 +19,96 @@ else:
 class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-this"
     DATABASE_URL: str = "sqlite:///./app.db"
+    # Used by request handlers; derived from DATABASE_URL (aiosqlite/asyncpg) when empty
+    ASYNC_DATABASE_URL: str = ""
     OPENAI_API_KEY: str = ""
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30 * 24 * 60  # 30 days
     
+    # Database connection pool (not used for in-memory SQLite)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_PRE_PING: bool = True  # server databases only
+    DB_POOL_RECYCLE_SECONDS: int = 30 * 60  # -1 keeps connections forever
+    
+    # SQLite only: WAL journal with synchronous=NORMAL, plus these pragmas
+    # Writers queue on one lock and SQLite's busy handler isn't fair: under a
+    # burst of writes a short timeout fails requests with "database is locked"
+    SQLITE_BUSY_TIMEOUT_MS: int = 30000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    
+    # Authentication caches (per process; user changes in other processes show up after the TTL)
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = 5
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Password hashing, off the request threads (see app/password_hasher.py)
+    BCRYPT_ROUNDS: int = 12  # hashes made with another cost are upgraded on login
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16  # queued + running; more is rejected with 503
+    
+    # Login/register throttling (429 with Retry-After once exceeded)
+    AUTH_ATTEMPTS_PER_IP: int = 60  # a classroom often shares one address
+    AUTH_ATTEMPTS_PER_IP_WINDOW_SECONDS: int = 60
+    LOGIN_FAILURES_PER_USERNAME: int = 10
+    LOGIN_FAILURES_PER_USERNAME_WINDOW_SECONDS: int = 15 * 60
+    
     # Generation password to protect API usage
     GENERATION_PASSWORD: str = "change-this-password"
     
     # CORS settings for production
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
 
+    # Maximum number of chapters generated in parallel for one material
+    GENERATION_CONCURRENCY: int = 4
+
+    # Shared async OpenAI HTTP client (connection pool and timeouts in seconds)
+    OPENAI_MAX_CONNECTIONS: int = 200
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0
+    OPENAI_CONNECT_TIMEOUT: float = 10.0
+    OPENAI_READ_TIMEOUT: float = 120.0
+
+    # Background generation jobs (POST /materials/generate/jobs)
+    GENERATION_JOB_WORKERS: int = 2
+    GENERATION_JOB_RETENTION_MINUTES: int = 60
+
+    # Generated chapter cache: "memory", "database" or "none"
+    GENERATION_CACHE_BACKEND: str = "memory"
+    GENERATION_CACHE_MAX_ENTRIES: int = 500
+    GENERATION_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60  # 0 disables expiry
+
+    # Rendered DOCX/PDF exports cached on local disk
+    EXPORT_CACHE_DIR: str = "./export_cache"
+    EXPORT_CACHE_MAX_BYTES: int = 500 * 1024 * 1024
+    # Per-chapter render fragments, kept in EXPORT_CACHE_DIR/fragments
+    EXPORT_FRAGMENTS_ENABLED: bool = True
+    EXPORT_FRAGMENT_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+
+    # Export rendering process pool (0 workers renders in a thread instead)
+    EXPORT_RENDER_WORKERS: int = 2
+    EXPORT_RENDER_MAX_PENDING: int = 20  # queued + running; more is rejected with 503
+    EXPORT_RENDER_TIMEOUT_SECONDS: float = 60.0
+
+    # API response compression (brotli when installed, else gzip)
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # smaller bodies are sent as is
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+
+    # POST /materials/export/bulk
+    BULK_EXPORT_MAX_MATERIALS: int = 50
+
+    # Prometheus metrics at GET /metrics (see app/metrics.py)
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""  # /metrics and /health/db require "Authorization: Bearer <token>"; unset, they are 404
+
+    # Request profiling (see app/profiling.py); off unless PROFILING_TOKEN is set
+    PROFILING_TOKEN: str = ""  # "X-Profile: <token>" profiles a request; /debug/profiles needs it as a bearer token
+    PROFILING_SAMPLE_RATE: float = 0.0  # share of other requests profiled, e.g. 0.01
+    PROFILING_MAX_PROFILES: int = 50  # most recent profiles kept in memory
+
     class Config:
         # Look for .env file in backend directory
         env_file = str(_env_path)
@@ -1,27 +1,123 @@
-from sqlalchemy import create_engine
+"""
+Database engines and sessions.
+
+Request handlers use AsyncSession (aiosqlite for SQLite, asyncpg for
+PostgreSQL) through get_db, so waiting on the database doesn't tie up a
+thread-pool thread. Scripts, background jobs and other code running in
+threads use the sync engine through SessionLocal.
+"""
+from typing import Any, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.config import get_settings
 
 settings = get_settings()
 
+is_sqlite = settings.DATABASE_URL.startswith("sqlite")
+is_sqlite_memory = is_sqlite and make_url(settings.DATABASE_URL).database in (None, "", ":memory:")
+
 # Only use check_same_thread for SQLite, not PostgreSQL
 connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
+if is_sqlite:
     connect_args = {"check_same_thread": False}
 
+# In-memory SQLite uses a single shared connection, not a sized pool
+pool_args = {}
+if not is_sqlite_memory:
+    pool_args = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
 engine = create_engine(
-    settings.DATABASE_URL, connect_args=connect_args
+    settings.DATABASE_URL,
+    connect_args=connect_args,
+    # A local SQLite file can't drop connections; pinging would only cost a query
+    pool_pre_ping=settings.DB_POOL_PRE_PING and not is_sqlite,
+    **pool_args
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers for the URL schemes DATABASE_URL may use
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the async one (sqlite -> aiosqlite, postgresql -> asyncpg)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend} databases; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL),
+    pool_pre_ping=settings.DB_POOL_PRE_PING and not is_sqlite,
+    **pool_args
+)
+# Objects stay usable after commit; reloading expired attributes would need an await
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+if is_sqlite:
+    @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL lets readers run alongside a writer; writers wait for the lock instead of failing."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.close()
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+
+def _pool_stats(pool) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "timeout_seconds": pool.timeout(),
+        })
+    return stats
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Connection pool usage, e.g. to see whether DB_POOL_SIZE/DB_MAX_OVERFLOW are too small.
+    
+    Top-level figures are for the request handlers' (async) pool; "sync" is
+    the pool of background jobs and scripts.
+    """
+    return {**_pool_stats(async_engine.pool), "sync": _pool_stats(engine.pool)}
+
+
+def create_missing_indexes():
+    """Create indexes added to models after their tables already existed.
+
+    create_all() skips existing tables entirely, so new indexes on them
+    would otherwise never be created.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
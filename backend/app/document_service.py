@@ -1,20 +1,140 @@
 """
-Service for exporting materials to DOCX and PDF formats with professional styling.
+Service for exporting materials to DOCX, PDF and HTML formats with professional styling.
 """
+import hashlib
 import io
+import os
 import re
-from typing import Dict, Any, List
+from html import escape
+from types import MappingProxyType
+from typing import Dict, Any, List, BinaryIO, Mapping, Optional
 from docx import Document
 from docx.shared import Pt, Inches, RGBColor, Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from docx.oxml import OxmlElement, parse_xml
+from lxml import etree
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, KeepTogether, Table, TableStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 from reportlab.lib import colors
+from app.cache import DiskLRUCache, LRUCache
+from app.config import get_settings
+from app.profiling import traced
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # Optional: without it PDFs are always rendered in one piece
+    PdfReader = PdfWriter = None
+
+settings = get_settings()
+
+# Bump whenever rendering output changes so cached exports are not reused
+EXPORTER_VERSION = "2"
+
+PARSE_CACHE_MAX_ENTRIES = 256
+
+# Section headings are recognised by keywords anywhere in an upper-cased
+# line. A keyword line's type is the first of these present in it, else
+# 'section'. ROLE decides the type even outside ROLE-PLAY/ROLE PLAY.
+_SECTION_KEYWORDS = [
+    'INTRODUCTION', 'WARM-UP', 'WARM UP', 'VOCABULARY', 'LANGUAGE FOCUS', 'GRAMMAR',
+    'READING TEXT', 'READING:', 'WRITING TASK', 'SPEAKING ACTIVITY', 'REVIEW',
+    'COMMUNICATION PRACTICE', 'SUMMARY', 'REFLECTION', 'GROUP WORK', 'DISCUSSION',
+    'ROLE-PLAY', 'ROLE PLAY', 'DIALOGUE', 'INTERESTING FACTS', 'GAMES', 'EXERCISES'
+]
+_TYPE_PRIORITY = [
+    ('INTRODUCTION', 'introduction'),
+    ('SUMMARY', 'summary'),
+    ('REFLECTION', 'reflection'),
+    ('DIALOGUE', 'dialogue'),
+    ('ROLE', 'roleplay'),
+    ('GROUP WORK', 'group_activity'),
+    ('DISCUSSION', 'group_activity'),
+]
+# Longer atoms first so ROLE-PLAY wins over ROLE at the same position; the
+# lookahead makes finditer report atoms that overlap
+_ATOMS = sorted(set(_SECTION_KEYWORDS) | {'LEARNING OBJECTIVE', 'ROLE'}, key=len, reverse=True)
+_SECTION_ATOMS = re.compile('(?=(' + '|'.join(re.escape(atom) for atom in _ATOMS) + '))')
+_EXERCISE = re.compile(r'EXERCISE(?:\s+\d|:)')
+# Every heading line contains one of these
+_HEADING_MARKERS = ['EXERCISE'] + [
+    atom for atom in _ATOMS
+    if not any(other != atom and other in atom for other in _ATOMS + ['EXERCISE'])
+]
+
+
+def _heading_candidates(content: str) -> set:
+    """Indexes of the lines of `content` that may be section headings.
+
+    str.upper() never adds or removes newlines, so line numbers in the
+    upper-cased text match those of content.split('\n').
+    """
+    upper = content.upper()
+    offsets = []
+    for marker in _HEADING_MARKERS:
+        offset = upper.find(marker)
+        while offset != -1:
+            offsets.append(offset)
+            offset = upper.find(marker, offset + 1)
+    
+    candidates = set()
+    line_number = previous = 0
+    for offset in sorted(offsets):
+        line_number += upper.count('\n', previous, offset)
+        previous = offset
+        candidates.add(line_number)
+    return candidates
+
+
+def _classify_line(line: str):
+    """Section type started by a stripped line, or None for regular content."""
+    line_upper = line.upper()
+    atoms = set(_SECTION_ATOMS.findall(line_upper))
+    if 'LEARNING OBJECTIVE' in atoms:
+        return 'objectives'
+    if _EXERCISE.match(line_upper):
+        return 'exercise'
+    if atoms.isdisjoint(_SECTION_KEYWORDS):
+        return None
+    if 'ROLE-PLAY' in atoms or 'ROLE PLAY' in atoms:
+        atoms.add('ROLE')
+    for atom, section_type in _TYPE_PRIORITY:
+        if atom in atoms:
+            return section_type
+    return 'section'
+
+
+# Heading icons and colours of the HTML export, matching the DOCX/PDF styling
+_HTML_ICONS = {
+    'objectives': '📚',
+    'exercise': '✏️',
+    'introduction': '📘',
+    'summary': '📋',
+    'reflection': '💭',
+    'dialogue': '💬',
+    'roleplay': '🎭',
+    'group_activity': '👥',
+    'section': '📖',
+}
+HTML_STYLES = """
+body { font-family: Calibri, Arial, sans-serif; font-size: 11pt; line-height: 1.15; margin: 2cm; color: #222; }
+h1 { text-align: center; color: #003366; font-size: 24pt; }
+.chapter h2 { background: #4472C4; color: #fff; font-size: 18pt; padding: 8px; }
+.section h3 { font-size: 12pt; padding: 6px 10px; border-left: 3px solid; }
+.section-objectives h3, .section-introduction h3 { background: #D9E2F3; color: #003366; border-color: #4472C4; }
+.section-exercise h3 { background: #E2EFD9; color: #006600; border-color: #70AD47; }
+.section-summary h3 { background: #E1D5E7; color: #660066; border-color: #7030A0; }
+.section-reflection h3 { background: #D5E8D4; color: #006633; border-color: #70AD47; }
+.section-dialogue h3 { background: #FFF2CC; color: #663300; border-color: #FFC000; }
+.section-roleplay h3 { background: #F4CCCC; color: #990000; border-color: #C00000; }
+.section-group_activity h3 { background: #D0E0F0; color: #004C99; border-color: #4F81BD; }
+.section-section h3 { background: #FCE4D6; color: #663300; border-color: #C65911; }
+.instruction { color: #595959; }
+blockquote { margin-left: 0.3in; line-height: 1.2; }
+"""
 
 
 def add_border_to_paragraph(paragraph, color="4472C4", width=2):
@@ -46,81 +166,54 @@ def add_shading_to_paragraph(paragraph, color="E7E6E6"):
 class DocumentExporter:
     """Handles export of generated materials to various formats."""
     
-    def __init__(self):
-        pass
+    def __init__(self, fragment_cache: Optional[DiskLRUCache] = None):
+        self._parse_cache = LRUCache(max_entries=PARSE_CACHE_MAX_ENTRIES)
+        # Rendered chapters, reused when only some chapters changed
+        self.fragment_cache = fragment_cache
+        # Built once and reused by every export
+        self._docx_template = self._build_docx_template()
+        self._pdf_styles = self._build_pdf_styles()
     
     def _parse_content(self, content: str) -> List[Dict]:
         """Parse content into structured sections with styling hints."""
         sections = []
-        lines = content.split('\n')
         current_section = None
+        headings = _heading_candidates(content)
         
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
+        for index, line in enumerate(content.split('\n')):
+            line = line.strip()
             
             # Skip empty lines
             if not line:
-                i += 1
                 continue
             
-            # Detect section types
-            line_upper = line.upper()
-            
-            # Learning Objectives
-            if 'LEARNING OBJECTIVE' in line_upper:
-                if current_section:
-                    sections.append(current_section)
-                current_section = {'type': 'objectives', 'title': line, 'content': []}
-            
-            # Exercises
-            elif re.match(r'EXERCISE\s+\d+', line_upper) or line_upper.startswith('EXERCISE:'):
-                if current_section:
-                    sections.append(current_section)
-                current_section = {'type': 'exercise', 'title': line, 'content': []}
-            
-            # Major sections - Textbook structure
-            elif any(keyword in line_upper for keyword in [
-                'INTRODUCTION', 'WARM-UP', 'WARM UP', 'VOCABULARY', 'LANGUAGE FOCUS', 'GRAMMAR', 
-                'READING TEXT', 'READING:', 'WRITING TASK', 'SPEAKING ACTIVITY', 'REVIEW', 
-                'COMMUNICATION PRACTICE', 'SUMMARY', 'REFLECTION', 'REFLECTION SECTION',
-                'GROUP WORK', 'DISCUSSION', 'DISCUSSION ACTIVITIES', 'ROLE-PLAY', 'ROLE PLAY',
-                'DIALOGUES', 'DIALOGUE', 'INTERESTING FACTS', 'GAMES', 'EXERCISES'
-            ]):
-                if current_section:
-                    sections.append(current_section)
-                # Determine section type for better styling
-                if 'INTRODUCTION' in line_upper:
-                    section_type = 'introduction'
-                elif 'SUMMARY' in line_upper:
-                    section_type = 'summary'
-                elif 'REFLECTION' in line_upper:
-                    section_type = 'reflection'
-                elif 'DIALOGUE' in line_upper:
-                    section_type = 'dialogue'
-                elif 'ROLE' in line_upper:
-                    section_type = 'roleplay'
-                elif 'GROUP WORK' in line_upper or 'DISCUSSION' in line_upper:
-                    section_type = 'group_activity'
-                else:
-                    section_type = 'section'
-                current_section = {'type': section_type, 'title': line, 'content': []}
-            
-            # Regular content
-            else:
+            section_type = _classify_line(line) if index in headings else None
+            if section_type is None:
+                # Regular content
                 if current_section is None:
                     current_section = {'type': 'paragraph', 'content': []}
                 current_section['content'].append(line)
-            
-            i += 1
+            else:
+                if current_section:
+                    sections.append(current_section)
+                current_section = {'type': section_type, 'title': line, 'content': []}
         
         if current_section:
             sections.append(current_section)
         
         return sections
     
-    def export_to_docx(self, material: Dict[str, Any]) -> io.BytesIO:
-        """Export material to beautifully styled DOCX format."""
+    def _parse_chapter(self, content: str) -> List[Dict]:
+        """Cached _parse_content; the returned sections are shared and must not be modified."""
+        key = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        sections = self._parse_cache.get(key)
+        if sections is None:
+            sections = self._parse_content(content)
+            self._parse_cache.set(key, sections)
+        return sections
+    
+    def _build_docx_template(self) -> bytes:
+        """An empty document with the default styles and margins applied."""
         doc = Document()
         
         # Set up default styles
@@ -137,6 +230,252 @@ class DocumentExporter:
             section.left_margin = Cm(2)
             section.right_margin = Cm(2)
         
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        return buffer.getvalue()
+    
+    def _fragment_name(self, fmt: str, chapter: Dict[str, Any], book_title: Optional[str] = None) -> str:
+        """Fragment cache file name: a hash of everything that goes into the fragment."""
+        digest = hashlib.sha256()
+        for part in (fmt, EXPORTER_VERSION, str(chapter['number']), chapter['title'], chapter['content'], book_title or ''):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        extension = 'xml' if fmt == 'docx' else fmt
+        return f"{digest.hexdigest()}.{extension}"
+    
+    def _add_docx_chapter_fragment(self, doc, chapter: Dict[str, Any]):
+        """Append a chapter from its cached body XML, rendering and caching it first if needed."""
+        name = self._fragment_name('docx', chapter)
+        fragment = self.fragment_cache.read(name)
+        if fragment is None:
+            chapter_doc = Document(io.BytesIO(self._docx_template))
+            self._add_docx_chapter(chapter_doc, chapter)
+            chapter_body = chapter_doc.element.body
+            chapter_body.remove(chapter_body.sectPr)
+            fragment = etree.tostring(chapter_body)
+            self.fragment_cache.write(name, fragment)
+        
+        # Every fragment comes from the same template, so its styles and
+        # numbering definitions match those of `doc`
+        body = doc.element.body
+        for element in parse_xml(fragment):
+            body.sectPr.addprevious(element)
+    
+    def _merge_pdf_fragments(self, material: Dict[str, Any], buffer: BinaryIO):
+        """Write the PDF by concatenating per-chapter PDFs, rendering missing ones.
+
+        Chapters start on a new page anyway, so the pages are the same as a
+        single render. The first chapter's fragment also holds the book title.
+        """
+        writer = PdfWriter()
+        for index, chapter in enumerate(material['chapters']):
+            book_title = material['title'] if index == 0 else None
+            name = self._fragment_name('pdf', chapter, book_title)
+            fragment = self.fragment_cache.read(name)
+            if fragment is None:
+                chapter_buffer = io.BytesIO()
+                story = self._pdf_title_story(material) if index == 0 else []
+                story.extend(self._pdf_chapter_story(chapter))
+                self._pdf_document(chapter_buffer).build(story)
+                fragment = chapter_buffer.getvalue()
+                self.fragment_cache.write(name, fragment)
+            writer.append(PdfReader(io.BytesIO(fragment)))
+        writer.write(buffer)
+    
+    def _add_docx_chapter(self, doc, chapter: Dict[str, Any]):
+        """Append one chapter (heading and sections, no page break) to `doc`."""
+        # Chapter heading with blue background
+        chapter_heading = doc.add_heading(
+            f"Chapter {chapter['number']}: {chapter['title']}", 
+            level=1
+        )
+        chapter_heading.runs[0].font.color.rgb = RGBColor(255, 255, 255)
+        chapter_heading.runs[0].font.size = Pt(18)
+        add_shading_to_paragraph(chapter_heading, "4472C4")  # Blue background
+        
+        doc.add_paragraph()
+        
+        # Parse chapter content
+        sections = self._parse_chapter(chapter['content'])
+        
+        for section in sections:
+            section_type = section.get('type', 'paragraph')
+            title = section.get('title', '')
+            content = section.get('content', [])
+        
+            if section_type == 'objectives':
+                # Learning Objectives - in a light blue box
+                p = doc.add_paragraph()
+                run = p.add_run('📚 ' + title)
+                run.font.size = Pt(13)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(0, 51, 102)
+                add_shading_to_paragraph(p, "D9E2F3")  # Light blue
+                add_border_to_paragraph(p, "4472C4", 2)
+        
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line, style='List Bullet')
+                        p.paragraph_format.left_indent = Inches(0.3)
+                doc.add_paragraph()
+        
+            elif section_type == 'exercise':
+                # Exercise - in a colored box
+                p = doc.add_paragraph()
+                run = p.add_run('✏️ ' + title)
+                run.font.size = Pt(12)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(0, 102, 0)
+                add_shading_to_paragraph(p, "E2EFD9")  # Light green
+                add_border_to_paragraph(p, "70AD47", 2)
+        
+                for line in content:
+                    if line:
+                        # Check if it's an instruction line
+                        if any(word in line.lower() for word in ['match', 'fill', 'complete', 'write', 'answer', 'choose']):
+                            p = doc.add_paragraph(line)
+                            run = p.runs[0]
+                            run.font.italic = True
+                            run.font.color.rgb = RGBColor(89, 89, 89)
+                        else:
+                            p = doc.add_paragraph(line)
+        
+                        # Add extra space for answer lines
+                        if '____' in line or 'answer:' in line.lower():
+                            doc.add_paragraph('_' * 60)
+        
+                doc.add_paragraph()
+        
+            elif section_type == 'introduction':
+                # Introduction - prominent section
+                p = doc.add_paragraph()
+                run = p.add_run('📘 ' + title)
+                run.font.size = Pt(14)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(0, 51, 102)
+                add_shading_to_paragraph(p, "D9E2F3")  # Light blue
+                add_border_to_paragraph(p, "4472C4", 2)
+        
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line)
+                        p.paragraph_format.line_spacing = 1.15
+                doc.add_paragraph()
+        
+            elif section_type == 'summary':
+                # Summary - distinct styling
+                p = doc.add_paragraph()
+                run = p.add_run('📋 ' + title)
+                run.font.size = Pt(13)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(102, 0, 102)
+                add_shading_to_paragraph(p, "E1D5E7")  # Light purple
+                add_border_to_paragraph(p, "7030A0", 2)
+        
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line)
+                        p.paragraph_format.line_spacing = 1.15
+                doc.add_paragraph()
+        
+            elif section_type == 'reflection':
+                # Reflection section - thoughtful styling
+                p = doc.add_paragraph()
+                run = p.add_run('💭 ' + title)
+                run.font.size = Pt(13)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(0, 102, 51)
+                add_shading_to_paragraph(p, "D5E8D4")  # Light green
+                add_border_to_paragraph(p, "70AD47", 2)
+        
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line)
+                        p.paragraph_format.line_spacing = 1.15
+                doc.add_paragraph()
+        
+            elif section_type == 'dialogue':
+                # Dialogue - conversational styling
+                p = doc.add_paragraph()
+                run = p.add_run('💬 ' + title)
+                run.font.size = Pt(12)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(102, 51, 0)
+                add_shading_to_paragraph(p, "FFF2CC")  # Light yellow
+                add_border_to_paragraph(p, "FFC000", 2)
+        
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line)
+                        p.paragraph_format.left_indent = Inches(0.3)
+                        p.paragraph_format.line_spacing = 1.2
+                doc.add_paragraph()
+        
+            elif section_type == 'roleplay':
+                # Role-play activity
+                p = doc.add_paragraph()
+                run = p.add_run('🎭 ' + title)
+                run.font.size = Pt(12)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(153, 0, 0)
+                add_shading_to_paragraph(p, "F4CCCC")  # Light red
+                add_border_to_paragraph(p, "C00000", 2)
+        
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line)
+                        p.paragraph_format.line_spacing = 1.15
+                doc.add_paragraph()
+        
+            elif section_type == 'group_activity':
+                # Group work or discussion
+                p = doc.add_paragraph()
+                run = p.add_run('👥 ' + title)
+                run.font.size = Pt(12)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(0, 76, 153)
+                add_shading_to_paragraph(p, "D0E0F0")  # Light blue-gray
+                add_border_to_paragraph(p, "4F81BD", 2)
+        
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line)
+                        p.paragraph_format.line_spacing = 1.15
+                doc.add_paragraph()
+        
+            elif section_type == 'section':
+                # Major section heading - with colored background
+                p = doc.add_paragraph()
+                run = p.add_run('📖 ' + title)
+                run.font.size = Pt(13)
+                run.font.bold = True
+                run.font.color.rgb = RGBColor(102, 51, 0)
+                add_shading_to_paragraph(p, "FCE4D6")  # Light orange
+                add_border_to_paragraph(p, "C65911", 2)
+        
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line)
+                        p.paragraph_format.line_spacing = 1.15
+                doc.add_paragraph()
+        
+            else:
+                # Regular paragraph
+                for line in content:
+                    if line:
+                        p = doc.add_paragraph(line)
+                        p.paragraph_format.line_spacing = 1.15
+    
+
+    @traced("export.docx")
+    def export_to_docx(self, material: Dict[str, Any], output: Optional[BinaryIO] = None) -> BinaryIO:
+        """Export material to beautifully styled DOCX format.
+
+        Writes to `output` (e.g. an open file) when given, else to a new BytesIO.
+        """
+        # Start from the pre-styled template
+        doc = Document(io.BytesIO(self._docx_template))
+        
         # Title with styling
         title = doc.add_heading(material['title'], level=0)
         title.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -149,211 +488,23 @@ class DocumentExporter:
         
         # Process each chapter
         for chapter in material.get('chapters', []):
-            # Chapter heading with blue background
-            chapter_heading = doc.add_heading(
-                f"Chapter {chapter['number']}: {chapter['title']}", 
-                level=1
-            )
-            chapter_heading.runs[0].font.color.rgb = RGBColor(255, 255, 255)
-            chapter_heading.runs[0].font.size = Pt(18)
-            add_shading_to_paragraph(chapter_heading, "4472C4")  # Blue background
-            
-            doc.add_paragraph()
-            
-            # Parse chapter content
-            sections = self._parse_content(chapter['content'])
-            
-            for section in sections:
-                section_type = section.get('type', 'paragraph')
-                title = section.get('title', '')
-                content = section.get('content', [])
-                
-                if section_type == 'objectives':
-                    # Learning Objectives - in a light blue box
-                    p = doc.add_paragraph()
-                    run = p.add_run('📚 ' + title)
-                    run.font.size = Pt(13)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(0, 51, 102)
-                    add_shading_to_paragraph(p, "D9E2F3")  # Light blue
-                    add_border_to_paragraph(p, "4472C4", 2)
-                    
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line, style='List Bullet')
-                            p.paragraph_format.left_indent = Inches(0.3)
-                    doc.add_paragraph()
-                
-                elif section_type == 'exercise':
-                    # Exercise - in a colored box
-                    p = doc.add_paragraph()
-                    run = p.add_run('✏️ ' + title)
-                    run.font.size = Pt(12)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(0, 102, 0)
-                    add_shading_to_paragraph(p, "E2EFD9")  # Light green
-                    add_border_to_paragraph(p, "70AD47", 2)
-                    
-                    for line in content:
-                        if line:
-                            # Check if it's an instruction line
-                            if any(word in line.lower() for word in ['match', 'fill', 'complete', 'write', 'answer', 'choose']):
-                                p = doc.add_paragraph(line)
-                                run = p.runs[0]
-                                run.font.italic = True
-                                run.font.color.rgb = RGBColor(89, 89, 89)
-                            else:
-                                p = doc.add_paragraph(line)
-                            
-                            # Add extra space for answer lines
-                            if '____' in line or 'answer:' in line.lower():
-                                doc.add_paragraph('_' * 60)
-                    
-                    doc.add_paragraph()
-                
-                elif section_type == 'introduction':
-                    # Introduction - prominent section
-                    p = doc.add_paragraph()
-                    run = p.add_run('📘 ' + title)
-                    run.font.size = Pt(14)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(0, 51, 102)
-                    add_shading_to_paragraph(p, "D9E2F3")  # Light blue
-                    add_border_to_paragraph(p, "4472C4", 2)
-                    
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line)
-                            p.paragraph_format.line_spacing = 1.15
-                    doc.add_paragraph()
-                
-                elif section_type == 'summary':
-                    # Summary - distinct styling
-                    p = doc.add_paragraph()
-                    run = p.add_run('📋 ' + title)
-                    run.font.size = Pt(13)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(102, 0, 102)
-                    add_shading_to_paragraph(p, "E1D5E7")  # Light purple
-                    add_border_to_paragraph(p, "7030A0", 2)
-                    
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line)
-                            p.paragraph_format.line_spacing = 1.15
-                    doc.add_paragraph()
-                
-                elif section_type == 'reflection':
-                    # Reflection section - thoughtful styling
-                    p = doc.add_paragraph()
-                    run = p.add_run('💭 ' + title)
-                    run.font.size = Pt(13)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(0, 102, 51)
-                    add_shading_to_paragraph(p, "D5E8D4")  # Light green
-                    add_border_to_paragraph(p, "70AD47", 2)
-                    
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line)
-                            p.paragraph_format.line_spacing = 1.15
-                    doc.add_paragraph()
-                
-                elif section_type == 'dialogue':
-                    # Dialogue - conversational styling
-                    p = doc.add_paragraph()
-                    run = p.add_run('💬 ' + title)
-                    run.font.size = Pt(12)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(102, 51, 0)
-                    add_shading_to_paragraph(p, "FFF2CC")  # Light yellow
-                    add_border_to_paragraph(p, "FFC000", 2)
-                    
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line)
-                            p.paragraph_format.left_indent = Inches(0.3)
-                            p.paragraph_format.line_spacing = 1.2
-                    doc.add_paragraph()
-                
-                elif section_type == 'roleplay':
-                    # Role-play activity
-                    p = doc.add_paragraph()
-                    run = p.add_run('🎭 ' + title)
-                    run.font.size = Pt(12)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(153, 0, 0)
-                    add_shading_to_paragraph(p, "F4CCCC")  # Light red
-                    add_border_to_paragraph(p, "C00000", 2)
-                    
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line)
-                            p.paragraph_format.line_spacing = 1.15
-                    doc.add_paragraph()
-                
-                elif section_type == 'group_activity':
-                    # Group work or discussion
-                    p = doc.add_paragraph()
-                    run = p.add_run('👥 ' + title)
-                    run.font.size = Pt(12)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(0, 76, 153)
-                    add_shading_to_paragraph(p, "D0E0F0")  # Light blue-gray
-                    add_border_to_paragraph(p, "4F81BD", 2)
-                    
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line)
-                            p.paragraph_format.line_spacing = 1.15
-                    doc.add_paragraph()
-                
-                elif section_type == 'section':
-                    # Major section heading - with colored background
-                    p = doc.add_paragraph()
-                    run = p.add_run('📖 ' + title)
-                    run.font.size = Pt(13)
-                    run.font.bold = True
-                    run.font.color.rgb = RGBColor(102, 51, 0)
-                    add_shading_to_paragraph(p, "FCE4D6")  # Light orange
-                    add_border_to_paragraph(p, "C65911", 2)
-                    
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line)
-                            p.paragraph_format.line_spacing = 1.15
-                    doc.add_paragraph()
-                
-                else:
-                    # Regular paragraph
-                    for line in content:
-                        if line:
-                            p = doc.add_paragraph(line)
-                            p.paragraph_format.line_spacing = 1.15
+            if self.fragment_cache is not None:
+                self._add_docx_chapter_fragment(doc, chapter)
+            else:
+                self._add_docx_chapter(doc, chapter)
             
             # Add page break after each chapter except the last
             if chapter != material['chapters'][-1]:
                 doc.add_page_break()
         
-        # Save to BytesIO
-        buffer = io.BytesIO()
+        # Save to the output file, or to BytesIO
+        buffer = output if output is not None else io.BytesIO()
         doc.save(buffer)
         buffer.seek(0)
         return buffer
     
-    def export_to_pdf(self, material: Dict[str, Any]) -> io.BytesIO:
-        """Export material to beautifully styled PDF format."""
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=2*cm,
-            leftMargin=2*cm,
-            topMargin=2*cm,
-            bottomMargin=2*cm,
-        )
-        
-        # Define styles
+    def _build_pdf_styles(self) -> Mapping[str, ParagraphStyle]:
+        """Build the PDF paragraph styles once; they are shared by every export."""
         styles = getSampleStyleSheet()
         
         # Title style
@@ -536,104 +687,177 @@ class DocumentExporter:
             rightIndent=10,
         )
         
-        # Build document content
+        # Dialogue lines are indented body text
+        dialogue_body_style = ParagraphStyle(
+            'DialogueBody',
+            parent=body_style,
+            leftIndent=15,
+        )
+        
+        return MappingProxyType({
+            'title': title_style,
+            'chapter': chapter_style,
+            'section': section_style,
+            'exercise': exercise_style,
+            'objectives': objectives_style,
+            'body': body_style,
+            'dialogue_body': dialogue_body_style,
+            'instruction': instruction_style,
+            'introduction': introduction_style,
+            'summary': summary_style,
+            'reflection': reflection_style,
+            'dialogue': dialogue_style,
+            'roleplay': roleplay_style,
+            'group_activity': group_activity_style,
+        })
+    
+    def _pdf_chapter_story(self, chapter: Dict[str, Any]) -> List:
+        """Flowables for one chapter (heading and sections, no page break)."""
+        # Shared styles; never modify them here
+        styles = self._pdf_styles
+        chapter_style = styles['chapter']
+        section_style = styles['section']
+        exercise_style = styles['exercise']
+        objectives_style = styles['objectives']
+        body_style = styles['body']
+        instruction_style = styles['instruction']
+        introduction_style = styles['introduction']
+        summary_style = styles['summary']
+        reflection_style = styles['reflection']
+        dialogue_style = styles['dialogue']
+        roleplay_style = styles['roleplay']
+        group_activity_style = styles['group_activity']
+        dialogue_body_style = styles['dialogue_body']
+        
         story = []
         
-        # Title
-        story.append(Paragraph(material['title'], title_style))
-        story.append(Spacer(1, 0.3 * inch))
+        # Chapter title
+        chapter_title = f"&nbsp;&nbsp;Chapter {chapter['number']}: {chapter['title']}&nbsp;&nbsp;"
+        story.append(Paragraph(chapter_title, chapter_style))
+        story.append(Spacer(1, 0.15 * inch))
         
-        # Process each chapter
-        for chapter in material.get('chapters', []):
-            # Chapter title
-            chapter_title = f"&nbsp;&nbsp;Chapter {chapter['number']}: {chapter['title']}&nbsp;&nbsp;"
-            story.append(Paragraph(chapter_title, chapter_style))
-            story.append(Spacer(1, 0.15 * inch))
+        # Parse chapter content
+        sections = self._parse_chapter(chapter['content'])
+        
+        for section in sections:
+            section_type = section.get('type', 'paragraph')
+            title = section.get('title', '')
+            content = section.get('content', [])
             
-            # Parse chapter content
-            sections = self._parse_content(chapter['content'])
+            if section_type == 'objectives':
+                story.append(Paragraph(f"&nbsp;&nbsp;📚 {title}&nbsp;&nbsp;", objectives_style))
+                for line in content:
+                    if line:
+                        story.append(Paragraph(f"• {line}", body_style))
+                story.append(Spacer(1, 0.15 * inch))
             
-            for section in sections:
-                section_type = section.get('type', 'paragraph')
-                title = section.get('title', '')
-                content = section.get('content', [])
-                
-                if section_type == 'objectives':
-                    story.append(Paragraph(f"&nbsp;&nbsp;📚 {title}&nbsp;&nbsp;", objectives_style))
-                    for line in content:
-                        if line:
-                            story.append(Paragraph(f"• {line}", body_style))
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                elif section_type == 'exercise':
-                    story.append(Paragraph(f"&nbsp;&nbsp;✏️ {title}&nbsp;&nbsp;", exercise_style))
-                    for line in content:
-                        if line:
-                            if any(word in line.lower() for word in ['match', 'fill', 'complete', 'write', 'answer', 'choose']):
-                                story.append(Paragraph(line, instruction_style))
-                            else:
-                                story.append(Paragraph(line, body_style))
-                            
-                            if '____' in line or 'answer:' in line.lower():
-                                story.append(Spacer(1, 0.2 * inch))
-                                story.append(Paragraph('_' * 70, body_style))
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                elif section_type == 'introduction':
-                    story.append(Paragraph(f"&nbsp;&nbsp;📘 {title}&nbsp;&nbsp;", introduction_style))
-                    for line in content:
-                        if line:
-                            story.append(Paragraph(line, body_style))
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                elif section_type == 'summary':
-                    story.append(Paragraph(f"&nbsp;&nbsp;📋 {title}&nbsp;&nbsp;", summary_style))
-                    for line in content:
-                        if line:
-                            story.append(Paragraph(line, body_style))
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                elif section_type == 'reflection':
-                    story.append(Paragraph(f"&nbsp;&nbsp;💭 {title}&nbsp;&nbsp;", reflection_style))
-                    for line in content:
-                        if line:
-                            story.append(Paragraph(line, body_style))
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                elif section_type == 'dialogue':
-                    story.append(Paragraph(f"&nbsp;&nbsp;💬 {title}&nbsp;&nbsp;", dialogue_style))
-                    for line in content:
-                        if line:
-                            p = Paragraph(line, body_style)
-                            p.style.leftIndent = 15
-                            story.append(p)
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                elif section_type == 'roleplay':
-                    story.append(Paragraph(f"&nbsp;&nbsp;🎭 {title}&nbsp;&nbsp;", roleplay_style))
-                    for line in content:
-                        if line:
-                            story.append(Paragraph(line, body_style))
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                elif section_type == 'group_activity':
-                    story.append(Paragraph(f"&nbsp;&nbsp;👥 {title}&nbsp;&nbsp;", group_activity_style))
-                    for line in content:
-                        if line:
-                            story.append(Paragraph(line, body_style))
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                elif section_type == 'section':
-                    story.append(Paragraph(f"&nbsp;&nbsp;📖 {title}&nbsp;&nbsp;", section_style))
-                    for line in content:
-                        if line:
-                            story.append(Paragraph(line, body_style))
-                    story.append(Spacer(1, 0.15 * inch))
-                
-                else:
-                    for line in content:
-                        if line:
+            elif section_type == 'exercise':
+                story.append(Paragraph(f"&nbsp;&nbsp;✏️ {title}&nbsp;&nbsp;", exercise_style))
+                for line in content:
+                    if line:
+                        if any(word in line.lower() for word in ['match', 'fill', 'complete', 'write', 'answer', 'choose']):
+                            story.append(Paragraph(line, instruction_style))
+                        else:
                             story.append(Paragraph(line, body_style))
+                        
+                        if '____' in line or 'answer:' in line.lower():
+                            story.append(Spacer(1, 0.2 * inch))
+                            story.append(Paragraph('_' * 70, body_style))
+                story.append(Spacer(1, 0.15 * inch))
+            
+            elif section_type == 'introduction':
+                story.append(Paragraph(f"&nbsp;&nbsp;📘 {title}&nbsp;&nbsp;", introduction_style))
+                for line in content:
+                    if line:
+                        story.append(Paragraph(line, body_style))
+                story.append(Spacer(1, 0.15 * inch))
+            
+            elif section_type == 'summary':
+                story.append(Paragraph(f"&nbsp;&nbsp;📋 {title}&nbsp;&nbsp;", summary_style))
+                for line in content:
+                    if line:
+                        story.append(Paragraph(line, body_style))
+                story.append(Spacer(1, 0.15 * inch))
+            
+            elif section_type == 'reflection':
+                story.append(Paragraph(f"&nbsp;&nbsp;💭 {title}&nbsp;&nbsp;", reflection_style))
+                for line in content:
+                    if line:
+                        story.append(Paragraph(line, body_style))
+                story.append(Spacer(1, 0.15 * inch))
+            
+            elif section_type == 'dialogue':
+                story.append(Paragraph(f"&nbsp;&nbsp;💬 {title}&nbsp;&nbsp;", dialogue_style))
+                for line in content:
+                    if line:
+                        story.append(Paragraph(line, dialogue_body_style))
+                story.append(Spacer(1, 0.15 * inch))
+            
+            elif section_type == 'roleplay':
+                story.append(Paragraph(f"&nbsp;&nbsp;🎭 {title}&nbsp;&nbsp;", roleplay_style))
+                for line in content:
+                    if line:
+                        story.append(Paragraph(line, body_style))
+                story.append(Spacer(1, 0.15 * inch))
+            
+            elif section_type == 'group_activity':
+                story.append(Paragraph(f"&nbsp;&nbsp;👥 {title}&nbsp;&nbsp;", group_activity_style))
+                for line in content:
+                    if line:
+                        story.append(Paragraph(line, body_style))
+                story.append(Spacer(1, 0.15 * inch))
+            
+            elif section_type == 'section':
+                story.append(Paragraph(f"&nbsp;&nbsp;📖 {title}&nbsp;&nbsp;", section_style))
+                for line in content:
+                    if line:
+                        story.append(Paragraph(line, body_style))
+                story.append(Spacer(1, 0.15 * inch))
+            
+            else:
+                for line in content:
+                    if line:
+                        story.append(Paragraph(line, body_style))
+        
+        return story
+    
+    def _pdf_document(self, buffer: BinaryIO) -> SimpleDocTemplate:
+        return SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            rightMargin=2*cm,
+            leftMargin=2*cm,
+            topMargin=2*cm,
+            bottomMargin=2*cm,
+        )
+    
+    def _pdf_title_story(self, material: Dict[str, Any]) -> List:
+        return [
+            Paragraph(material['title'], self._pdf_styles['title']),
+            Spacer(1, 0.3 * inch),
+        ]
+    
+    @traced("export.pdf")
+    def export_to_pdf(self, material: Dict[str, Any], output: Optional[BinaryIO] = None) -> BinaryIO:
+        """Export material to beautifully styled PDF format.
+
+        Writes to `output` (e.g. an open file) when given, else to a new BytesIO.
+        """
+        buffer = output if output is not None else io.BytesIO()
+        
+        if self.fragment_cache is not None and PdfWriter is not None and material.get('chapters'):
+            self._merge_pdf_fragments(material, buffer)
+            buffer.seek(0)
+            return buffer
+        
+        doc = self._pdf_document(buffer)
+        
+        # Build document content
+        story = self._pdf_title_story(material)
+        
+        # Process each chapter
+        for chapter in material.get('chapters', []):
+            story.extend(self._pdf_chapter_story(chapter))
             
             # Add page break after each chapter except the last
             if chapter != material['chapters'][-1]:
@@ -643,7 +867,83 @@ class DocumentExporter:
         doc.build(story)
         buffer.seek(0)
         return buffer
+    
+    def export_chapter_to_html(self, chapter: Dict[str, Any]) -> str:
+        """Render one chapter as a <section> element, e.g. for lazy loading in the editor.
+
+        Uses plain headings, paragraphs, lists and blockquotes so that rich
+        text editors keep the structure even if they drop the classes.
+        """
+        parts = [
+            f'<section class="chapter" id="chapter-{chapter["number"]}">',
+            f'<h2>Chapter {chapter["number"]}: {escape(chapter["title"])}</h2>',
+        ]
+        
+        for section in self._parse_chapter(chapter['content']):
+            section_type = section.get('type', 'paragraph')
+            title = section.get('title', '')
+            content = [escape(line) for line in section.get('content', []) if line]
+            
+            if section_type == 'paragraph':
+                parts.extend(f'<p>{line}</p>' for line in content)
+                continue
+            
+            parts.append(f'<div class="section section-{section_type}">')
+            parts.append(f'<h3>{_HTML_ICONS.get(section_type, "")} {escape(title)}</h3>')
+            
+            if section_type == 'objectives':
+                parts.append('<ul>')
+                parts.extend(f'<li>{line}</li>' for line in content)
+                parts.append('</ul>')
+            
+            elif section_type == 'exercise':
+                for line in content:
+                    if any(word in line.lower() for word in ['match', 'fill', 'complete', 'write', 'answer', 'choose']):
+                        parts.append(f'<p class="instruction"><em>{line}</em></p>')
+                    else:
+                        parts.append(f'<p>{line}</p>')
+                    
+                    if '____' in line or 'answer:' in line.lower():
+                        parts.append(f'<p class="answer-line">{"_" * 60}</p>')
+            
+            elif section_type == 'dialogue':
+                parts.append('<blockquote>')
+                parts.extend(f'<p>{line}</p>' for line in content)
+                parts.append('</blockquote>')
+            
+            else:
+                parts.extend(f'<p>{line}</p>' for line in content)
+            
+            parts.append('</div>')
+        
+        parts.append('</section>')
+        return '\n'.join(parts)
+    
+    @traced("export.html")
+    def export_to_html(self, material: Dict[str, Any]) -> str:
+        """Export material to a standalone, styled HTML document."""
+        title = escape(material['title'])
+        parts = [
+            '<!DOCTYPE html>',
+            '<html lang="en">',
+            '<head>',
+            '<meta charset="utf-8">',
+            f'<title>{title}</title>',
+            f'<style>{HTML_STYLES}</style>',
+            '</head>',
+            '<body>',
+            '<article class="material">',
+            f'<h1>{title}</h1>',
+        ]
+        for chapter in material.get('chapters', []):
+            parts.append(self.export_chapter_to_html(chapter))
+        parts.extend(['</article>', '</body>', '</html>'])
+        return '\n'.join(parts)
 
 
 # Singleton instance
-document_exporter = DocumentExporter()
+document_exporter = DocumentExporter(
+    fragment_cache=DiskLRUCache(
+        os.path.join(settings.EXPORT_CACHE_DIR, "fragments"), settings.EXPORT_FRAGMENT_CACHE_MAX_BYTES
+    ) if settings.EXPORT_FRAGMENTS_ENABLED else None
+)
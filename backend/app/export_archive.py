@@ -0,0 +1,68 @@
+"""
+Incrementally built ZIP archives for streaming downloads.
+
+ZipStream writes to an in-memory sink that is drained after every entry, so
+a response can send each entry as soon as it is added. Only the entry being
+written is held in memory, never the whole archive. zipfile supports
+unseekable output by writing a data descriptor after each entry.
+"""
+import io
+import shutil
+import zipfile
+from pathlib import Path
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write-only stream that keeps what was written until drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """Build a ZIP archive entry by entry; each call returns the bytes to send next."""
+
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=compression)
+        self._names = set()
+
+    def unique_name(self, name: str) -> str:
+        """`name`, or `name (2)`, `name (3)`... if it is already in the archive."""
+        stem, dot, suffix = name.rpartition(".")
+        if not dot:
+            stem, suffix = name, ""
+        candidate, counter = name, 1
+        while candidate in self._names:
+            counter += 1
+            candidate = f"{stem} ({counter}){dot}{suffix}"
+        self._names.add(candidate)
+        return candidate
+
+    def write_file(self, name: str, path: Path) -> bytes:
+        # Open the source first so a missing file doesn't leave a partial entry
+        with open(path, "rb") as source:
+            with self._zip.open(name, "w") as entry:
+                shutil.copyfileobj(source, entry, 64 * 1024)
+        return self._sink.drain()
+
+    def write_bytes(self, name: str, data: bytes) -> bytes:
+        self._zip.writestr(name, data)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        """Finish the archive and return the central directory."""
+        self._zip.close()
+        return self._sink.drain()
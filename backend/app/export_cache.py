@@ -0,0 +1,43 @@
+"""
+On-disk cache of rendered DOCX/PDF/HTML exports.
+
+Files are keyed on (material id, content hash, format, exporter version), so
+an unchanged material is rendered once and then served from disk. The key
+doubles as the download's ETag. Total size is bounded; the least recently
+served files are evicted first.
+"""
+import hashlib
+from pathlib import Path
+from typing import Optional
+from app.cache import DiskLRUCache
+from app.config import get_settings
+from app.document_service import EXPORTER_VERSION
+
+settings = get_settings()
+
+
+class ExportCache(DiskLRUCache):
+    def key(self, material_id: int, content_hash: str, fmt: str) -> str:
+        raw = f"{material_id}:{content_hash}:{fmt}:{EXPORTER_VERSION}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _name(self, material_id: int, key: str, fmt: str) -> str:
+        return f"{material_id}-{key}.{fmt}"
+
+    def get(self, material_id: int, key: str, fmt: str) -> Optional[Path]:
+        return self.file(self._name(material_id, key, fmt))
+
+    def put(self, material_id: int, key: str, fmt: str, data: bytes) -> Path:
+        return self.write(self._name(material_id, key, fmt), data)
+
+    def commit(self, material_id: int, key: str, fmt: str, tmp_path: Path) -> Path:
+        """Move a fully written temp_path() file into the cache."""
+        return self.commit_file(self._name(material_id, key, fmt), tmp_path)
+
+    def invalidate(self, material_id: int):
+        """Remove every cached export of a material."""
+        self.remove(f"{material_id}-*")
+
+
+# Singleton instance
+export_cache = ExportCache(settings.EXPORT_CACHE_DIR, settings.EXPORT_CACHE_MAX_BYTES)
@@ -0,0 +1,168 @@
+"""
+Content-addressed cache for generated chapters.
+
+Entries are keyed on a hash of everything that determines the completion
+(model, rendered prompt, temperature, max_tokens), so regenerating a chapter
+with the same title, description, context and model is served without a paid
+OpenAI call. Backends are pluggable; GENERATION_CACHE_BACKEND selects one.
+"""
+import hashlib
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Optional
+from app.cache import LRUCache
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import GenerationCacheEntry
+
+settings = get_settings()
+
+
+def make_cache_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+    """Hash the inputs that determine a completion into a cache key."""
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCacheBackend(ABC):
+    """Interface for generated-content cache backends.
+
+    Backends also count the lookups this process served and missed, in
+    `hits` and `misses`, for GET /metrics.
+    """
+
+    hits: int
+    misses: int
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """The cached content for `key`, or None."""
+
+    @abstractmethod
+    def set(self, key: str, content: str, model: str):
+        """Store `content`, generated by `model`, under `key`."""
+
+    @abstractmethod
+    def clear(self):
+        """Remove every entry."""
+
+
+class MemoryGenerationCache(GenerationCacheBackend):
+    """Per-process LRU cache with TTL. Lost on restart."""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[int]):
+        self._cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, content: str, model: str):
+        self._cache.set(key, content)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DatabaseGenerationCache(GenerationCacheBackend):
+    """Cache stored in the generation_cache table, shared by all workers."""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[int], session_factory=SessionLocal):
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds) if ttl_seconds else None
+        self.session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+        # Chapters are looked up from generation worker threads
+        self._lock = threading.Lock()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[str]:
+        db = self.session_factory()
+        try:
+            entry = db.get(GenerationCacheEntry, key)
+            if entry is None:
+                self._count(False)
+                return None
+            now = datetime.utcnow()
+            if self.ttl and entry.created_at < now - self.ttl:
+                db.delete(entry)
+                db.commit()
+                self._count(False)
+                return None
+            entry.last_accessed_at = now
+            db.commit()
+            self._count(True)
+            return entry.content
+        finally:
+            db.close()
+
+    def set(self, key: str, content: str, model: str):
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            db.merge(GenerationCacheEntry(
+                key=key, model=model, content=content, created_at=now, last_accessed_at=now
+            ))
+            # Sessions don't autoflush; the new entry must count towards the limit below
+            db.flush()
+            if self.ttl:
+                db.query(GenerationCacheEntry).filter(
+                    GenerationCacheEntry.created_at < now - self.ttl
+                ).delete(synchronize_session=False)
+            # Evict least recently used entries beyond the size limit
+            stale_keys = db.query(GenerationCacheEntry.key).order_by(
+                GenerationCacheEntry.last_accessed_at.desc()
+            ).offset(self.max_entries)
+            db.query(GenerationCacheEntry).filter(
+                GenerationCacheEntry.key.in_(stale_keys.scalar_subquery())
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def clear(self):
+        db = self.session_factory()
+        try:
+            db.query(GenerationCacheEntry).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+def create_generation_cache() -> Optional[GenerationCacheBackend]:
+    """Build the backend selected by GENERATION_CACHE_BACKEND (memory, database or none)."""
+    backend = settings.GENERATION_CACHE_BACKEND.lower()
+    ttl_seconds = settings.GENERATION_CACHE_TTL_SECONDS or None
+    if backend == "memory":
+        return MemoryGenerationCache(settings.GENERATION_CACHE_MAX_ENTRIES, ttl_seconds)
+    if backend == "database":
+        return DatabaseGenerationCache(settings.GENERATION_CACHE_MAX_ENTRIES, ttl_seconds)
+    if backend != "none":
+        print(f"Warning: Unknown GENERATION_CACHE_BACKEND '{backend}', caching disabled")
+    return None
+
+
+# Singleton instance
+generation_cache = create_generation_cache()
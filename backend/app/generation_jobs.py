@@ -0,0 +1,203 @@
+"""
+In-process background queue for material generation jobs.
+
+Jobs are queued in memory and run by a small pool of worker threads, so the
+HTTP request that submits a job returns immediately and no database session
+is held while the LLM is working. Job state lives in this process only; it is
+meant for a single backend instance and needs no external broker.
+"""
+import queue
+import threading
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from app.config import get_settings
+from app.database import SessionLocal
+from app.llm_service import llm_service
+from app.metrics import GENERATIONS_IN_FLIGHT
+from app.material_service import save_generated_material
+
+settings = get_settings()
+
+
+class GenerationJob:
+    """State of one queued generation, updated by the worker that runs it."""
+
+    def __init__(
+        self,
+        user_id: int,
+        title: str,
+        chapters: List[Dict[str, Any]],
+        model: str,
+        bypass_cache: bool = False
+    ):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.title = title
+        self.chapters = chapters
+        self.model = model
+        self.bypass_cache = bypass_cache
+        self.status = "queued"
+        self.chapter_status = [
+            {"number": i, "title": chapter["title"], "status": "pending"}
+            for i, chapter in enumerate(chapters, 1)
+        ]
+        self.material_id: Optional[int] = None
+        self.tokens_used = 0
+        self.estimated_cost = 0.0
+        self.cache_hits = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def mark_chapter_complete(self, number: int, title: str):
+        with self._lock:
+            self.chapter_status[number - 1]["status"] = "completed"
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            chapters = [dict(chapter) for chapter in self.chapter_status]
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total_chapters": len(chapters),
+            "completed_chapters": sum(1 for ch in chapters if ch["status"] == "completed"),
+            "chapters": chapters,
+            "material_id": self.material_id,
+            "tokens_used": self.tokens_used,
+            "estimated_cost": self.estimated_cost,
+            "cache_hits": self.cache_hits,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class GenerationJobQueue:
+    """Thread-backed FIFO queue that runs GenerationJobs and keeps their status."""
+
+    def __init__(self, workers: int, retention: timedelta):
+        self.workers = workers
+        self.retention = retention
+        self._queue: "queue.Queue[Optional[GenerationJob]]" = queue.Queue()
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def queued(self) -> int:
+        """Jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"generation-worker-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self):
+        """Stop workers after the jobs already queued have finished."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def submit(
+        self,
+        user_id: int,
+        title: str,
+        chapters: List[Dict[str, Any]],
+        model: str,
+        bypass_cache: bool = False
+    ) -> GenerationJob:
+        self.start()
+        job = GenerationJob(user_id, title, chapters, model, bypass_cache)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        """Forget finished jobs older than the retention period. Caller holds the lock."""
+        cutoff = datetime.utcnow() - self.retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: GenerationJob):
+        job.status = "running"
+        GENERATIONS_IN_FLIGHT.inc(kind="job")
+        try:
+            generated_content, prompt_tokens, completion_tokens, cache_hits = llm_service.generate_material(
+                job.title,
+                job.chapters,
+                job.model,
+                on_chapter_complete=job.mark_chapter_complete,
+                bypass_cache=job.bypass_cache
+            )
+
+            db = SessionLocal()
+            try:
+                material = save_generated_material(
+                    db,
+                    user_id=job.user_id,
+                    title=job.title,
+                    chapters=job.chapters,
+                    generated_content=generated_content,
+                    model=job.model,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens
+                )
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            job.material_id = material.id
+            job.tokens_used = prompt_tokens + completion_tokens
+            job.estimated_cost = llm_service.estimate_cost(prompt_tokens, completion_tokens, job.model)
+            job.cache_hits = cache_hits
+            job.status = "completed"
+        except Exception as e:
+            print(f"Warning: Generation job {job.id} failed: {e}")
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            GENERATIONS_IN_FLIGHT.dec(kind="job")
+            job.finished_at = datetime.utcnow()
+
+
+# Singleton instance
+generation_queue = GenerationJobQueue(
+    workers=settings.GENERATION_JOB_WORKERS,
+    retention=timedelta(minutes=settings.GENERATION_JOB_RETENTION_MINUTES)
+)
@@ -1,6 +1,11 @@
+import asyncio
+import importlib.util
 import json
 import os
-from typing import Dict, List, Any, Tuple
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 import tiktoken
 
@@ -13,11 +18,27 @@ for var in proxy_vars_to_remove:
 # Import httpx and create a client without proxies BEFORE OpenAI imports it
 import httpx
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from app.config import get_settings
+from app.generation_cache import GenerationCacheBackend, generation_cache, make_cache_key
+from app.metrics import LLM_IN_FLIGHT, LLM_REQUEST_SECONDS, LLM_REQUESTS, LLM_TOKENS
+from app.profiling import span
 
 settings = get_settings()
 
+SYSTEM_PROMPT = "You are an expert English language teacher."
+GENERATION_TEMPERATURE = 0.7
+GENERATION_MAX_TOKENS = 4000
+
+SUPPORTED_MODELS = ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo", "gpt-5"]
+
+# Chat formatting adds a few tokens per message plus the reply primer
+CHAT_TOKEN_OVERHEAD = 3 * 2 + 3
+TOKENIZER_THREADS = 8
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 
 @contextmanager
 def no_proxy_env():
@@ -34,10 +55,42 @@ def no_proxy_env():
             os.environ[var] = value
 
 
+@contextmanager
+def track_llm_call(model: str, mode: str):
+    """Time and count one chat completion call, whether or not it fails."""
+    start = time.perf_counter()
+    outcome = "error"
+    LLM_IN_FLIGHT.inc(model=model)
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        LLM_IN_FLIGHT.dec(model=model)
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, model=model, mode=mode)
+        LLM_REQUESTS.inc(model=model, mode=mode, outcome=outcome)
+
+
+def count_llm_tokens(model: str, prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+
+
+def chapter_concurrency(concurrency: Optional[int], chapter_count: int) -> int:
+    """Chapters generated at once for one material: `concurrency` (default
+    GENERATION_CONCURRENCY), capped at GENERATION_CONCURRENCY and the chapter count."""
+    if concurrency is None:
+        concurrency = settings.GENERATION_CONCURRENCY
+    return max(1, min(concurrency, settings.GENERATION_CONCURRENCY, chapter_count or 1))
+
+
 class LLMService:
-    def __init__(self):
+    def __init__(self, cache: Optional[GenerationCacheBackend] = None):
         # Only initialize clients if API keys are provided and not empty
         self.openai_client = None
+        self.async_openai_client = None
+        self.cache = cache
+        self._encodings: Dict[str, tiktoken.Encoding] = {}
+        self._encodings_lock = threading.Lock()
         
         # Check OpenAI API key
         openai_key = settings.OPENAI_API_KEY.strip() if settings.OPENAI_API_KEY else ''
@@ -68,25 +121,118 @@ class LLMService:
                     api_key=openai_key,
                     http_client=custom_http_client
                 )
-                print("Success: OpenAI client initialized")
+                
+                # Shared pooled client for the async endpoints. Requests from every
+                # in-flight generation reuse its keep-alive connections.
+                async_http_client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(
+                        settings.OPENAI_READ_TIMEOUT,
+                        connect=settings.OPENAI_CONNECT_TIMEOUT
+                    ),
+                    limits=httpx.Limits(
+                        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY
+                    ),
+                    http2=HTTP2_AVAILABLE
+                )
+                self.async_openai_client = AsyncOpenAI(
+                    api_key=openai_key,
+                    http_client=async_http_client
+                )
+                print(f"Success: OpenAI client initialized (async HTTP/2: {HTTP2_AVAILABLE})")
             except Exception as e:
                 print(f"Warning: Failed to initialize OpenAI client: {e}")
                 import traceback
                 traceback.print_exc()
                 self.openai_client = None
+                self.async_openai_client = None
         else:
             if openai_key:
                 print(f"Warning: OpenAI API key too short (length: {len(openai_key)})")
             else:
                 print("Info: OpenAI API key not set or invalid")
     
+    async def aclose(self):
+        """Close the shared async HTTP client and its pooled connections."""
+        if self.async_openai_client is not None:
+            await self.async_openai_client.close()
+    
+    def get_encoding(self, model: str) -> tiktoken.Encoding:
+        """Return the tiktoken encoding for a model, memoized per model name."""
+        encoding = self._encodings.get(model)
+        if encoding is None:
+            with self._encodings_lock:
+                encoding = self._encodings.get(model)
+                if encoding is None:
+                    try:
+                        encoding = tiktoken.encoding_for_model(model)
+                    except KeyError:
+                        encoding = tiktoken.get_encoding("cl100k_base")
+                    self._encodings[model] = encoding
+        return encoding
+    
+    def warm_encodings(self, models: Optional[List[str]] = None):
+        """Load encodings up front so the first request doesn't pay for it."""
+        for model in models or SUPPORTED_MODELS:
+            try:
+                self.get_encoding(model)
+            except Exception as e:
+                # tiktoken downloads encoding files on first use; don't block startup
+                print(f"Warning: Could not load tiktoken encoding for {model}: {e}")
+    
     def count_tokens(self, text: str, model: str = "gpt-4o-mini") -> int:
         """Count tokens in text using tiktoken."""
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(text))
+        return len(self.get_encoding(model).encode(text))
+    
+    def count_tokens_batch(self, texts: List[str], model: str = "gpt-4o-mini") -> List[int]:
+        """Count tokens for many texts at once, encoding them on tiktoken's thread pool."""
+        encoded = self.get_encoding(model).encode_batch(texts, num_threads=TOKENIZER_THREADS)
+        return [len(tokens) for tokens in encoded]
+    
+    def estimate_material(
+        self,
+        chapters: List[Dict[str, str]],
+        model: str = "gpt-4o-mini"
+    ) -> Dict[str, Any]:
+        """Predict prompt tokens and worst-case cost of generating a material.
+
+        Prompts are rendered exactly as generate_material would render them.
+        Completions are assumed to use the full max_tokens budget.
+        """
+        chapter_titles = [
+            chapter.get("title", f"Chapter {i}") for i, chapter in enumerate(chapters, 1)
+        ]
+        prompts = [
+            self._build_chapter_prompt(
+                chapter_titles[index], chapters[index].get("description", ""), chapter_titles[:index]
+            )
+            for index in range(len(chapters))
+        ]
+        system_tokens = self.count_tokens(SYSTEM_PROMPT, model)
+        prompt_counts = [
+            count + system_tokens + CHAT_TOKEN_OVERHEAD
+            for count in self.count_tokens_batch(prompts, model)
+        ]
+        
+        prompt_tokens = sum(prompt_counts)
+        max_completion_tokens = GENERATION_MAX_TOKENS * len(chapters)
+        return {
+            "model": model,
+            "chapters": [
+                {
+                    "number": i,
+                    "title": chapter_titles[i - 1],
+                    "prompt_tokens": count,
+                    "max_completion_tokens": GENERATION_MAX_TOKENS
+                }
+                for i, count in enumerate(prompt_counts, 1)
+            ],
+            "prompt_tokens": prompt_tokens,
+            "max_completion_tokens": max_completion_tokens,
+            "prompt_cost": self.estimate_cost(prompt_tokens, 0, model),
+            "worst_case_cost": self.estimate_cost(prompt_tokens, max_completion_tokens, model)
+        }
     
     def estimate_cost(self, prompt_tokens: int, completion_tokens: int, model: str) -> float:
         """Estimate cost based on token usage and model."""
@@ -126,9 +272,155 @@ class LLMService:
         chapter_title: str, 
         chapter_description: str,
         previous_chapters: List[str],
-        model: str = "gpt-4o-mini"
+        model: str = "gpt-4o-mini",
+        bypass_cache: bool = False
+    ) -> Tuple[str, int, int]:
+        """Generate content for a single chapter.
+
+        Cache hits report zero prompt and completion tokens since no API call is made.
+        """
+        content, prompt_tokens, completion_tokens, _ = self._generate_chapter(
+            chapter_title, chapter_description, previous_chapters, model, bypass_cache
+        )
+        return content, prompt_tokens, completion_tokens
+    
+    def _generate_chapter(
+        self,
+        chapter_title: str,
+        chapter_description: str,
+        previous_chapters: List[str],
+        model: str,
+        bypass_cache: bool
+    ) -> Tuple[str, int, int, bool]:
+        """Generate a chapter through the cache; the last item tells whether it was a hit."""
+        with span("llm.generate_chapter"):
+            prompt = self._build_chapter_prompt(chapter_title, chapter_description, previous_chapters)
+            cache_key = self._cache_key(prompt, model)
+            
+            if cache_key and not bypass_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached, 0, 0, True
+            
+            content, prompt_tokens, completion_tokens = self._generate_with_openai(prompt, model)
+            if cache_key:
+                self.cache.set(cache_key, content, model)
+            return content, prompt_tokens, completion_tokens, False
+    
+    async def generate_chapter_content_async(
+        self,
+        chapter_title: str,
+        chapter_description: str,
+        previous_chapters: List[str],
+        model: str = "gpt-4o-mini",
+        bypass_cache: bool = False
     ) -> Tuple[str, int, int]:
-        """Generate content for a single chapter."""
+        """Async version of generate_chapter_content using the shared AsyncOpenAI client."""
+        content, prompt_tokens, completion_tokens, _ = await self._generate_chapter_async(
+            chapter_title, chapter_description, previous_chapters, model, bypass_cache
+        )
+        return content, prompt_tokens, completion_tokens
+    
+    async def _generate_chapter_async(
+        self,
+        chapter_title: str,
+        chapter_description: str,
+        previous_chapters: List[str],
+        model: str,
+        bypass_cache: bool
+    ) -> Tuple[str, int, int, bool]:
+        with span("llm.generate_chapter"):
+            prompt = self._build_chapter_prompt(chapter_title, chapter_description, previous_chapters)
+            cache_key = self._cache_key(prompt, model)
+            
+            # Cache backends may hit the database, so keep them off the event loop
+            if cache_key and not bypass_cache:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    return cached, 0, 0, True
+            
+            content, prompt_tokens, completion_tokens = await self._generate_with_openai_async(prompt, model)
+            if cache_key:
+                await asyncio.to_thread(self.cache.set, cache_key, content, model)
+            return content, prompt_tokens, completion_tokens, False
+    
+    def stream_chapter_content(
+        self,
+        chapter_title: str,
+        chapter_description: str,
+        previous_chapters: List[str],
+        model: str = "gpt-4o-mini",
+        bypass_cache: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream content for a single chapter.
+
+        Yields {"delta": str} events as tokens arrive, followed by one
+        {"usage": (prompt_tokens, completion_tokens), "cached": bool} event.
+        A cache hit is sent as a single delta with zero usage.
+        """
+        prompt = self._build_chapter_prompt(chapter_title, chapter_description, previous_chapters)
+        cache_key = self._cache_key(prompt, model)
+        
+        if cache_key and not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield {"delta": cached}
+                yield {"usage": (0, 0), "cached": True}
+                return
+        
+        parts = []
+        with span("llm.stream_chapter"):
+            for event in self._stream_with_openai(prompt, model):
+                if "delta" in event:
+                    parts.append(event["delta"])
+                    yield event
+                else:
+                    if cache_key:
+                        self.cache.set(cache_key, "".join(parts), model)
+                    yield {"usage": event["usage"], "cached": False}
+    
+    async def stream_chapter_content_async(
+        self,
+        chapter_title: str,
+        chapter_description: str,
+        previous_chapters: List[str],
+        model: str = "gpt-4o-mini",
+        bypass_cache: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async version of stream_chapter_content; yields the same events."""
+        prompt = self._build_chapter_prompt(chapter_title, chapter_description, previous_chapters)
+        cache_key = self._cache_key(prompt, model)
+        
+        if cache_key and not bypass_cache:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                yield {"delta": cached}
+                yield {"usage": (0, 0), "cached": True}
+                return
+        
+        parts = []
+        with span("llm.stream_chapter"):
+            async for event in self._stream_with_openai_async(prompt, model):
+                if "delta" in event:
+                    parts.append(event["delta"])
+                    yield event
+                else:
+                    if cache_key:
+                        await asyncio.to_thread(self.cache.set, cache_key, "".join(parts), model)
+                    yield {"usage": event["usage"], "cached": False}
+    
+    def _cache_key(self, prompt: str, model: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return make_cache_key(model, prompt, GENERATION_TEMPERATURE, GENERATION_MAX_TOKENS)
+    
+    def _build_chapter_prompt(
+        self,
+        chapter_title: str,
+        chapter_description: str,
+        previous_chapters: List[str]
+    ) -> str:
+        """Render the user prompt for a single chapter."""
         
         # Build context from previous chapters
         context = ""
@@ -258,73 +550,219 @@ FORMATTING GUIDELINES:
 
 Remember: This is a professional textbook that combines explanatory content with activities. Students will fill it out directly in Word format. Avoid repetition and keep exercises appropriately complex for B2 level."""
 
-        return self._generate_with_openai(prompt, model)
+        return prompt
     
-    def _generate_with_openai(self, prompt: str, model: str) -> Tuple[str, int, int]:
-        """Generate content using OpenAI API."""
-        if not self.openai_client:
+    def _chat_messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _require_openai_client(self, async_client: bool = False):
+        if not (self.async_openai_client if async_client else self.openai_client):
             raise ValueError(
                 "OpenAI API key not configured. "
                 "Please set OPENAI_API_KEY environment variable in Render dashboard."
             )
+    
+    def _generate_with_openai(self, prompt: str, model: str) -> Tuple[str, int, int]:
+        """Generate content using OpenAI API."""
+        self._require_openai_client()
         
-        response = self.openai_client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are an expert English language teacher."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=4000
-        )
+        with track_llm_call(model, "complete"):
+            response = self.openai_client.chat.completions.create(
+                model=model,
+                messages=self._chat_messages(prompt),
+                temperature=GENERATION_TEMPERATURE,
+                max_tokens=GENERATION_MAX_TOKENS
+            )
         
         content = response.choices[0].message.content
         prompt_tokens = response.usage.prompt_tokens
         completion_tokens = response.usage.completion_tokens
+        count_llm_tokens(model, prompt_tokens, completion_tokens)
         
         return content, prompt_tokens, completion_tokens
     
-    def generate_material(
-        self, 
-        title: str, 
-        chapters: List[Dict[str, str]], 
-        model: str = "gpt-4o-mini"
-    ) -> Tuple[Dict[str, Any], int, int]:
-        """Generate complete material with all chapters."""
+    def _stream_with_openai(self, prompt: str, model: str) -> Iterator[Dict[str, Any]]:
+        """Stream content from the OpenAI API, ending with the usage chunk."""
+        self._require_openai_client()
+        
+        usage = None
+        with track_llm_call(model, "stream"):
+            stream = self.openai_client.chat.completions.create(
+                model=model,
+                messages=self._chat_messages(prompt),
+                temperature=GENERATION_TEMPERATURE,
+                max_tokens=GENERATION_MAX_TOKENS,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield {"delta": chunk.choices[0].delta.content}
+                if chunk.usage is not None:
+                    # With include_usage the final chunk has no choices, only usage
+                    usage = (chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+            
+            if usage is None:
+                raise ValueError("OpenAI stream ended without a usage chunk")
+        count_llm_tokens(model, *usage)
+        yield {"usage": usage}
+    
+    async def _generate_with_openai_async(self, prompt: str, model: str) -> Tuple[str, int, int]:
+        """Generate content using the async OpenAI client."""
+        self._require_openai_client(async_client=True)
+        
+        with track_llm_call(model, "complete"):
+            response = await self.async_openai_client.chat.completions.create(
+                model=model,
+                messages=self._chat_messages(prompt),
+                temperature=GENERATION_TEMPERATURE,
+                max_tokens=GENERATION_MAX_TOKENS
+            )
         
+        content = response.choices[0].message.content
+        count_llm_tokens(model, response.usage.prompt_tokens, response.usage.completion_tokens)
+        return content, response.usage.prompt_tokens, response.usage.completion_tokens
+    
+    async def _stream_with_openai_async(self, prompt: str, model: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream content from the async OpenAI client, ending with the usage chunk."""
+        self._require_openai_client(async_client=True)
+        
+        usage = None
+        with track_llm_call(model, "stream"):
+            stream = await self.async_openai_client.chat.completions.create(
+                model=model,
+                messages=self._chat_messages(prompt),
+                temperature=GENERATION_TEMPERATURE,
+                max_tokens=GENERATION_MAX_TOKENS,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield {"delta": chunk.choices[0].delta.content}
+                if chunk.usage is not None:
+                    usage = (chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+            
+            if usage is None:
+                raise ValueError("OpenAI stream ended without a usage chunk")
+        count_llm_tokens(model, *usage)
+        yield {"usage": usage}
+    
+    def generate_material(
+        self,
+        title: str,
+        chapters: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        concurrency: Optional[int] = None,
+        on_chapter_complete: Optional[Callable[[int, str], None]] = None,
+        bypass_cache: bool = False
+    ) -> Tuple[Dict[str, Any], int, int, int]:
+        """Generate complete material with all chapters.
+
+        Returns the material, prompt and completion token totals, and the number
+        of chapters served from the generation cache.
+
+        Chapters only depend on the titles of the chapters before them, which are
+        known up front, so they are generated in parallel by a bounded worker pool.
+        `concurrency` defaults to, and is capped at, settings.GENERATION_CONCURRENCY;
+        1 generates chapters one at a time. `on_chapter_complete(number, title)` is called from
+        the worker thread as each chapter finishes, in completion order.
+        """
+        concurrency = chapter_concurrency(concurrency, len(chapters))
+
+        chapter_titles = [
+            chapter.get("title", f"Chapter {i}") for i, chapter in enumerate(chapters, 1)
+        ]
+
+        def generate(index: int) -> Tuple[str, int, int, bool]:
+            output = self._generate_chapter(
+                chapter_titles[index],
+                chapters[index].get("description", ""),
+                chapter_titles[:index],
+                model,
+                bypass_cache
+            )
+            if on_chapter_complete:
+                on_chapter_complete(index + 1, chapter_titles[index])
+            return output
+
+        if concurrency == 1:
+            outputs = [generate(index) for index in range(len(chapters))]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                # map() yields results in submission order, so chapter order is kept
+                outputs = list(executor.map(generate, range(len(chapters))))
+
+        return self._assemble_material(title, chapter_titles, outputs)
+
+    async def generate_material_async(
+        self,
+        title: str,
+        chapters: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        concurrency: Optional[int] = None,
+        on_chapter_complete: Optional[Callable[[int, str], None]] = None,
+        bypass_cache: bool = False
+    ) -> Tuple[Dict[str, Any], int, int, int]:
+        """Async version of generate_material; an asyncio semaphore bounds concurrency."""
+        semaphore = asyncio.Semaphore(chapter_concurrency(concurrency, len(chapters)))
+
+        chapter_titles = [
+            chapter.get("title", f"Chapter {i}") for i, chapter in enumerate(chapters, 1)
+        ]
+
+        async def generate(index: int) -> Tuple[str, int, int, bool]:
+            async with semaphore:
+                output = await self._generate_chapter_async(
+                    chapter_titles[index],
+                    chapters[index].get("description", ""),
+                    chapter_titles[:index],
+                    model,
+                    bypass_cache
+                )
+            if on_chapter_complete:
+                on_chapter_complete(index + 1, chapter_titles[index])
+            return output
+
+        # gather() returns results in argument order, so chapter order is kept
+        outputs = await asyncio.gather(*(generate(index) for index in range(len(chapters))))
+        return self._assemble_material(title, chapter_titles, outputs)
+
+    def _assemble_material(
+        self,
+        title: str,
+        chapter_titles: List[str],
+        outputs: List[Tuple[str, int, int, bool]]
+    ) -> Tuple[Dict[str, Any], int, int, int]:
+        """Build the material dict and token totals from per-chapter outputs."""
         result = {
             "title": title,
             "chapters": []
         }
-        
+
         total_prompt_tokens = 0
         total_completion_tokens = 0
-        previous_chapters = []
-        
-        for i, chapter in enumerate(chapters, 1):
-            chapter_title = chapter.get("title", f"Chapter {i}")
-            chapter_description = chapter.get("description", "")
-            
-            content, prompt_tokens, completion_tokens = self.generate_chapter_content(
-                chapter_title,
-                chapter_description,
-                previous_chapters,
-                model
-            )
-            
+        cache_hits = 0
+
+        for i, (content, prompt_tokens, completion_tokens, cached) in enumerate(outputs, 1):
             result["chapters"].append({
                 "number": i,
-                "title": chapter_title,
+                "title": chapter_titles[i - 1],
                 "content": content
             })
-            
+
             total_prompt_tokens += prompt_tokens
             total_completion_tokens += completion_tokens
-            previous_chapters.append(chapter_title)
-        
-        return result, total_prompt_tokens, total_completion_tokens
+            cache_hits += cached
+
+        return result, total_prompt_tokens, total_completion_tokens, cache_hits
 
 
 # Singleton instance
-llm_service = LLMService()
+llm_service = LLMService(cache=generation_cache)
 
@@ -1,19 +1,48 @@
-from fastapi import FastAPI
+import hmac
+import threading
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from fastapi.responses import ORJSONResponse
+from app.database import engine, async_engine, Base, SessionLocal, create_missing_indexes, pool_stats
 from app.routers import auth, materials, tokens
+from app import auth as auth_service
 from app.config import get_settings
+from app.compression import CompressionMiddleware
 from app.llm_service import llm_service
+from app.generation_jobs import generation_queue
+from app.render_pool import render_pool
+from app.password_hasher import password_hasher
+from app.generation_cache import generation_cache
+from app import material_service, usage_rollups
+from app.export_cache import export_cache
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, instrument_engine, registry
+from app.profiling import ProfileStore, ProfilingMiddleware, instrument_session_commits
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+create_missing_indexes()
+
+# One-off data migrations are not run here, on every process start. After
+# upgrading an existing database, run once from the backend/ directory:
+#   python -m app.material_service migrate   (content blobs -> chapter rows)
+#   python -m app.usage_rollups backfill      (token usage -> rollups)
+# Only warn, cheaply, when one is still pending.
+with SessionLocal() as db:
+    if material_service.needs_migration(db):
+        print("Warning: some books are still stored as one JSON blob and have no chapter endpoints; "
+              "run `python -m app.material_service migrate`")
+    if usage_rollups.needs_backfill(db):
+        print("Warning: token usage has no rollups yet, so the Token Usage dashboard is empty; "
+              "run `python -m app.usage_rollups backfill`")
 
 settings = get_settings()
 
 app = FastAPI(
     title="English Class Material Generator API",
     description="API for generating English learning materials using AI",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware - supports both development and production
@@ -28,12 +57,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON/text responses (streamed responses are left alone)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+# Opt-in request profiling. The metrics middleware, added after it, wraps it,
+# so request durations of profiled requests include the cProfile overhead.
+# Profiles can only be downloaded with the token, so profiling requires one.
+profile_store = ProfileStore(settings.PROFILING_MAX_PROFILES)
+if settings.PROFILING_SAMPLE_RATE > 0 and not settings.PROFILING_TOKEN:
+    print("Warning: PROFILING_SAMPLE_RATE is set but PROFILING_TOKEN is not; profiling is disabled")
+if settings.PROFILING_TOKEN:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        token=settings.PROFILING_TOKEN,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+    )
+instrument_session_commits()
+
+# Request metrics; added last so it is the outermost middleware and times everything
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(materials.router, prefix="/api")
 app.include_router(tokens.router, prefix="/api")
 
 
+@app.on_event("startup")
+def warm_tokenizers():
+    # tiktoken may download its encoding files; readiness mustn't wait on (or fail with) the network
+    threading.Thread(target=llm_service.warm_encodings, name="tiktoken-warmup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    await run_in_threadpool(generation_queue.shutdown)
+    await run_in_threadpool(render_pool.shutdown)
+    await run_in_threadpool(password_hasher.shutdown)
+    await llm_service.aclose()
+    await async_engine.dispose()
+
+
 @app.get("/")
 def read_root():
     return {
@@ -48,6 +121,124 @@ def health_check():
     return {"status": "healthy"}
 
 
+def _has_bearer_token(authorization: str, token: str) -> bool:
+    """Whether an Authorization header carries `token`, compared in constant time."""
+    return hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode())
+
+
+def _require_metrics_token(authorization: str):
+    # Route traffic, LLM spend and pool internals are not public: no token, no endpoint
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not _has_bearer_token(authorization, settings.METRICS_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+@app.get("/health/db")
+def database_pool_stats(authorization: str = Header("")):
+    """Connection pool usage (size, checked out, overflow). Guarded by METRICS_TOKEN like /metrics."""
+    _require_metrics_token(authorization)
+    return pool_stats()
+
+
+def _cache_stats():
+    return {
+        "auth_token": auth_service._token_cache,
+        "auth_user": auth_service._user_cache,
+        "generation": generation_cache,
+        "export": export_cache,
+    }
+
+
+def _cache_requests():
+    values = {}
+    for name, cache in _cache_stats().items():
+        values[(name, "hit")] = cache.hits
+        values[(name, "miss")] = cache.misses
+    return values
+
+
+def _cache_hit_ratio():
+    values = {}
+    for name, cache in _cache_stats().items():
+        lookups = cache.hits + cache.misses
+        values[(name,)] = cache.hits / lookups if lookups else 0.0
+    return values
+
+
+def _pool_checked_out():
+    values = {}
+    for name, stats in (("async", pool_stats()), ("sync", pool_stats()["sync"])):
+        if "checked_out" in stats:
+            values[(name,)] = stats["checked_out"]
+    return values
+
+
+registry.callback(
+    "cache_requests_total", "Cache lookups by cache and result.", "counter", _cache_requests, ("cache", "result")
+)
+registry.callback("cache_hit_ratio", "Share of cache lookups that were hits.", "gauge", _cache_hit_ratio, ("cache",))
+registry.callback(
+    "generation_jobs_queued", "Generation jobs waiting for a worker.", "gauge",
+    lambda: {(): generation_queue.queued}
+)
+registry.callback(
+    "export_renders_pending", "Exports queued or being rendered.", "gauge",
+    lambda: {(): render_pool.pending}
+)
+registry.callback(
+    "password_hashes_pending", "Password hashes queued or running.", "gauge",
+    lambda: {(): password_hasher.pending}
+)
+registry.callback(
+    "db_pool_checked_out", "Database connections in use.", "gauge", _pool_checked_out, ("engine",)
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: str = Header("")):
+    """Prometheus metrics (text format)."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    _require_metrics_token(authorization)
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+def _require_profiling_token(authorization: str):
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not _has_bearer_token(authorization, settings.PROFILING_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid profiling token")
+
+
+@app.get("/debug/profiles", include_in_schema=False)
+def list_profiles(authorization: str = Header("")):
+    """Stored request profiles, newest first: request, status, time and spans."""
+    _require_profiling_token(authorization)
+    return profile_store.list()
+
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+def download_profile(
+    profile_id: str,
+    format: str = Query("prof", pattern="^(prof|text)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    authorization: str = Header("")
+):
+    """A stored profile as a .prof file (cProfile/pstats format), or as a pstats text report."""
+    _require_profiling_token(authorization)
+    entry = profile_store.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        return Response(ProfileStore.as_text(entry, sort), media_type="text/plain")
+    return Response(
+        entry["data"],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'}
+    )
+
+
 @app.get("/debug/api-keys")
 def debug_api_keys():
     """Debug endpoint to check if API keys are loaded (for development only)"""
@@ -0,0 +1,231 @@
+"""
+Persistence helpers for materials and their chapters.
+
+Generated books are stored one Chapter row per chapter so that reading or
+editing a chapter only touches that chapter. The JSON document the API has
+always exposed ({"title": ..., "chapters": [...]}) is assembled on demand.
+Content that does not have that shape (e.g. editor HTML saved through
+PUT /materials/{id}) stays in the legacy Material.generated_content column.
+
+Migrate legacy JSON blobs into chapter rows with:
+    python -m app.material_service migrate
+"""
+import argparse
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import flag_modified
+from app.models import Chapter, Material
+from app.llm_service import llm_service
+from app.usage_rollups import record_token_usage
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _parse_chapters(title: str, generated_content: Any) -> Optional[List[Dict[str, Any]]]:
+    """Return the chapters of a {"title", "chapters"} document, or None if it has another shape."""
+    if not isinstance(generated_content, dict) or set(generated_content) != {"title", "chapters"}:
+        return None
+    if generated_content["title"] != title or not isinstance(generated_content["chapters"], list):
+        return None
+    chapters = generated_content["chapters"]
+    numbers = set()
+    for chapter in chapters:
+        if (
+            not isinstance(chapter, dict)
+            or set(chapter) != {"number", "title", "content"}
+            or not isinstance(chapter["number"], int)
+            or not isinstance(chapter["title"], str)
+            or not isinstance(chapter["content"], str)
+        ):
+            return None
+        numbers.add(chapter["number"])
+    if len(numbers) != len(chapters):
+        return None
+    return chapters
+
+
+def _sync_chapters(material: Material, chapters: List[Dict[str, Any]]):
+    """Make the material's Chapter rows match `chapters`, only touching rows that changed."""
+    existing = {chapter.number: chapter for chapter in material.chapters}
+    for data in chapters:
+        chapter = existing.pop(data["number"], None)
+        digest = content_hash(data["content"])
+        if chapter is None:
+            material.chapters.append(Chapter(
+                number=data["number"],
+                title=data["title"],
+                content=data["content"],
+                content_hash=digest
+            ))
+        elif chapter.title != data["title"] or chapter.content_hash != digest:
+            chapter.title = data["title"]
+            chapter.content = data["content"]
+            chapter.content_hash = digest
+    for chapter in existing.values():
+        material.chapters.remove(chapter)
+    material.chapters.sort(key=lambda chapter: chapter.number)
+
+
+def set_material_content(db: Session, material: Material, generated_content: str):
+    """Store content sent by a client, as chapter rows when it is a generated book."""
+    try:
+        chapters = _parse_chapters(material.title, json.loads(generated_content))
+    except ValueError:
+        chapters = None
+
+    if chapters is None:
+        material.generated_content = generated_content
+        material.chapters.clear()
+    else:
+        material.generated_content = None
+        _sync_chapters(material, chapters)
+    # Chapter edits alone don't update the materials row
+    material.updated_at = datetime.utcnow()
+
+
+def material_content(material: Material) -> Optional[Dict[str, Any]]:
+    """The material's content document, assembled from chapters when it has them."""
+    if material.chapters:
+        return {
+            "title": material.title,
+            "chapters": [
+                {"number": chapter.number, "title": chapter.title, "content": chapter.content}
+                for chapter in material.chapters
+            ]
+        }
+    if material.generated_content:
+        return json.loads(material.generated_content)
+    return None
+
+
+def material_content_hash(material: Material) -> str:
+    """Hash identifying the material's current content, without assembling it."""
+    digest = hashlib.sha256()
+    digest.update(material.title.encode("utf-8"))
+    if material.chapters:
+        for chapter in material.chapters:
+            digest.update(f"\0{chapter.number}\0{chapter.title}\0{chapter.content_hash}".encode("utf-8"))
+    else:
+        digest.update(b"\0legacy\0" + (material.generated_content or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def material_response_content(material: Material) -> Any:
+    """The material's content for API responses: the parsed document, or legacy non-JSON text as is."""
+    try:
+        return material_content(material)
+    except ValueError:
+        return material.generated_content
+
+
+def save_generated_material(
+    db: Session,
+    user_id: int,
+    title: str,
+    chapters: List[Dict[str, Any]],
+    generated_content: Dict[str, Any],
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int
+) -> Material:
+    """Store a generated material and its token usage in one transaction."""
+    estimated_cost = llm_service.estimate_cost(prompt_tokens, completion_tokens, model)
+
+    material = Material(
+        user_id=user_id,
+        title=title,
+        table_of_contents=json.dumps(chapters)
+    )
+    material.chapters = [
+        Chapter(
+            number=chapter["number"],
+            title=chapter["title"],
+            content=chapter["content"],
+            content_hash=content_hash(chapter["content"])
+        )
+        for chapter in generated_content["chapters"]
+    ]
+    db.add(material)
+
+    record_token_usage(db, user_id, model, prompt_tokens, completion_tokens, estimated_cost)
+
+    db.commit()
+    db.refresh(material)
+    return material
+
+
+def save_token_usage(db: Session, user_id: int, model: str, prompt_tokens: int, completion_tokens: int):
+    """Record tokens spent on a generation that did not produce a material (e.g. a stream cut short)."""
+    estimated_cost = llm_service.estimate_cost(prompt_tokens, completion_tokens, model)
+    record_token_usage(db, user_id, model, prompt_tokens, completion_tokens, estimated_cost)
+    db.commit()
+
+
+def needs_migration(db: Session, sample: int = 50) -> bool:
+    """Whether books are still stored as JSON blobs, checking up to `sample` candidates."""
+    candidates = db.query(Material.title, Material.generated_content).filter(
+        Material.generated_content.like("{%"),
+        ~Material.chapters.any()
+    ).limit(sample)
+    for title, generated_content in candidates:
+        try:
+            if _parse_chapters(title, json.loads(generated_content)) is not None:
+                return True
+        except ValueError:
+            pass
+    return False
+
+
+def migrate_content_blobs(db: Session, batch_size: int = 100) -> int:
+    """Move legacy generated_content JSON blobs into Chapter rows.
+
+    Blobs that are not a generated book are left in place. Returns the number
+    of materials migrated.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        materials = db.query(Material).options(selectinload(Material.chapters)).filter(
+            Material.generated_content.isnot(None),
+            Material.id > last_id
+        ).order_by(Material.id).limit(batch_size).all()
+        if not materials:
+            break
+        for material in materials:
+            try:
+                chapters = _parse_chapters(material.title, json.loads(material.generated_content))
+            except ValueError:
+                chapters = None
+            if chapters is not None and not material.chapters:
+                _sync_chapters(material, chapters)
+                material.generated_content = None
+                # Keep updated_at as is; migrating is not an edit
+                flag_modified(material, "updated_at")
+                migrated += 1
+        last_id = materials[-1].id
+        db.commit()
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain stored material content.")
+    parser.add_argument("command", choices=["migrate"])
+    parser.parse_args()
+
+    from app.database import Base, SessionLocal, engine
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        migrated = migrate_content_blobs(db)
+        print(f"Migrated {migrated} materials to chapter rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -33,18 +33,84 @@ class TokenUsage(Base):
     # Relationships
     user = relationship("User", back_populates="token_usage")
 
+    __table_args__ = (
+        # Serves the per-user "most recent usage" query
+        Index("ix_token_usage_user_id_timestamp", "user_id", "timestamp"),
+    )
+
+
+class UserUsageRollup(Base):
+    """Token usage per user, model and UTC day, kept in step with TokenUsage inserts."""
+    __tablename__ = "user_usage_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    model_used = Column(String, nullable=False)
+    bucket_date = Column(Date, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    total_tokens = Column(Integer, default=0, nullable=False)
+    estimated_cost = Column(Float, default=0.0, nullable=False)
+    request_count = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "model_used", "bucket_date", name="uq_user_usage_rollup_bucket"),
+        Index("ix_user_usage_rollups_user_id_bucket_date", "user_id", "bucket_date"),
+    )
+
 
 class Material(Base):
     __tablename__ = "materials"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
     title = Column(String, nullable=False)
     table_of_contents = Column(Text, nullable=False)  # JSON string
-    generated_content = Column(Text, nullable=True)  # JSON string
+    # Legacy JSON string; generated books are stored as Chapter rows instead
+    generated_content = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="materials")
+    chapters = relationship(
+        "Chapter",
+        back_populates="material",
+        order_by="Chapter.number",
+        cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        # Keyset pagination of a user's materials by (updated_at, id)
+        Index("ix_materials_user_id_updated_at_id", "user_id", "updated_at", "id"),
+    )
+
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of model, prompt and sampling params
+    model = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True, nullable=False)
+
+
+class Chapter(Base):
+    __tablename__ = "chapters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), index=True, nullable=False)
+    number = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # sha256 of content
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    material = relationship("Material", back_populates="chapters")
 
+    __table_args__ = (
+        UniqueConstraint("material_id", "number", name="uq_chapters_material_id_number"),
+    )
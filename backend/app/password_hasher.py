@@ -0,0 +1,88 @@
+"""
+Bounded executor for bcrypt password hashing.
+
+A bcrypt hash or check at cost 12 takes about a quarter of a second of CPU.
+Run in the request thread pool, a burst of logins (or a credential-stuffing
+attempt) would occupy every thread and stall unrelated requests. Hashing
+runs on a few dedicated threads instead; bcrypt releases the GIL while it
+works. The number of hashes queued or running is bounded, and callers get
+HashQueueFull beyond that rather than waiting in an unbounded queue.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from app.auth import get_password_hash, verify_password
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class HashQueueFull(Exception):
+    """Raised when too many password hashes are already queued or running."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on `workers` threads, with at most `max_pending` calls queued or running."""
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def _run(self, fn, *args):
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashQueueFull(f"{self._pending} password hashes are already pending")
+            self._pending += 1
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Whether a stored hash was made with a cost other than the configured one."""
+        # Hashes look like $2b$12$<salt and digest>
+        parts = hashed_password.split("$")
+        return len(parts) < 4 or parts[2] != f"{self.rounds:02d}"
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Singleton instance
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.BCRYPT_ROUNDS
+)
@@ -0,0 +1,214 @@
+"""
+Opt-in per-request profiling and span timing.
+
+A request is profiled when it carries "X-Profile: <PROFILING_TOKEN>" or
+is picked at random (PROFILING_SAMPLE_RATE). Its cProfile stats are kept in
+memory, with the spans timed while it ran, and can be downloaded from
+/debug/profiles as a .prof file (snakeviz, gprof2dot or flameprof turn it
+into a call graph or flame graph) or read there as text.
+
+cProfile sees the thread it is enabled in, i.e. the event loop, so other
+requests handled by the loop meanwhile show up in the profile too; only one
+request is profiled at a time. Exports rendered in the render pool's
+processes appear as a single "export.render" span.
+
+Spans (`span`, `traced`) time the steps a slow request is usually slow in:
+LLM calls, export rendering, database commits. Every span is also observed
+in the span_duration_seconds metric, profiled or not.
+"""
+import cProfile
+import functools
+import hmac
+import io
+import marshal
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.cache import LRUCache
+from app.metrics import SPAN_SECONDS
+
+PROFILE_HEADER = b"x-profile"
+
+# Spans of the request being profiled. The list is shared with copies of
+# the context (tasks, thread-pool calls, greenlets), so they add to it.
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("profile_spans", default=None)
+
+
+def record_span(name: str, seconds: float):
+    """Record a span timed elsewhere (e.g. in another process)."""
+    SPAN_SECONDS.observe(seconds, span=name)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def span(name: str):
+    """Time the block as span `name`, whether or not it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def traced(name: str):
+    """Decorator: time every call of a (sync) function as span `name`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_session_commits():
+    """Time every Session commit (flush included) as a "db.commit" span.
+
+    AsyncSession commits run on a Session too, so they are covered.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    @event.listens_for(Session, "before_commit")
+    def _before(session):
+        session.info["commit_start"] = time.perf_counter()
+
+    @event.listens_for(Session, "after_commit")
+    def _after(session):
+        start = session.info.pop("commit_start", None)
+        if start is not None:
+            record_span("db.commit", time.perf_counter() - start)
+
+    @event.listens_for(Session, "after_rollback")
+    def _rollback(session):
+        session.info.pop("commit_start", None)
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """Spans summed by name, as a Server-Timing header value."""
+    totals: Dict[str, float] = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+class _StoredStats:
+    """Stands in for a Profile so pstats.Stats can load stored stats."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfileStore:
+    """The most recent request profiles, in memory."""
+
+    def __init__(self, max_profiles: int):
+        self._profiles = LRUCache(max_entries=max_profiles)
+
+    def add(self, profile_id: str, info: Dict[str, Any], profile: cProfile.Profile):
+        profile.create_stats()
+        # marshal of the stats dict is the .prof file format (what dump_stats writes)
+        self._profiles.set(profile_id, {**info, "id": profile_id, "data": marshal.dumps(profile.stats)})
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Profile summaries (without the stats), newest first."""
+        return [
+            {key: value for key, value in entry.items() if key != "data"}
+            for entry in reversed(self._profiles.values())
+        ]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return self._profiles.get(profile_id)
+
+    @staticmethod
+    def as_text(entry: Dict[str, Any], sort: str = "cumulative", limit: int = 60) -> str:
+        """pstats report of a stored profile."""
+        stream = io.StringIO()
+        stats = pstats.Stats(_StoredStats(marshal.loads(entry["data"])), stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it with the admin header, and a sample of the rest."""
+
+    def __init__(self, app, store: ProfileStore, token: str = "", sample_rate: float = 0.0):
+        self.app = app
+        self.store = store
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        # cProfile allows one active profiler; requests arriving meanwhile run unprofiled
+        self._busy = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        if not self.token:
+            return False
+        return any(
+            name == PROFILE_HEADER and hmac.compare_digest(value, self.token)
+            for name, value in scope["headers"]
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/debug/profiles"):
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested(scope)
+        if not (requested or random.random() < self.sample_rate) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _spans.set(spans)
+        profile_id = uuid.uuid4().hex
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if requested:
+                    # Spans still running (e.g. in a streamed body) are not in the header
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                    if spans:
+                        headers.append((b"server-timing", server_timing(spans).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        profile = cProfile.Profile()
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                profile.disable()
+        finally:
+            seconds = time.perf_counter() - start
+            _spans.reset(token)
+            self._busy.release()
+            route = getattr(scope.get("route"), "path", None)
+            self.store.add(profile_id, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status_code,
+                "reason": "header" if requested else "sampled",
+                "started_at": started_at.isoformat(),
+                "seconds": round(seconds, 6),
+                "spans": [{"name": name, "seconds": round(value, 6)} for name, value in spans],
+            }, profile)
@@ -0,0 +1,58 @@
+"""
+In-process fixed-window rate limiting.
+
+Counts are kept per key (an IP address, a username...) in this process
+only; with several server processes each enforces its own limit.
+"""
+import threading
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+# Expired windows are swept once this many keys are tracked
+SWEEP_THRESHOLD = 10000
+
+
+class RateLimiter:
+    """Allows at most `limit` hits per key in each `window_seconds` window."""
+
+    def __init__(self, limit: int, window_seconds: float):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._windows: Dict[Hashable, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def _window(self, key: Hashable, now: float) -> Tuple[float, int]:
+        started, count = self._windows.get(key, (now, 0))
+        if now - started >= self.window_seconds:
+            return now, 0
+        return started, count
+
+    def retry_after(self, key: Hashable) -> Optional[float]:
+        """Seconds until `key` may be hit again, or None if it is not limited."""
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._window(key, now)
+        if count < self.limit:
+            return None
+        return started + self.window_seconds - now
+
+    def hit(self, key: Hashable) -> Optional[float]:
+        """Count a hit; returns retry_after() if `key` was already limited (the hit is not counted)."""
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._window(key, now)
+            if count >= self.limit:
+                return started + self.window_seconds - now
+            self._windows[key] = (started, count + 1)
+            if len(self._windows) > SWEEP_THRESHOLD:
+                self._sweep(now)
+        return None
+
+    def reset(self, key: Hashable):
+        with self._lock:
+            self._windows.pop(key, None)
+
+    def _sweep(self, now: float):
+        expired = [key for key, (started, _) in self._windows.items() if now - started >= self.window_seconds]
+        for key in expired:
+            del self._windows[key]
@@ -0,0 +1,124 @@
+"""
+Process pool for rendering DOCX/PDF exports.
+
+Rendering is pure Python and holds the GIL for the whole document, so running
+it in request threads stalls every other request handled by the worker. The
+pool runs renders in separate processes and lets the export endpoints await
+the result. The number of renders queued or running is bounded, and callers
+stop waiting after a timeout.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+from app.config import get_settings
+from app.metrics import EXPORT_RENDER_SECONDS, EXPORT_SIZE_BYTES
+from app.profiling import record_span
+
+settings = get_settings()
+
+
+class RenderQueueFull(Exception):
+    """Raised when too many renders are already queued or running."""
+
+
+def _render(fmt: str, material: Dict[str, Any], path: str) -> Tuple[float, int]:
+    """Render into `path`; returns the render time in seconds and the file size."""
+    # Imported here so worker processes only load what rendering needs
+    from app.document_service import document_exporter
+
+    exporters = {"docx": document_exporter.export_to_docx, "pdf": document_exporter.export_to_pdf}
+    if fmt not in exporters:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    # Written straight to disk so the file never has to be copied between
+    # processes. The caller creates the file; "r+b" fails rather than
+    # recreating it if the caller gave up and removed it in the meantime.
+    start = time.perf_counter()
+    with open(path, "r+b") as f:
+        exporters[fmt](material, f)
+        f.flush()
+        size = os.fstat(f.fileno()).st_size
+    return time.perf_counter() - start, size
+
+
+def _warm_worker():
+    import app.document_service  # noqa: F401
+
+
+class RenderPool:
+    """Runs exports in worker processes; workers=0 renders in a thread instead."""
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    # Spawn rather than fork: the server process runs threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_warm_worker
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(thread_name_prefix="render")
+            return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def render(self, fmt: str, material: Dict[str, Any], path: str):
+        """Render `material` as `fmt` into the file at `path`.
+
+        Raises RenderQueueFull when the queue is at capacity and
+        asyncio.TimeoutError when the render takes longer than the timeout.
+        """
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise RenderQueueFull(f"{self._pending} exports are already being rendered")
+            self._pending += 1
+        try:
+            future = executor.submit(_render, fmt, material, path)
+        except BaseException:
+            self._release(None)
+            raise
+        # A timed-out render keeps its slot until the worker is done with it
+        future.add_done_callback(self._release)
+        try:
+            seconds, size = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise
+        # Measured in the worker, so time spent queued is not included
+        EXPORT_RENDER_SECONDS.observe(seconds, format=fmt)
+        EXPORT_SIZE_BYTES.observe(size, format=fmt)
+        record_span("export.render", seconds)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Singleton instance
+render_pool = RenderPool(
+    workers=settings.EXPORT_RENDER_WORKERS,
+    max_pending=settings.EXPORT_RENDER_MAX_PENDING,
+    timeout=settings.EXPORT_RENDER_TIMEOUT_SECONDS
+)
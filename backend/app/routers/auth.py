@@ -1,30 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import math
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import User
-from app.schemas import UserCreate, UserLogin, UserResponse, Token
-from app.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from app.schemas import CurrentUser, UserCreate, UserLogin, UserResponse, Token
+from app.auth import create_access_token, get_current_user
+from app.config import get_settings
+from app.password_hasher import password_hasher, HashQueueFull
+from app.rate_limit import RateLimiter
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
+settings = get_settings()
 
+# Login/register attempts per client address, and failed logins per username
+ip_limiter = RateLimiter(settings.AUTH_ATTEMPTS_PER_IP, settings.AUTH_ATTEMPTS_PER_IP_WINDOW_SECONDS)
+username_limiter = RateLimiter(
+    settings.LOGIN_FAILURES_PER_USERNAME, settings.LOGIN_FAILURES_PER_USERNAME_WINDOW_SECONDS
+)
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+
+def _too_many_attempts(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts, please try again later",
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+
+def _throttle_client(request: Request):
+    retry_after = ip_limiter.hit(request.client.host if request.client else None)
+    if retry_after is not None:
+        raise _too_many_attempts(retry_after)
+
+
+async def _hash_password(call, *args):
+    """Run a password_hasher call, turning a full hashing queue into a 503."""
+    try:
+        return await call(*args)
+    except HashQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def _check_new_user(db: AsyncSession, user_data: UserCreate):
     # Check if user already exists
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await db.scalar(select(User.id).where(User.email == user_data.email).limit(1)) is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    if db.query(User).filter(User.username == user_data.username).first():
+    if await db.scalar(select(User.id).where(User.username == user_data.username).limit(1)) is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
+
+
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def register(user_data: UserCreate, request: Request, db: AsyncSession = Depends(get_db)):
+    _throttle_client(request)
+    await _check_new_user(db, user_data)
+    # Don't hold a connection while the password is hashed
+    await db.rollback()
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await _hash_password(password_hasher.hash, user_data.password)
     new_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -32,31 +77,55 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return new_user
 
 
+async def _find_user(db: AsyncSession, username: str):
+    user = await db.scalar(select(User).where(User.username == username).limit(1))
+    # Don't hold a connection while the password is checked (committing,
+    # unlike rolling back, leaves the user loaded)
+    await db.commit()
+    return user
+
+
 @router.post("/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
+    _throttle_client(request)
+    retry_after = username_limiter.retry_after(user_data.username)
+    if retry_after is not None:
+        raise _too_many_attempts(retry_after)
+    
     # Find user
-    user = db.query(User).filter(User.username == user_data.username).first()
+    user = await _find_user(db, user_data.username)
     
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not user or not await _hash_password(password_hasher.verify, user_data.password, user.hashed_password):
+        username_limiter.hit(user_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    username_limiter.reset(user_data.username)
+    claims = {"sub": user.username, "uid": user.id}
+    
+    # Upgrade the stored hash when BCRYPT_ROUNDS has changed since it was made
+    if password_hasher.needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await password_hasher.hash(user_data.password)
+            await db.commit()
+        except HashQueueFull:
+            pass  # Upgraded on a later login
     
     # Create access token
-    access_token = create_access_token(data={"sub": user.username})
+    # "uid" lets requests load the user by primary key, or skip loading it while cached
+    access_token = create_access_token(data=claims)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: CurrentUser = Depends(get_current_user)):
     return current_user
-
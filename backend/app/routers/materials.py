@@ -1,19 +1,53 @@
+import asyncio
+import base64
+import gzip
 import json
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.models import User, Material, TokenUsage
+from datetime import datetime
+import anyio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, selectinload
+from typing import Any, Dict, List, Optional, Tuple
+from app.database import get_db, AsyncSessionLocal
+from app.models import Material, Chapter
 from app.schemas import (
+    CurrentUser,
     MaterialGenerationRequest,
     MaterialGenerationResponse,
+    MaterialEstimateRequest,
+    MaterialCostEstimate,
     MaterialResponse,
-    MaterialUpdate
+    MaterialSummary,
+    MaterialSummaryPage,
+    MaterialUpdate,
+    BulkExportRequest,
+    ChapterSummary,
+    ChapterResponse,
+    ChapterUpdate,
+    GenerationJobResponse,
+    GenerationJobStatus
 )
 from app.auth import get_current_user
-from app.llm_service import llm_service
+from app.llm_service import llm_service, SUPPORTED_MODELS
+from app.material_service import (
+    save_generated_material,
+    save_token_usage,
+    set_material_content,
+    material_content,
+    material_response_content,
+    material_content_hash,
+    content_hash
+)
+from app.compression import brotli, preferred_encoding
 from app.document_service import document_exporter
+from app.export_cache import export_cache
+from app.export_archive import ZipStream
+from app.generation_jobs import generation_queue
+from app.render_pool import render_pool, RenderQueueFull
+from app.metrics import EXPORT_RENDER_SECONDS, EXPORT_SIZE_BYTES, GENERATIONS_IN_FLIGHT
 from app.config import get_settings
 
 router = APIRouter(prefix="/materials", tags=["materials"])
@@ -23,95 +57,231 @@ settings = get_settings()
 @router.get("/models/pricing")
 def get_model_pricing():
     """Get pricing information for all available models."""
-    models = ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo", "gpt-5"]
     pricing_info = {}
-    for model in models:
+    for model in SUPPORTED_MODELS:
         pricing_info[model] = llm_service.get_pricing_info(model)
     return pricing_info
 
 
-@router.post("/generate", response_model=MaterialGenerationResponse)
-def generate_material(
-    request: MaterialGenerationRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.post("/estimate", response_model=MaterialCostEstimate)
+def estimate_material(
+    request: MaterialEstimateRequest,
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Verify generation password to protect API usage
+    """Predict prompt tokens and worst-case cost before generating anything."""
+    chapters_data = [{"title": ch.title, "description": ch.description} for ch in request.chapters]
+    return llm_service.estimate_material(chapters_data, request.model)
+
+
+def _verify_generation_password(request: MaterialGenerationRequest):
+    """Verify generation password to protect API usage."""
     if request.generation_password != settings.GENERATION_PASSWORD:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid generation password. Access denied."
         )
+
+
+@router.post("/generate", response_model=MaterialGenerationResponse)
+async def generate_material(
+    request: MaterialGenerationRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    _verify_generation_password(request)
     
     try:
         # Generate content using LLM
         chapters_data = [{"title": ch.title, "description": ch.description} for ch in request.chapters]
-        generated_content, prompt_tokens, completion_tokens = llm_service.generate_material(
-            request.title,
-            chapters_data,
-            request.model
-        )
-        
-        total_tokens = prompt_tokens + completion_tokens
-        estimated_cost = llm_service.estimate_cost(prompt_tokens, completion_tokens, request.model)
+        with GENERATIONS_IN_FLIGHT.track_inprogress(kind="request"):
+            generated_content, prompt_tokens, completion_tokens, cache_hits = await llm_service.generate_material_async(
+                request.title,
+                chapters_data,
+                request.model,
+                bypass_cache=request.force_regenerate
+            )
         
-        # Save material to database
-        material = Material(
+        material = await db.run_sync(
+            save_generated_material,
             user_id=current_user.id,
             title=request.title,
-            table_of_contents=json.dumps([ch.dict() for ch in request.chapters]),
-            generated_content=json.dumps(generated_content)
-        )
-        db.add(material)
-        
-        # Save token usage
-        token_usage = TokenUsage(
-            user_id=current_user.id,
+            chapters=chapters_data,
+            generated_content=generated_content,
+            model=request.model,
             prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            total_tokens=total_tokens,
-            estimated_cost=estimated_cost,
-            model_used=request.model
+            completion_tokens=completion_tokens
         )
-        db.add(token_usage)
-        
-        db.commit()
-        db.refresh(material)
         
         return MaterialGenerationResponse(
             material_id=material.id,
             generated_content=generated_content,
-            tokens_used=total_tokens,
-            estimated_cost=estimated_cost
+            tokens_used=prompt_tokens + completion_tokens,
+            estimated_cost=llm_service.estimate_cost(prompt_tokens, completion_tokens, request.model),
+            cache_hits=cache_hits
         )
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating material: {str(e)}"
         )
 
 
-@router.get("/", response_model=List[MaterialResponse])
-def get_user_materials(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.post("/generate/jobs", response_model=GenerationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def submit_generation_job(
+    request: MaterialGenerationRequest,
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    materials = db.query(Material).filter(Material.user_id == current_user.id).all()
-    return materials
+    """Queue a material generation and return immediately with a job id to poll."""
+    _verify_generation_password(request)
+    
+    chapters_data = [{"title": ch.title, "description": ch.description} for ch in request.chapters]
+    job = generation_queue.submit(
+        current_user.id,
+        request.title,
+        chapters_data,
+        request.model,
+        bypass_cache=request.force_regenerate
+    )
+    return GenerationJobResponse(job_id=job.id, status=job.status)
 
 
-@router.get("/{material_id}", response_model=MaterialResponse)
-def get_material(
-    material_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _save_stream_usage(user_id: int, model: str, prompt_tokens: int, completion_tokens: int):
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(save_token_usage, user_id, model, prompt_tokens, completion_tokens)
+    except Exception as e:
+        print(f"Warning: Could not record token usage of an unfinished stream: {e}")
+
+
+@router.post("/generate/stream")
+async def generate_material_stream(
+    request: MaterialGenerationRequest,
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    material = db.query(Material).filter(
+    """Generate material chapter by chapter, streaming tokens as server-sent events.
+
+    Events: chapter_start, delta, chapter_end, done (with material_id) or error.
+    The material and its token usage are saved before the done event is sent.
+    If the stream ends early (an error, or the client disconnecting), no
+    material is saved but the tokens spent on finished chapters are recorded.
+    """
+    _verify_generation_password(request)
+    
+    user_id = current_user.id
+    chapters_data = [{"title": ch.title, "description": ch.description} for ch in request.chapters]
+    
+    async def event_stream():
+        GENERATIONS_IN_FLIGHT.inc(kind="stream")
+        generated_content = {"title": request.title, "chapters": []}
+        total_prompt_tokens = 0
+        total_completion_tokens = 0
+        cache_hits = 0
+        previous_chapters = []
+        saved = False
+        
+        try:
+            for i, chapter in enumerate(chapters_data, 1):
+                chapter_title = chapter["title"]
+                yield _sse_event("chapter_start", {"number": i, "title": chapter_title})
+                
+                parts = []
+                async for event in llm_service.stream_chapter_content_async(
+                    chapter_title,
+                    chapter["description"] or "",
+                    previous_chapters,
+                    request.model,
+                    bypass_cache=request.force_regenerate
+                ):
+                    if "delta" in event:
+                        parts.append(event["delta"])
+                        yield _sse_event("delta", {"number": i, "content": event["delta"]})
+                    else:
+                        prompt_tokens, completion_tokens = event["usage"]
+                        cached = event["cached"]
+                
+                total_prompt_tokens += prompt_tokens
+                total_completion_tokens += completion_tokens
+                cache_hits += cached
+                previous_chapters.append(chapter_title)
+                generated_content["chapters"].append({
+                    "number": i,
+                    "title": chapter_title,
+                    "content": "".join(parts)
+                })
+                yield _sse_event("chapter_end", {
+                    "number": i,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "cached": cached
+                })
+            
+            # The request's DB session is closed once streaming starts, so use our own
+            async with AsyncSessionLocal() as db:
+                material = await db.run_sync(
+                    save_generated_material,
+                    user_id=user_id,
+                    title=request.title,
+                    chapters=chapters_data,
+                    generated_content=generated_content,
+                    model=request.model,
+                    prompt_tokens=total_prompt_tokens,
+                    completion_tokens=total_completion_tokens
+                )
+            saved = True
+            
+            yield _sse_event("done", {
+                "material_id": material.id,
+                "tokens_used": total_prompt_tokens + total_completion_tokens,
+                "estimated_cost": llm_service.estimate_cost(
+                    total_prompt_tokens, total_completion_tokens, request.model
+                ),
+                "cache_hits": cache_hits
+            })
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Error generating material: {str(e)}"})
+        finally:
+            GENERATIONS_IN_FLIGHT.dec(kind="stream")
+            if not saved and (total_prompt_tokens or total_completion_tokens):
+                # A disconnect cancels the stream; finish recording regardless
+                with anyio.CancelScope(shield=True):
+                    await _save_stream_usage(user_id, request.model, total_prompt_tokens, total_completion_tokens)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=GenerationJobStatus)
+async def get_generation_job(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Get the status and per-chapter progress of a generation job."""
+    job = generation_queue.get(job_id)
+    
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return job.to_dict()
+
+
+async def _get_material(db: AsyncSession, user_id: int, material_id: int) -> Material:
+    """The user's material with its chapters loaded (async sessions can't load them lazily)."""
+    material = await db.scalar(select(Material).options(selectinload(Material.chapters)).where(
         Material.id == material_id,
-        Material.user_id == current_user.id
-    ).first()
+        Material.user_id == user_id
+    ))
     
     if not material:
         raise HTTPException(
@@ -122,138 +292,513 @@ def get_material(
     return material
 
 
+def _material_response(material: Material) -> MaterialResponse:
+    return MaterialResponse(
+        id=material.id,
+        title=material.title,
+        table_of_contents=material.table_of_contents,
+        generated_content=material_response_content(material),
+        created_at=material.created_at,
+        updated_at=material.updated_at
+    )
+
+
+@router.get("/", response_model=List[MaterialResponse])
+async def get_user_materials(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    materials = (await db.scalars(select(Material).options(selectinload(Material.chapters)).where(
+        Material.user_id == current_user.id
+    ))).all()
+    return [_material_response(material) for material in materials]
+
+
+def _encode_cursor(material: Material) -> str:
+    raw = json.dumps([material.updated_at.isoformat(), material.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        updated_at, material_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(updated_at), int(material_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+@router.get("/summary", response_model=MaterialSummaryPage)
+async def get_user_material_summaries(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """List materials without their content, newest first, with keyset pagination."""
+    query = select(Material).options(defer(Material.generated_content)).where(
+        Material.user_id == current_user.id
+    )
+    
+    if cursor:
+        updated_at, material_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            Material.updated_at < updated_at,
+            and_(Material.updated_at == updated_at, Material.id < material_id)
+        ))
+    
+    # Fetch one extra row to know whether another page exists
+    materials = (await db.scalars(
+        query.order_by(Material.updated_at.desc(), Material.id.desc()).limit(limit + 1)
+    )).all()
+    has_more = len(materials) > limit
+    materials = materials[:limit]
+    
+    items = [
+        MaterialSummary(
+            id=material.id,
+            title=material.title,
+            chapter_count=len(json.loads(material.table_of_contents)),
+            created_at=material.created_at,
+            updated_at=material.updated_at
+        )
+        for material in materials
+    ]
+    
+    return MaterialSummaryPage(
+        items=items,
+        next_cursor=_encode_cursor(materials[-1]) if has_more else None
+    )
+
+
+@router.get("/{material_id}", response_model=MaterialResponse)
+async def get_material(
+    material_id: int,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    material = await _get_material(db, current_user.id, material_id)
+    
+    return _material_response(material)
+
+
 @router.put("/{material_id}", response_model=MaterialResponse)
-def update_material(
+async def update_material(
     material_id: int,
     update_data: MaterialUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    material = db.query(Material).filter(
+    material = await _get_material(db, current_user.id, material_id)
+    
+    await db.run_sync(set_material_content, material, update_data.generated_content)
+    await db.commit()
+    export_cache.invalidate(material.id)
+    
+    return _material_response(material)
+
+
+async def _get_chapter(db: AsyncSession, user_id: int, material_id: int, number: int) -> Chapter:
+    chapter = await db.scalar(select(Chapter).join(Material).where(
         Material.id == material_id,
-        Material.user_id == current_user.id
-    ).first()
+        Material.user_id == user_id,
+        Chapter.number == number
+    ))
     
-    if not material:
+    if not chapter:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Material not found"
+            detail="Chapter not found"
         )
     
-    material.generated_content = update_data.generated_content
-    db.commit()
-    db.refresh(material)
-    
-    return material
+    return chapter
 
 
-@router.delete("/{material_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_material(
+@router.get("/{material_id}/chapters", response_model=List[ChapterSummary])
+async def get_material_chapters(
     material_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    material = db.query(Material).filter(
+    """List a material's chapters without their content."""
+    owned = await db.scalar(select(Material.id).where(
         Material.id == material_id,
         Material.user_id == current_user.id
-    ).first()
-    
-    if not material:
+    ))
+    if owned is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Material not found"
         )
     
-    db.delete(material)
-    db.commit()
+    return (await db.scalars(select(Chapter).options(defer(Chapter.content)).where(
+        Chapter.material_id == material_id
+    ).order_by(Chapter.number))).all()
+
+
+@router.get("/{material_id}/chapters/{number}", response_model=ChapterResponse)
+async def get_material_chapter(
+    material_id: int,
+    number: int,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await _get_chapter(db, current_user.id, material_id, number)
+
+
+@router.patch("/{material_id}/chapters/{number}", response_model=ChapterResponse)
+async def update_material_chapter(
+    material_id: int,
+    number: int,
+    update_data: ChapterUpdate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Update one chapter's title and/or content without touching the others."""
+    chapter = await _get_chapter(db, current_user.id, material_id, number)
     
-    return None
+    if update_data.title is not None:
+        chapter.title = update_data.title
+    if update_data.content is not None:
+        chapter.content = update_data.content
+        chapter.content_hash = content_hash(update_data.content)
+    await db.execute(
+        update(Material).where(Material.id == material_id).values(updated_at=datetime.utcnow()),
+        execution_options={"synchronize_session": False}
+    )
+    await db.commit()
+    await db.refresh(chapter)
+    export_cache.invalidate(material_id)
+    
+    return chapter
 
 
-@router.get("/{material_id}/export/docx")
-def export_material_docx(
+@router.delete("/{material_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_material(
     material_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Export material to DOCX format."""
-    material = db.query(Material).filter(
-        Material.id == material_id,
-        Material.user_id == current_user.id
-    ).first()
+    material = await _get_material(db, current_user.id, material_id)
     
-    if not material:
+    await db.delete(material)
+    await db.commit()
+    export_cache.invalidate(material_id)
+    
+    return None
+
+
+EXPORT_FORMATS = {
+    "docx": ("DOCX", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "pdf": ("PDF", "application/pdf"),
+}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def _load_export(db: AsyncSession, user_id: int, material_id: int, fmt: str):
+    """Look up the material and the cache key of its export (loads the chapters)."""
+    material = await _get_material(db, user_id, material_id)
+    return material, export_cache.key(material.id, material_content_hash(material), fmt)
+
+
+def _exportable_content(material: Material, name: str = "Material") -> Dict[str, Any]:
+    """The material's content document, or a 400 when there is nothing exportable."""
+    try:
+        content = material_content(material)
+    except ValueError:
+        # Content saved through PUT /materials/{id} is not checked to be JSON
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Material not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name} content is not a valid material document and cannot be exported"
         )
-    
-    if not material.generated_content:
+    if content is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Material has no generated content to export"
+            detail=f"{name} has no generated content to export"
         )
+    return content
+
+
+def _safe_filename(title: str, fmt: str) -> str:
+    safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    return f"{safe_title}.{fmt}"
+
+
+async def _render_to_cache(material_id: int, key: str, fmt: str, content: Dict[str, Any]):
+    """Render an export in the render pool and store it in the export cache."""
+    # Rendered straight into a file that is then served from the cache
+    tmp_path = export_cache.temp_path()
+    try:
+        await render_pool.render(fmt, content, str(tmp_path))
+        return await run_in_threadpool(export_cache.commit, material_id, key, fmt, tmp_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+async def _export_material(
+    db: AsyncSession,
+    user_id: int,
+    material_id: int,
+    fmt: str,
+    if_none_match: Optional[str]
+) -> Response:
+    """Serve a cached export, rendering it in the render pool when the content has changed."""
+    label, media_type = EXPORT_FORMATS[fmt]
+    material, key = await _load_export(db, user_id, material_id, fmt)
+    # Everything needed is loaded; don't hold a connection while rendering
+    await db.close()
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
     try:
-        content = json.loads(material.generated_content)
-        docx_buffer = document_exporter.export_to_docx(content)
-        
-        # Create safe filename
-        safe_title = "".join(c for c in material.title if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        filename = f"{safe_title}.docx"
+        path = export_cache.get(material.id, key, fmt)
+        if path is None:
+            content = _exportable_content(material)
+            path = await _render_to_cache(material.id, key, fmt, content)
         
-        return StreamingResponse(
-            docx_buffer,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        filename = _safe_filename(material.title, fmt)
+        return FileResponse(
+            path,
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename={filename}", **headers}
+        )
+    except HTTPException:
+        raise
+    except RenderQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many exports in progress, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Timed out exporting to {label}"
         )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error exporting to DOCX: {str(e)}"
+            detail=f"Error exporting to {label}: {str(e)}"
         )
 
 
+@router.get("/{material_id}/export/docx")
+async def export_material_docx(
+    material_id: int,
+    if_none_match: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Export material to DOCX format."""
+    return await _export_material(db, current_user.id, material_id, "docx", if_none_match)
+
+
 @router.get("/{material_id}/export/pdf")
-def export_material_pdf(
+async def export_material_pdf(
     material_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Export material to PDF format."""
-    material = db.query(Material).filter(
-        Material.id == material_id,
-        Material.user_id == current_user.id
-    ).first()
+    return await _export_material(db, current_user.id, material_id, "pdf", if_none_match)
+
+
+# Cached HTML variants by content encoding, in order of preference
+HTML_ENCODINGS = {"br": "html.br", "gzip": "html.gz", "identity": "html"}
+
+
+def _compress_html(html: str) -> Dict[str, bytes]:
+    """Every HTML_ENCODINGS variant of a document, compressed as hard as possible once."""
+    data = html.encode("utf-8")
+    variants = {"identity": data, "gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+async def _load_html_export(db: AsyncSession, user_id: int, material_id: int, number: Optional[int]):
+    """Cache key of a material's HTML (or one chapter's) and a function rendering it."""
+    if number is None:
+        material, key = await _load_export(db, user_id, material_id, "html")
+        content = _exportable_content(material)
+        return key, lambda: document_exporter.export_to_html(content)
     
-    if not material:
+    chapter = await _get_chapter(db, user_id, material_id, number)
+    chapter_data = {"number": chapter.number, "title": chapter.title, "content": chapter.content}
+    key = export_cache.key(material_id, content_hash(f"{chapter.title}\0{chapter.content_hash}"), f"html:{number}")
+    return key, lambda: document_exporter.export_chapter_to_html(chapter_data)
+
+
+def _cached_html(material_id: int, key: str, encoding: str, render):
+    """Path of the cached HTML variant, rendering and caching every variant if it is missing."""
+    path = export_cache.get(material_id, key, HTML_ENCODINGS[encoding])
+    if path is None:
+        with EXPORT_RENDER_SECONDS.time(format="html"):
+            variants = _compress_html(render())
+        EXPORT_SIZE_BYTES.observe(len(variants["identity"]), format="html")
+        # The requested variant goes last so writing the others can't evict it
+        for variant in sorted(variants, key=lambda name: name == encoding):
+            path = export_cache.put(material_id, key, HTML_ENCODINGS[variant], variants[variant])
+    return path
+
+
+@router.get("/{material_id}/export/html")
+async def export_material_html(
+    material_id: int,
+    chapter: Optional[int] = None,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Export material to a styled HTML document, or one chapter as a <section>.
+    
+    Rendered once per content version and stored pre-compressed (brotli when
+    available, gzip), so repeated fetches only send a file.
+    """
+    key, render = await _load_html_export(db, current_user.id, material_id, chapter)
+    encoding = preferred_encoding(accept_encoding, [
+        encoding for encoding in HTML_ENCODINGS if encoding != "br" or brotli is not None
+    ])
+    etag = f'"{key}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    try:
+        path = await run_in_threadpool(_cached_html, material_id, key, encoding, render)
+    except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Material not found"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error exporting to HTML: {str(e)}"
         )
     
-    if not material.generated_content:
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return FileResponse(path, media_type="text/html; charset=utf-8", headers=headers)
+
+
+async def _load_bulk_export(db: AsyncSession, user_id: int, material_ids: List[int], formats: List[str]):
+    """(material id, filename, format, cache key, content) for every requested export."""
+    materials = (await db.scalars(select(Material).options(selectinload(Material.chapters)).where(
+        Material.id.in_(material_ids),
+        Material.user_id == user_id
+    ))).all()
+    by_id = {material.id: material for material in materials}
+    missing = [material_id for material_id in material_ids if material_id not in by_id]
+    if missing:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Material has no generated content to export"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Materials not found: {', '.join(map(str, missing))}"
         )
     
+    entries = []
+    for material_id in material_ids:
+        material = by_id[material_id]
+        content = _exportable_content(material, f"Material {material_id}")
+        digest = material_content_hash(material)
+        for fmt in formats:
+            key = export_cache.key(material_id, digest, fmt)
+            entries.append((material_id, _safe_filename(material.title, fmt), fmt, key, content))
+    return entries
+
+
+async def _bulk_export_stream(entries):
+    """Stream a ZIP archive of the entries, adding each export as soon as it is ready."""
+    # Leave room in the render queue for single exports
+    semaphore = asyncio.Semaphore(max(1, render_pool.workers))
+    
+    async def produce(entry):
+        material_id, filename, fmt, key, content = entry
+        try:
+            path = export_cache.get(material_id, key, fmt)
+            if path is None:
+                async with semaphore:
+                    deadline = asyncio.get_running_loop().time() + render_pool.timeout
+                    while True:
+                        try:
+                            path = await _render_to_cache(material_id, key, fmt, content)
+                            break
+                        except RenderQueueFull:
+                            if asyncio.get_running_loop().time() > deadline:
+                                raise
+                            await asyncio.sleep(1)
+            return filename, path, None
+        except asyncio.TimeoutError:
+            return filename, None, "timed out"
+        except Exception as e:
+            return filename, None, str(e) or e.__class__.__name__
+    
+    tasks = [asyncio.create_task(produce(entry)) for entry in entries]
+    archive = ZipStream()
+    errors = []
     try:
-        content = json.loads(material.generated_content)
-        pdf_buffer = document_exporter.export_to_pdf(content)
-        
-        # Create safe filename
-        safe_title = "".join(c for c in material.title if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        filename = f"{safe_title}.pdf"
-        
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        for next_done in asyncio.as_completed(tasks):
+            filename, path, error = await next_done
+            if error is None:
+                try:
+                    yield await run_in_threadpool(archive.write_file, archive.unique_name(filename), path)
+                    continue
+                except FileNotFoundError:
+                    # Evicted or invalidated between rendering and zipping
+                    error = "export was removed before it could be added"
+            errors.append(f"{filename}: {error}")
+        if errors:
+            yield archive.write_bytes("errors.txt", ("\n".join(errors) + "\n").encode("utf-8"))
+        yield archive.close()
+    finally:
+        # Stop rendering if the client went away
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/export/bulk")
+async def export_materials_bulk(
+    request: BulkExportRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Export several materials as one ZIP archive, streamed as renders finish.
+    
+    Exports that fail are listed in an errors.txt entry, since the response
+    status has already been sent by then.
+    """
+    material_ids = list(dict.fromkeys(request.material_ids))
+    formats = list(dict.fromkeys(request.formats))
+    if not material_ids or not formats:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one material and one format are required"
         )
-    except Exception as e:
+    if len(material_ids) > settings.BULK_EXPORT_MAX_MATERIALS:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error exporting to PDF: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BULK_EXPORT_MAX_MATERIALS} materials can be exported at once"
         )
-
+    unsupported = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unsupported:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported formats: {', '.join(unsupported)}"
+        )
+    
+    entries = await _load_bulk_export(db, current_user.id, material_ids, formats)
+    return StreamingResponse(
+        _bulk_export_stream(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=materials.zip"}
+    )
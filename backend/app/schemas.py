@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 
 
 # User Schemas
@@ -25,6 +25,14 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class CurrentUser(UserResponse):
+    """The authenticated user, detached from any DB session so it can be cached."""
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -40,11 +48,15 @@ class ChapterInput(BaseModel):
     description: Optional[str] = ""
 
 
-class MaterialGenerationRequest(BaseModel):
+class MaterialEstimateRequest(BaseModel):
     title: str
     chapters: List[ChapterInput]
     model: str = "gpt-4o-mini"  # gpt-4o-mini, gpt-4o, gpt-4-turbo, gpt-3.5-turbo, gpt-5
+
+
+class MaterialGenerationRequest(MaterialEstimateRequest):
     generation_password: str  # Password required to use API for generation
+    force_regenerate: bool = False  # Skip the generation cache and always call the API
 
 
 class MaterialGenerationResponse(BaseModel):
@@ -52,6 +64,51 @@ class MaterialGenerationResponse(BaseModel):
     generated_content: Dict[str, Any]
     tokens_used: int
     estimated_cost: float
+    cache_hits: int = 0  # Chapters served from the generation cache at no cost
+
+
+class ChapterEstimate(BaseModel):
+    number: int
+    title: str
+    prompt_tokens: int
+    max_completion_tokens: int
+
+
+class MaterialCostEstimate(BaseModel):
+    model: str
+    chapters: List[ChapterEstimate]
+    prompt_tokens: int
+    max_completion_tokens: int
+    prompt_cost: float
+    worst_case_cost: float  # Every chapter uses its full completion budget
+
+    model_config = {"protected_namespaces": ()}
+
+
+class GenerationJobResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+class GenerationJobChapter(BaseModel):
+    number: int
+    title: str
+    status: str
+
+
+class GenerationJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed
+    total_chapters: int
+    completed_chapters: int
+    chapters: List[GenerationJobChapter]
+    material_id: Optional[int] = None
+    tokens_used: int = 0
+    estimated_cost: float = 0.0
+    cache_hits: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
 
 
 # Token Usage Schemas
@@ -70,11 +127,20 @@ class TokenUsageResponse(BaseModel):
     }
 
 
+class UsageBucket(BaseModel):
+    period_start: date
+    total_tokens: int
+    total_cost: float
+    request_count: int
+
+
 class TokenUsageSummary(BaseModel):
     total_tokens: int
     total_cost: float
     usage_by_model: Dict[str, Dict[str, Any]]
     recent_usage: List[TokenUsageResponse]
+    granularity: str = "day"
+    timeline: List[UsageBucket] = []
 
 
 # Material Schemas
@@ -82,7 +148,7 @@ class MaterialResponse(BaseModel):
     id: int
     title: str
     table_of_contents: str
-    generated_content: Optional[str]
+    generated_content: Optional[Any]  # {"title", "chapters"} document; legacy content as stored
     created_at: datetime
     updated_at: datetime
 
@@ -90,6 +156,44 @@ class MaterialResponse(BaseModel):
         from_attributes = True
 
 
+class MaterialSummary(BaseModel):
+    id: int
+    title: str
+    chapter_count: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class MaterialSummaryPage(BaseModel):
+    items: List[MaterialSummary]
+    next_cursor: Optional[str] = None  # Pass as ?cursor= to get the next page
+
+
 class MaterialUpdate(BaseModel):
     generated_content: str
 
+
+class BulkExportRequest(BaseModel):
+    material_ids: List[int]
+    formats: List[str] = ["pdf"]  # "pdf" and/or "docx"
+
+
+# Chapter Schemas
+class ChapterSummary(BaseModel):
+    number: int
+    title: str
+    content_hash: str
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ChapterResponse(ChapterSummary):
+    content: str
+
+
+class ChapterUpdate(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+
@@ -0,0 +1,189 @@
+"""
+Per-user, per-model, per-day token usage rollups.
+
+Every TokenUsage insert goes through record_token_usage, which bumps the
+matching UserUsageRollup bucket in the same transaction. The token dashboard
+reads the rollups, so its cost depends on the number of days and models in
+the requested range rather than on the number of generations.
+
+Backfill rollups for data recorded before they existed with:
+    python -m app.usage_rollups backfill
+"""
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Optional
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models import TokenUsage, UserUsageRollup
+
+COUNTER_COLUMNS = ("prompt_tokens", "completion_tokens", "total_tokens", "estimated_cost", "request_count")
+GRANULARITIES = ("day", "week", "month")
+
+
+def record_token_usage(
+    db: Session,
+    user_id: int,
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    estimated_cost: float,
+    timestamp: Optional[datetime] = None
+) -> TokenUsage:
+    """Add a TokenUsage row and update its rollup bucket. The caller commits."""
+    timestamp = timestamp or datetime.utcnow()
+    token_usage = TokenUsage(
+        user_id=user_id,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        estimated_cost=estimated_cost,
+        model_used=model,
+        timestamp=timestamp
+    )
+    db.add(token_usage)
+    _increment_rollup(db, {
+        "user_id": user_id,
+        "model_used": model,
+        "bucket_date": timestamp.date(),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "estimated_cost": estimated_cost,
+        "request_count": 1,
+    })
+    return token_usage
+
+
+def _increment_rollup(db: Session, values: Dict[str, Any]):
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = insert(UserUsageRollup).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "model_used", "bucket_date"],
+            set_={
+                column: getattr(UserUsageRollup, column) + getattr(stmt.excluded, column)
+                for column in COUNTER_COLUMNS
+            }
+        )
+        db.execute(stmt)
+        return
+
+    rollup = db.query(UserUsageRollup).filter(
+        UserUsageRollup.user_id == values["user_id"],
+        UserUsageRollup.model_used == values["model_used"],
+        UserUsageRollup.bucket_date == values["bucket_date"]
+    ).with_for_update().first()
+    if rollup is None:
+        db.add(UserUsageRollup(**values))
+    else:
+        for column in COUNTER_COLUMNS:
+            setattr(rollup, column, getattr(rollup, column) + values[column])
+
+
+def backfill_rollups(db: Session) -> int:
+    """Rebuild all rollups from TokenUsage. Returns the number of buckets written."""
+    day = func.date(TokenUsage.timestamp)
+    rows = db.query(
+        TokenUsage.user_id,
+        TokenUsage.model_used,
+        day,
+        func.coalesce(func.sum(TokenUsage.prompt_tokens), 0),
+        func.coalesce(func.sum(TokenUsage.completion_tokens), 0),
+        func.coalesce(func.sum(TokenUsage.total_tokens), 0),
+        func.coalesce(func.sum(TokenUsage.estimated_cost), 0.0),
+        func.count(TokenUsage.id)
+    ).group_by(TokenUsage.user_id, TokenUsage.model_used, day).all()
+
+    db.query(UserUsageRollup).delete()
+    for user_id, model, bucket, prompt_tokens, completion_tokens, total_tokens, cost, count in rows:
+        db.add(UserUsageRollup(
+            user_id=user_id,
+            model_used=model,
+            # SQLite returns date() as an ISO string
+            bucket_date=date.fromisoformat(bucket) if isinstance(bucket, str) else bucket,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens,
+            estimated_cost=cost,
+            request_count=count
+        ))
+    db.commit()
+    return len(rows)
+
+
+def needs_backfill(db: Session) -> bool:
+    """Whether token usage was recorded but no rollups exist, e.g. right after upgrading."""
+    has_usage = db.query(db.query(TokenUsage.id).exists()).scalar()
+    return has_usage and not db.query(db.query(UserUsageRollup.id).exists()).scalar()
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def summarize_usage(
+    db: Session,
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: str = "day"
+) -> Dict[str, Any]:
+    """Totals, per-model breakdown and a timeline for a user, read from rollups."""
+    query = db.query(
+        UserUsageRollup.bucket_date,
+        UserUsageRollup.model_used,
+        UserUsageRollup.total_tokens,
+        UserUsageRollup.estimated_cost,
+        UserUsageRollup.request_count
+    ).filter(UserUsageRollup.user_id == user_id)
+    if start_date:
+        query = query.filter(UserUsageRollup.bucket_date >= start_date)
+    if end_date:
+        query = query.filter(UserUsageRollup.bucket_date <= end_date)
+
+    usage_by_model: Dict[str, Dict[str, Any]] = {}
+    timeline: Dict[date, Dict[str, Any]] = {}
+    for bucket_date, model, total_tokens, cost, request_count in query.order_by(UserUsageRollup.bucket_date):
+        for totals in (
+            usage_by_model.setdefault(model, {"total_tokens": 0, "total_cost": 0.0, "request_count": 0}),
+            timeline.setdefault(
+                period_start(bucket_date, granularity),
+                {"total_tokens": 0, "total_cost": 0.0, "request_count": 0}
+            ),
+        ):
+            totals["total_tokens"] += total_tokens
+            totals["total_cost"] += cost
+            totals["request_count"] += request_count
+
+    return {
+        "total_tokens": sum(usage["total_tokens"] for usage in usage_by_model.values()),
+        "total_cost": sum(usage["total_cost"] for usage in usage_by_model.values()),
+        "usage_by_model": usage_by_model,
+        "timeline": [{"period_start": start, **totals} for start, totals in timeline.items()],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain token usage rollups.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.parse_args()
+
+    from app.database import Base, SessionLocal, engine
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        buckets = backfill_rollups(db)
+        print(f"Backfilled {buckets} usage rollup buckets")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: size and serialization time of GET /materials/{id} for a large material.
+
+Compares the old response, where generated_content is a JSON string inside
+the JSON body and is rendered with the standard json module, against the
+new one, with generated_content as a nested object rendered with orjson.
+Each body is also compressed the way CompressionMiddleware does it, to show
+what goes over the wire.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_api_payload --chapters 40
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.compression import CompressionMiddleware, brotli
+from app.config import get_settings
+from app.schemas import MaterialResponse
+from benchmarks.bench_parse_content import synthetic_corpus
+
+settings = get_settings()
+
+
+class LegacyMaterialResponse(MaterialResponse):
+    generated_content: Optional[str]
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    chapters = [{"title": f"Unit {i}", "description": ""} for i in range(1, args.chapters + 1)]
+    content = {
+        "title": "Benchmark Book",
+        "chapters": [
+            {"number": i, "title": f"Unit {i}", "content": text}
+            for i, text in enumerate(synthetic_corpus(args.chapters), 1)
+        ]
+    }
+    fields = {
+        "id": 1,
+        "title": content["title"],
+        "table_of_contents": json.dumps(chapters),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+
+    # What the endpoint does: assemble the content, validate the response model,
+    # dump it for JSON and render the body
+    def legacy():
+        model = LegacyMaterialResponse(generated_content=json.dumps(content), **fields)
+        return JSONResponse(model.model_dump(mode="json")).body
+
+    def current():
+        model = MaterialResponse(generated_content=content, **fields)
+        return ORJSONResponse(model.model_dump(mode="json")).body
+
+    compressor = CompressionMiddleware(
+        None,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+
+    print(f"{args.chapters}-chapter material")
+    print(f"{'response':<22} {'serialize ms':>13} {'body KB':>8}", end="")
+    for encoding in encodings:
+        print(f" {encoding + ' KB':>8} {encoding + ' ms':>8}", end="")
+    print()
+    for name, render in (("string + json", legacy), ("structured + orjson", current)):
+        body = render()
+        print(f"{name:<22} {measure(render, args.repeat):>13.2f} {len(body) / 1024:>8.1f}", end="")
+        for encoding in encodings:
+            compressed = compressor.compress(encoding, body)
+            compress_ms = measure(lambda: compressor.compress(encoding, body), max(1, args.repeat // 5))
+            print(f" {len(compressed) / 1024:>8.1f} {compress_ms:>8.2f}", end="")
+        print()
+
+
+if __name__ == "__main__":
+    main()
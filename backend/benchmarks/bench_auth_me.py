@@ -0,0 +1,100 @@
+"""
+Benchmark: requests per second on GET /api/auth/me with and without the auth caches.
+
+Without the caches every request verifies the JWT and loads the user from
+the database, as get_current_user always did. With them, repeated requests
+reuse the decoded token and the cached user, and skip the database. Several
+users (--users) each send requests with their own token, --concurrency
+requests at a time. Requests go through httpx's ASGI transport, so the
+numbers cover the application, not the network. The database is a local
+SQLite file; a networked database makes the uncached lookups slower still.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_auth_me --requests 3000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_export_load import percentile
+
+
+def seed(users: int):
+    from app.auth import create_access_token
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    accounts = [
+        User(email=f"user{i}@example.com", username=f"user{i}", hashed_password="x")
+        for i in range(users)
+    ]
+    db.add_all(accounts)
+    db.commit()
+    tokens = [create_access_token(data={"sub": user.username, "uid": user.id}) for user in accounts]
+    db.close()
+    return tokens
+
+
+async def run_mode(client, tokens, requests: int, concurrency: int):
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            token = tokens[i % len(tokens)]
+            start = time.perf_counter()
+            response = await client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start), latencies
+
+
+async def run(args):
+    import httpx
+    from app import auth
+    from app.main import app
+
+    tokens = seed(args.users)
+    print(f"{'auth caches':<12} {'requests/s':>11} {'p50 ms':>8} {'p99 ms':>8}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for enabled in (False, True):
+            auth.settings.AUTH_CACHE_ENABLED = enabled
+            auth._token_cache.clear()
+            auth._user_cache.clear()
+            # Warm up connections, thread pool and (when enabled) the caches
+            await run_mode(client, tokens, len(tokens) * 2, args.concurrency)
+            rate, latencies = await run_mode(client, tokens, args.requests, args.concurrency)
+            print(
+                f"{'on' if enabled else 'off':<12} {rate:>11.0f} "
+                f"{statistics.median(latencies):>8.2f} {percentile(latencies, 99):>8.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    # Configure a throwaway database before the app is imported
+    db_dir = tempfile.mkdtemp(prefix="bench_auth_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ["EXPORT_CACHE_DIR"] = os.path.join(db_dir, "exports")
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: re-exporting a book after editing one chapter.
+
+Renders a book (20 chapters by default) to DOCX and PDF with a
+DocumentExporter using a throwaway fragment cache. It then edits one
+chapter and exports again, so the second export re-renders only that
+chapter and stitches the cached ones. Timings are compared with an
+exporter without fragments, which renders every chapter each time.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_export_incremental --chapters 20
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from app.cache import DiskLRUCache
+from app.document_service import DocumentExporter, PdfWriter
+from benchmarks.bench_export_load import chapter_text
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chapters", type=int, default=20)
+    args = parser.parse_args()
+
+    if PdfWriter is None:
+        print("Warning: pypdf is not installed, PDFs will be rendered in one piece")
+
+    material = {
+        "title": "Benchmark Book",
+        "chapters": [
+            {"number": i, "title": f"Unit {i}", "content": chapter_text(i)}
+            for i in range(1, args.chapters + 1)
+        ]
+    }
+    edited = {
+        **material,
+        "chapters": [dict(chapter) for chapter in material["chapters"]]
+    }
+    middle = edited["chapters"][len(edited["chapters"]) // 2]
+    middle["content"] += "\nOne more line added by the teacher."
+
+    fragment_dir = tempfile.mkdtemp(prefix="bench_fragments_")
+    try:
+        full = DocumentExporter()
+        incremental = DocumentExporter(fragment_cache=DiskLRUCache(fragment_dir, 1 << 30))
+        print(f"{args.chapters}-chapter book, chapter {middle['number']} edited")
+        print(f"{'format':<6} {'full render ms':>15} {'first export ms':>16} {'after edit ms':>14} {'speedup':>8}")
+        for fmt in ("docx", "pdf"):
+            export_full = getattr(full, f"export_to_{fmt}")
+            export_incremental = getattr(incremental, f"export_to_{fmt}")
+            full_ms = timed(lambda: export_full(edited))
+            first_ms = timed(lambda: export_incremental(material))
+            edit_ms = timed(lambda: export_incremental(edited))
+            print(f"{fmt:<6} {full_ms:>15.0f} {first_ms:>16.0f} {edit_ms:>14.0f} {full_ms / edit_ms:>7.1f}x")
+    finally:
+        shutil.rmtree(fragment_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark: latency of light requests while many exports are rendering.
+
+Starts N PDF exports of distinct 30-chapter books at once and, while they
+run, keeps requesting GET /health and GET /api/materials/ (for a user with a
+single small material). Reports p50/p99 latency of those requests with
+rendering done in request threads (--workers 0) and in the render process
+pool, next to an idle baseline. Requests go through httpx's ASGI transport,
+so the numbers cover the application, not the network.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_export_load --exports 20 --workers 0,4
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+SECTION_TEMPLATE = """LEARNING OBJECTIVES
+- Understand the key vocabulary of unit {n}
+- Practise asking and answering questions
+
+INTRODUCTION
+{paragraph}
+
+VOCABULARY
+{paragraph}
+
+EXERCISE 1: Fill in the blanks
+Complete the sentences with the words above: ____
+Answer: ____
+
+DIALOGUE
+A: {sentence}
+B: {sentence}
+
+SUMMARY
+{paragraph}
+"""
+
+
+def chapter_text(n: int) -> str:
+    sentence = f"This is sentence material for chapter {n}, written to look like a textbook page."
+    paragraph = " ".join([sentence] * 6)
+    return "\n".join(SECTION_TEMPLATE.format(n=n, paragraph=paragraph, sentence=sentence) for _ in range(3))
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def seed(exports: int, chapters: int):
+    from app.database import SessionLocal
+    from app.material_service import save_generated_material
+    from app.models import User
+
+    db = SessionLocal()
+    exporter = User(email="export@example.com", username="exporter", hashed_password="x")
+    reader = User(email="reader@example.com", username="reader", hashed_password="x")
+    db.add_all([exporter, reader])
+    db.commit()
+
+    def book(user_id, title, count):
+        toc = [{"title": f"Unit {i}", "description": ""} for i in range(1, count + 1)]
+        content = {
+            "title": title,
+            "chapters": [
+                {"number": i, "title": f"Unit {i}", "content": chapter_text(i)}
+                for i in range(1, count + 1)
+            ]
+        }
+        return save_generated_material(db, user_id, title, toc, content, "gpt-4o-mini", 0, 0)
+
+    material_ids = [book(exporter.id, f"Book {i}", chapters).id for i in range(exports)]
+    book(reader.id, "Reader notes", 1)
+    ids = (exporter.id, reader.id, material_ids)
+    db.close()
+    return ids
+
+
+async def probe(client, reader_id, stop: asyncio.Event, latencies):
+    while not stop.is_set():
+        for path in ("/health", "/api/materials/"):
+            start = time.perf_counter()
+            response = await client.get(path, headers={"X-Bench-User": str(reader_id)})
+            latencies[path].append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+
+
+async def run_mode(client, exporter_id, reader_id, material_ids, pool, probes: int):
+    import app.routers.materials as materials_router
+    from app.export_cache import export_cache
+
+    materials_router.render_pool = pool
+    shutil.rmtree(export_cache.directory, ignore_errors=True)
+    # Start worker processes before measuring
+    warm_up_path = export_cache.temp_path()
+    await pool.render("pdf", {"title": "warm-up", "chapters": []}, str(warm_up_path))
+    warm_up_path.unlink()
+
+    latencies = {"/health": [], "/api/materials/": []}
+    stop = asyncio.Event()
+
+    async def export(material_id):
+        response = await client.get(
+            f"/api/materials/{material_id}/export/pdf", headers={"X-Bench-User": str(exporter_id)}
+        )
+        assert response.status_code == 200, response.text
+
+    if material_ids:
+        prober = asyncio.create_task(probe(client, reader_id, stop, latencies))
+        start = time.perf_counter()
+        await asyncio.gather(*(export(material_id) for material_id in material_ids))
+        export_seconds = time.perf_counter() - start
+        stop.set()
+        await prober
+    else:
+        export_seconds = 0.0
+        for _ in range(probes):
+            for path in latencies:
+                start = time.perf_counter()
+                await client.get(path, headers={"X-Bench-User": str(reader_id)})
+                latencies[path].append((time.perf_counter() - start) * 1000)
+    pool.shutdown()
+    return latencies, export_seconds
+
+
+async def run(args):
+    import httpx
+    from fastapi import Request
+    from types import SimpleNamespace
+    from app.auth import get_current_user
+    from app.main import app
+    from app.render_pool import RenderPool
+
+    def bench_user(request: Request):
+        return SimpleNamespace(id=int(request.headers["X-Bench-User"]))
+
+    app.dependency_overrides[get_current_user] = bench_user
+    exporter_id, reader_id, material_ids = seed(args.exports, args.chapters)
+
+    modes = [("idle baseline", 0, [])] + [
+        (f"{'threads' if workers == 0 else f'{workers} processes'}", workers, material_ids)
+        for workers in args.workers
+    ]
+    print(f"{'mode':<16} {'endpoint':<16} {'samples':>7} {'p50 ms':>8} {'p99 ms':>8} {'exports s':>10}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        for label, workers, ids in modes:
+            pool = RenderPool(workers=workers, max_pending=args.exports + 1, timeout=600)
+            latencies, export_seconds = await run_mode(
+                client, exporter_id, reader_id, ids, pool, args.probes
+            )
+            for path, values in latencies.items():
+                print(
+                    f"{label:<16} {path:<16} {len(values):>7} "
+                    f"{statistics.median(values):>8.1f} {percentile(values, 99):>8.1f} {export_seconds:>10.2f}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exports", type=int, default=20)
+    parser.add_argument("--chapters", type=int, default=30)
+    parser.add_argument("--probes", type=int, default=200, help="requests per endpoint for the idle baseline")
+    parser.add_argument(
+        "--workers", type=lambda value: [int(v) for v in value.split(",")], default=[0, 4],
+        help="comma-separated worker counts to compare; 0 renders in request threads"
+    )
+    args = parser.parse_args()
+
+    # Configure a throwaway database before the app is imported
+    db_dir = tempfile.mkdtemp(prefix="bench_export_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ["EXPORT_CACHE_DIR"] = os.path.join(db_dir, "exports")
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
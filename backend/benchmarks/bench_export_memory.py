@@ -0,0 +1,115 @@
+"""
+Benchmark: peak Python memory of one export, in-memory buffer vs. file output.
+
+Renders a book (30 chapters by default) to DOCX and PDF twice each: into a
+BytesIO whose bytes are then copied out, as the render pool used to return
+them, and straight into a file on disk, as exports are now written.
+
+Two peaks are reported. The tracemalloc peak covers Python allocations of
+the render only. It misses lxml's C-level trees, which dominate DOCX. The
+max RSS comes from a fresh process per case, and includes the interpreter
+and imported libraries. That is what a render worker's memory limit has
+to cover.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_export_memory --chapters 30
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from app.document_service import DocumentExporter
+from benchmarks.bench_export_load import chapter_text
+
+
+def in_memory(export, material, path):
+    return len(export(material).getvalue())
+
+
+def to_file(export, material, path):
+    with open(path, "wb") as f:
+        export(material, f)
+    return os.path.getsize(path)
+
+
+def book(chapters: int):
+    return {
+        "title": "Benchmark Book",
+        "chapters": [
+            {"number": i, "title": f"Unit {i}", "content": chapter_text(i)}
+            for i in range(1, chapters + 1)
+        ]
+    }
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_rss(fmt: str, strategy_name: str, chapters: int, path: str):
+    """Run in a fresh process: max RSS once imports are done and after one render."""
+    material = book(chapters)
+    before = max_rss_mb()
+    measure(fmt, STRATEGIES[strategy_name], material, path, trace=False)
+    return before, max_rss_mb()
+
+
+def measure(fmt: str, strategy, material, path, trace: bool = True):
+    # A fresh exporter so cached chapter parses don't hide the parsing cost
+    exporter = DocumentExporter()
+    export = exporter.export_to_docx if fmt == "docx" else exporter.export_to_pdf
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    size = strategy(export, material, path)
+    seconds = time.perf_counter() - start
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return size, peak, seconds
+
+
+STRATEGIES = {"BytesIO": in_memory, "file": to_file}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chapters", type=int, default=30)
+    args = parser.parse_args()
+
+    material = book(args.chapters)
+    fd, path = tempfile.mkstemp(suffix=".export")
+    os.close(fd)
+    try:
+        # Load fonts, templates and lazily imported modules before measuring
+        for fmt in ("docx", "pdf"):
+            measure(fmt, to_file, {"title": "warm-up", "chapters": material["chapters"][:1]}, path)
+
+        print(f"{args.chapters}-chapter book")
+        print(
+            f"{'format':<6} {'output':<8} {'file MB':>8} {'seconds':>8} "
+            f"{'traced peak MB':>15} {'RSS imported MB':>16} {'RSS peak MB':>12}"
+        )
+        spawn = multiprocessing.get_context("spawn")
+        for fmt in ("docx", "pdf"):
+            for name, strategy in STRATEGIES.items():
+                size, peak, seconds = measure(fmt, strategy, material, path)
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                    rss_before, rss_peak = executor.submit(measure_rss, fmt, name, args.chapters, path).result()
+                print(
+                    f"{fmt:<6} {name:<8} {size / 2**20:>8.2f} {seconds:>8.2f} "
+                    f"{peak / 2**20:>15.2f} {rss_before:>16.1f} {rss_peak:>12.1f}"
+                )
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
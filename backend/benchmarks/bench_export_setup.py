@@ -0,0 +1,85 @@
+"""
+Benchmark: per-export setup cost of DocumentExporter, rebuilt vs. prebuilt.
+
+Exports used to call getSampleStyleSheet() and build every ParagraphStyle
+for each PDF, and to create and restyle a fresh Document() for each DOCX.
+Both are now built once in DocumentExporter.__init__. This times the old
+per-export setup next to what each export does now. It also times a full
+one-chapter export, to show how much of a small export the setup was.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_export_setup --repeat 200
+"""
+import argparse
+import io
+import statistics
+import time
+
+from docx import Document
+from docx.shared import Cm, Pt
+
+from app.document_service import DocumentExporter
+from benchmarks.bench_export_load import chapter_text
+
+
+def legacy_docx_setup(exporter):
+    """The per-export DOCX setup before the template existed."""
+    doc = Document()
+    style = doc.styles['Normal']
+    style.font.name = 'Calibri'
+    style.font.size = Pt(11)
+    for section in doc.sections:
+        section.top_margin = Cm(2)
+        section.bottom_margin = Cm(2)
+        section.left_margin = Cm(2)
+        section.right_margin = Cm(2)
+    return doc
+
+
+def template_docx_setup(exporter):
+    return Document(io.BytesIO(exporter._docx_template))
+
+
+def legacy_pdf_setup(exporter):
+    """getSampleStyleSheet() plus every ParagraphStyle, as each export did."""
+    return exporter._build_pdf_styles()
+
+
+def registry_pdf_setup(exporter):
+    return exporter._pdf_styles
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    exporter = DocumentExporter()
+    material = {"title": "Setup", "chapters": [{"number": 1, "title": "Unit 1", "content": chapter_text(1)}]}
+
+    rows = [
+        ("docx setup (rebuilt)", lambda: legacy_docx_setup(exporter)),
+        ("docx setup (template)", lambda: template_docx_setup(exporter)),
+        ("pdf setup (rebuilt)", lambda: legacy_pdf_setup(exporter)),
+        ("pdf setup (registry)", lambda: registry_pdf_setup(exporter)),
+        ("docx 1-chapter export", lambda: exporter.export_to_docx(material)),
+        ("pdf 1-chapter export", lambda: exporter.export_to_pdf(material)),
+    ]
+    print(f"{'step':<24} {'median ms':>10}")
+    for name, fn in rows:
+        # Export rows run fewer times; they are much slower than the setup
+        repeat = args.repeat if "setup" in name else max(1, args.repeat // 10)
+        print(f"{name:<24} {measure(fn, repeat):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: login throughput, and latency of other requests during a login burst.
+
+Sends --logins concurrent POST /api/auth/login requests (bcrypt cost
+BCRYPT_ROUNDS) and, while they run, keeps requesting GET /health and
+GET /api/auth/me one at a time. How many of those the app manages per
+second shows how much room the burst leaves for other requests. Two modes
+are compared:
+
+  request threads  bcrypt runs in the request thread pool, as login did
+                   when it was a sync handler
+  hash executor    bcrypt runs on the PASSWORD_HASH_WORKERS threads of
+                   app.password_hasher
+
+Rate limits are raised out of the way. Requests go through httpx's ASGI
+transport, so the numbers cover the application, not the network.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_login --logins 40
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_export_load import percentile
+
+
+class ThreadPoolHasher:
+    """bcrypt in the request thread pool, like the old sync login handler."""
+
+    def __init__(self, hasher):
+        self.rounds = hasher.rounds
+        self.needs_rehash = hasher.needs_rehash
+
+    async def verify(self, password, hashed_password):
+        from fastapi.concurrency import run_in_threadpool
+        from app.auth import verify_password
+        return await run_in_threadpool(verify_password, password, hashed_password)
+
+
+def seed(users: int):
+    from app.auth import create_access_token, get_password_hash
+    from app.database import SessionLocal
+    from app.models import User
+
+    hashed_password = get_password_hash("password")
+    db = SessionLocal()
+    accounts = [
+        User(email=f"user{i}@example.com", username=f"user{i}", hashed_password=hashed_password)
+        for i in range(users + 1)
+    ]
+    db.add_all(accounts)
+    db.commit()
+    prober = accounts[-1]
+    token = create_access_token(data={"sub": prober.username, "uid": prober.id})
+    usernames = [user.username for user in accounts[:-1]]
+    db.close()
+    return usernames, token
+
+
+async def probe(client, token, stop: asyncio.Event, latencies):
+    while not stop.is_set():
+        for path in latencies:
+            start = time.perf_counter()
+            response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+            latencies[path].append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+
+
+async def run_mode(client, usernames, token):
+    latencies = {"/health": [], "/api/auth/me": []}
+    stop = asyncio.Event()
+
+    async def login(username):
+        response = await client.post("/api/auth/login", json={"username": username, "password": "password"})
+        assert response.status_code == 200, response.text
+
+    prober = asyncio.create_task(probe(client, token, stop, latencies))
+    start = time.perf_counter()
+    await asyncio.gather(*(login(username) for username in usernames))
+    seconds = time.perf_counter() - start
+    stop.set()
+    await prober
+    return len(usernames) / seconds, seconds, latencies
+
+
+async def run(args):
+    import httpx
+    from app.main import app
+    from app.routers import auth as auth_router
+    from app.password_hasher import password_hasher
+
+    usernames, token = seed(args.logins)
+    modes = [
+        ("request threads", ThreadPoolHasher(password_hasher)),
+        (f"hash executor ({password_hasher.workers})", password_hasher),
+    ]
+    print(f"{os.cpu_count()} CPUs, {args.logins} concurrent logins")
+    print(f"{'mode':<20} {'logins/s':>9} {'endpoint':<14} {'requests/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        for label, hasher in modes:
+            auth_router.password_hasher = hasher
+            rate, seconds, latencies = await run_mode(client, usernames, token)
+            for path, values in latencies.items():
+                print(
+                    f"{label:<20} {rate:>9.1f} {path:<14} {len(values) / seconds:>10.1f} "
+                    f"{statistics.median(values):>8.1f} {percentile(values, 99):>8.1f}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    args = parser.parse_args()
+
+    # Configure a throwaway database and generous limits before the app is imported
+    db_dir = tempfile.mkdtemp(prefix="bench_login_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ["EXPORT_CACHE_DIR"] = os.path.join(db_dir, "exports")
+    os.environ["AUTH_ATTEMPTS_PER_IP"] = str(10 * args.logins)
+    os.environ["PASSWORD_HASH_MAX_PENDING"] = str(10 * args.logins)
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: wall-clock time of LLMService.generate_material vs. concurrency.
+
+Uses a stubbed OpenAI client that sleeps to simulate API latency, so no API key
+or network access is needed.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_parallel_generation
+"""
+import argparse
+import os
+import time
+from types import SimpleNamespace
+
+
+class StubCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def create(self, model, messages, **kwargs):
+        time.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"Generated for {len(prompt)} chars"))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=1000),
+        )
+
+
+class StubOpenAI:
+    def __init__(self, latency: float):
+        self.chat = SimpleNamespace(completions=StubCompletions(latency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per OpenAI call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 10])
+    args = parser.parse_args()
+
+    # GENERATION_CONCURRENCY caps concurrency; raise it before the app is imported
+    os.environ["GENERATION_CONCURRENCY"] = str(max(args.concurrency))
+    from app.llm_service import LLMService
+
+    service = LLMService()  # no generation cache, every chapter hits the stub
+    service.openai_client = StubOpenAI(args.latency)
+    chapters = [{"title": f"Chapter topic {i}", "description": ""} for i in range(1, args.chapters + 1)]
+
+    baseline = None
+    print(f"{args.chapters} chapters, {args.latency:.2f}s simulated latency per call")
+    print(f"{'concurrency':>12} {'seconds':>9} {'speedup':>8} {'tokens':>8}")
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        result, prompt_tokens, completion_tokens, _ = service.generate_material(
+            "Benchmark", chapters, concurrency=concurrency
+        )
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        assert [ch["number"] for ch in result["chapters"]] == list(range(1, args.chapters + 1))
+        print(f"{concurrency:>12} {elapsed:>9.2f} {baseline / elapsed:>7.1f}x {prompt_tokens + completion_tokens:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: DocumentExporter._parse_content, keyword scans vs. compiled classifier.
+
+Parses a corpus of chapters with the original implementation (upper() plus
+a scan over every keyword per line) and the current single-pass classifier,
+checks both give identical sections, and times the cached parse used by the
+exporters. By default the corpus is the generated chapters stored in the
+database at DATABASE_URL; when it has none, synthetic chapters in the same
+format are used.
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_parse_content --repeat 5
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from app.cache import LRUCache
+from app.document_service import DocumentExporter
+
+HEADINGS = [
+    "LEARNING OBJECTIVES", "INTRODUCTION", "WARM-UP ACTIVITY", "VOCABULARY", "LANGUAGE FOCUS: Past simple",
+    "READING TEXT: A day at the market", "EXERCISE 1: Match the words", "EXERCISE 2: Fill in the blanks",
+    "DIALOGUES", "ROLE-PLAY", "GROUP WORK", "DISCUSSION ACTIVITIES", "INTERESTING FACTS", "GAMES",
+    "REVIEW", "SUMMARY", "REFLECTION SECTION",
+]
+SENTENCES = [
+    "Students read the short text and underline the new words.",
+    "Complete the sentences with the correct form of the verb: ____",
+    "A: Where did you go last weekend?",
+    "B: I visited my grandparents in the countryside.",
+    "- Describe a past event using time expressions",
+    "Work with a partner and compare your answers.",
+    "Answer: ____",
+    "The market opens at six o'clock and closes before noon.",
+]
+
+
+def legacy_parse_content(content: str):
+    """The original implementation."""
+    sections = []
+    lines = content.split('\n')
+    current_section = None
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        if not line:
+            i += 1
+            continue
+        line_upper = line.upper()
+        if 'LEARNING OBJECTIVE' in line_upper:
+            if current_section:
+                sections.append(current_section)
+            current_section = {'type': 'objectives', 'title': line, 'content': []}
+        elif re.match(r'EXERCISE\s+\d+', line_upper) or line_upper.startswith('EXERCISE:'):
+            if current_section:
+                sections.append(current_section)
+            current_section = {'type': 'exercise', 'title': line, 'content': []}
+        elif any(keyword in line_upper for keyword in [
+            'INTRODUCTION', 'WARM-UP', 'WARM UP', 'VOCABULARY', 'LANGUAGE FOCUS', 'GRAMMAR',
+            'READING TEXT', 'READING:', 'WRITING TASK', 'SPEAKING ACTIVITY', 'REVIEW',
+            'COMMUNICATION PRACTICE', 'SUMMARY', 'REFLECTION', 'REFLECTION SECTION',
+            'GROUP WORK', 'DISCUSSION', 'DISCUSSION ACTIVITIES', 'ROLE-PLAY', 'ROLE PLAY',
+            'DIALOGUES', 'DIALOGUE', 'INTERESTING FACTS', 'GAMES', 'EXERCISES'
+        ]):
+            if current_section:
+                sections.append(current_section)
+            if 'INTRODUCTION' in line_upper:
+                section_type = 'introduction'
+            elif 'SUMMARY' in line_upper:
+                section_type = 'summary'
+            elif 'REFLECTION' in line_upper:
+                section_type = 'reflection'
+            elif 'DIALOGUE' in line_upper:
+                section_type = 'dialogue'
+            elif 'ROLE' in line_upper:
+                section_type = 'roleplay'
+            elif 'GROUP WORK' in line_upper or 'DISCUSSION' in line_upper:
+                section_type = 'group_activity'
+            else:
+                section_type = 'section'
+            current_section = {'type': section_type, 'title': line, 'content': []}
+        else:
+            if current_section is None:
+                current_section = {'type': 'paragraph', 'content': []}
+            current_section['content'].append(line)
+        i += 1
+    if current_section:
+        sections.append(current_section)
+    return sections
+
+
+def load_corpus(limit: int):
+    try:
+        from app.database import SessionLocal
+        from app.models import Chapter
+        db = SessionLocal()
+        try:
+            return [content for (content,) in db.query(Chapter.content).limit(limit)]
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Warning: Could not read chapters from the database: {str(e).splitlines()[0]}")
+        return []
+
+
+def synthetic_corpus(count: int):
+    rng = random.Random(0)
+    corpus = []
+    for _ in range(count):
+        lines = []
+        for heading in HEADINGS:
+            lines.append(heading)
+            lines.extend(rng.choice(SENTENCES) for _ in range(rng.randint(4, 12)))
+            lines.append("")
+        corpus.append("\n".join(lines))
+    return corpus
+
+
+def measure(fn, corpus, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in corpus:
+            fn(content)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chapters", type=int, default=300, help="maximum corpus size")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--synthetic", action="store_true", help="skip the database corpus")
+    args = parser.parse_args()
+
+    corpus = [] if args.synthetic else load_corpus(args.chapters)
+    source = "database"
+    if not corpus:
+        corpus, source = synthetic_corpus(args.chapters), "synthetic"
+    lines = sum(content.count("\n") + 1 for content in corpus)
+    print(f"Corpus: {len(corpus)} {source} chapters, {lines} lines")
+
+    exporter = DocumentExporter()
+    for content in corpus:
+        assert exporter._parse_content(content) == legacy_parse_content(content)
+
+    legacy_ms = measure(legacy_parse_content, corpus, args.repeat)
+    current_ms = measure(exporter._parse_content, corpus, args.repeat)
+    # Cache every chapter, as the first export of a material would
+    exporter._parse_cache = LRUCache(max_entries=len(corpus))
+    for content in corpus:
+        exporter._parse_chapter(content)
+    cached_ms = measure(exporter._parse_chapter, corpus, args.repeat)
+
+    print(f"{'implementation':<24} {'median ms':>10} {'us/line':>8}")
+    for name, ms in (("keyword scans", legacy_ms), ("compiled classifier", current_ms), ("cached (2nd export)", cached_ms)):
+        print(f"{name:<24} {ms:>10.1f} {ms * 1000 / lines:>8.2f}")
+    print(f"speedup: {legacy_ms / current_ms:.1f}x uncached, {legacy_ms / cached_ms:.1f}x cached")
+
+
+if __name__ == "__main__":
+    main()
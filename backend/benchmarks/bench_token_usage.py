@@ -0,0 +1,142 @@
+"""
+Benchmark: GET /tokens/usage aggregation, Python loop vs. SQL GROUP BY vs. rollups.
+
+Seeds a throwaway SQLite database with TokenUsage rows for one heavy user and
+compares the original implementation (load every row, sum in Python), a single
+GROUP BY over token_usage, and the current endpoint (daily rollups).
+
+Run from the backend/ directory:
+    python -m benchmarks.bench_token_usage --rows 100000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+_db_dir = tempfile.mkdtemp(prefix="bench_usage_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+from app.database import AsyncSessionLocal, Base, SessionLocal, engine, create_missing_indexes  # noqa: E402
+from app.models import TokenUsage, User  # noqa: E402
+from app.routers.tokens import get_token_usage  # noqa: E402
+from app.usage_rollups import backfill_rollups  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+
+MODELS = ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo", "gpt-5"]
+
+
+def legacy_token_usage(user_id, db):
+    """The original endpoint body: load every row and aggregate in Python."""
+    usage_records = db.query(TokenUsage).filter(TokenUsage.user_id == user_id).all()
+    total_tokens = sum(record.total_tokens for record in usage_records)
+    total_cost = sum(record.estimated_cost for record in usage_records)
+    usage_by_model = {}
+    for record in usage_records:
+        usage = usage_by_model.setdefault(
+            record.model_used, {"total_tokens": 0, "total_cost": 0.0, "request_count": 0}
+        )
+        usage["total_tokens"] += record.total_tokens
+        usage["total_cost"] += record.estimated_cost
+        usage["request_count"] += 1
+    recent_usage = db.query(TokenUsage).filter(
+        TokenUsage.user_id == user_id
+    ).order_by(TokenUsage.timestamp.desc()).limit(20).all()
+    return total_tokens, total_cost, usage_by_model, recent_usage
+
+
+def group_by_token_usage(user_id, db):
+    """Per-model totals from one GROUP BY over token_usage."""
+    return db.query(
+        TokenUsage.model_used,
+        func.sum(TokenUsage.total_tokens),
+        func.sum(TokenUsage.estimated_cost),
+        func.count(TokenUsage.id)
+    ).filter(TokenUsage.user_id == user_id).group_by(TokenUsage.model_used).all()
+
+
+def seed(rows: int):
+    Base.metadata.create_all(bind=engine)
+    create_missing_indexes()
+    db = SessionLocal()
+    users = [User(email=f"u{i}@example.com", username=f"user{i}", hashed_password="x") for i in range(3)]
+    db.add_all(users)
+    db.commit()
+    start = datetime.utcnow() - timedelta(days=365)
+    rng = random.Random(0)
+    batch = []
+    for i in range(rows):
+        prompt_tokens = rng.randint(1000, 6000)
+        completion_tokens = rng.randint(1000, 4000)
+        batch.append({
+            # The heavy user owns 90% of the rows
+            "user_id": users[0].id if i % 10 else users[rng.randint(1, 2)].id,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "estimated_cost": (prompt_tokens + completion_tokens) / 1_000_000,
+            "model_used": rng.choice(MODELS),
+            "timestamp": start + timedelta(seconds=i * 300),
+        })
+        if len(batch) == 10_000:
+            db.execute(TokenUsage.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.execute(TokenUsage.__table__.insert(), batch)
+    db.commit()
+    backfill_rollups(db)
+    user_id = users[0].id
+    db.close()
+    return user_id
+
+
+def measure(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        db = SessionLocal()
+        start = time.perf_counter()
+        fn(db)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.close()
+    return statistics.median(timings)
+
+
+async def measure_async(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            await fn(db)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Seeding {args.rows} token_usage rows into {os.environ['DATABASE_URL']} ...")
+    user_id = seed(args.rows)
+    user = SimpleNamespace(id=user_id)
+
+    legacy_ms = measure(lambda db: legacy_token_usage(user_id, db), args.repeat)
+    group_by_ms = measure(lambda db: group_by_token_usage(user_id, db), args.repeat)
+    current_ms = asyncio.run(measure_async(
+        lambda db: get_token_usage(None, None, "day", current_user=user, db=db), args.repeat
+    ))
+
+    print(f"{'implementation':<20} {'median ms':>10}")
+    print(f"{'python loop':<20} {legacy_ms:>10.1f}")
+    print(f"{'group by':<20} {group_by_ms:>10.1f}")
+    print(f"{'endpoint (rollups)':<20} {current_ms:>10.1f}")
+    print(f"speedup vs python loop: {legacy_ms / current_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Load test: list and usage endpoints on sync sessions vs. AsyncSession.
+
+Runs --concurrency clients against GET /api/materials/summary and
+GET /api/tokens/usage, --requests requests per endpoint, in two modes:
+
+  thread pool   sync handlers on SessionLocal, as the routers were before
+                moving to AsyncSession: every request occupies a thread-pool
+                thread (40 by default) while it waits on the database
+  async         the app's handlers, on AsyncSession (aiosqlite/asyncpg)
+
+Both modes authenticate the same way (cached tokens and users) and compress
+responses the same way. Prints requests per second and p50/p99 latency per
+endpoint.
+
+Uses a throwaway SQLite database unless --database-url is given (a
+scratch PostgreSQL database; its tables are created and filled). Requests
+go through httpx's ASGI transport, so the numbers cover the application,
+not the network.
+
+Run from the backend/ directory:
+    python -m benchmarks.load_async_sessions --concurrency 200 --requests 4000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from benchmarks.bench_export_load import percentile
+
+ENDPOINTS = ["/api/materials/summary", "/api/tokens/usage"]
+MODELS = ["gpt-4o-mini", "gpt-4o", "gpt-5"]
+
+
+def seed(users: int, materials: int, days: int):
+    from app.auth import create_access_token
+    from app.database import SessionLocal
+    from app.models import Chapter, Material, User
+    from app.usage_rollups import record_token_usage
+
+    db = SessionLocal()
+    tokens = []
+    start = datetime.utcnow() - timedelta(days=days)
+    for u in range(users):
+        user = User(email=f"load{u}@example.com", username=f"load{u}", hashed_password="x")
+        db.add(user)
+        db.flush()
+        for m in range(materials):
+            db.add(Material(
+                user_id=user.id,
+                title=f"Book {m}",
+                table_of_contents='[{"title": "Unit 1", "description": ""}]',
+                chapters=[Chapter(number=1, title="Unit 1", content="INTRODUCTION", content_hash="x")]
+            ))
+        for day in range(days):
+            for model in MODELS:
+                record_token_usage(db, user.id, model, 1200, 800, 0.002, timestamp=start + timedelta(days=day))
+        db.commit()
+        tokens.append(create_access_token(data={"sub": user.username, "uid": user.id}))
+    db.close()
+    return tokens
+
+
+def thread_pool_app():
+    """The list and usage endpoints as sync handlers on SessionLocal."""
+    from fastapi import Depends, FastAPI, HTTPException, Query
+    from fastapi.responses import ORJSONResponse
+    from sqlalchemy.orm import Session, defer
+    from app import auth
+    from app.compression import CompressionMiddleware
+    from app.config import get_settings
+    from app.database import SessionLocal
+    from app.models import Material, TokenUsage, User
+    from app.routers.materials import _encode_cursor
+    from app.schemas import CurrentUser, MaterialSummary, MaterialSummaryPage, TokenUsageSummary
+    from app.usage_rollups import summarize_usage
+
+    settings = get_settings()
+    slots = asyncio.Semaphore(settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+
+    async def get_db():
+        # At most one session per pooled connection, or sync handlers deadlock
+        await slots.acquire()
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+            slots.release()
+
+    def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
+        payload = auth._decode_token(token)
+        user = auth._user_cache.get(payload["sub"])
+        if user is None:
+            user = db.get(User, payload["uid"])
+            if user is None:
+                raise HTTPException(status_code=401)
+            user = CurrentUser.model_validate(user)
+            auth._user_cache.set(payload["sub"], user)
+        return user
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+    @app.get("/api/materials/summary", response_model=MaterialSummaryPage)
+    def summaries(
+        limit: int = Query(50, ge=1, le=200),
+        current_user: CurrentUser = Depends(get_current_user),
+        db: Session = Depends(get_db)
+    ):
+        materials = db.query(Material).options(defer(Material.generated_content)).filter(
+            Material.user_id == current_user.id
+        ).order_by(Material.updated_at.desc(), Material.id.desc()).limit(limit + 1).all()
+        items = [
+            MaterialSummary(
+                id=material.id,
+                title=material.title,
+                chapter_count=1,
+                created_at=material.created_at,
+                updated_at=material.updated_at
+            )
+            for material in materials[:limit]
+        ]
+        return MaterialSummaryPage(
+            items=items,
+            next_cursor=_encode_cursor(materials[limit - 1]) if len(materials) > limit else None
+        )
+
+    @app.get("/api/tokens/usage", response_model=TokenUsageSummary)
+    def usage(
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        granularity: str = "day",
+        current_user: CurrentUser = Depends(get_current_user),
+        db: Session = Depends(get_db)
+    ):
+        summary = summarize_usage(db, current_user.id, start_date, end_date, granularity)
+        recent_usage = db.query(TokenUsage).filter(
+            TokenUsage.user_id == current_user.id
+        ).order_by(TokenUsage.timestamp.desc()).limit(20).all()
+        return TokenUsageSummary(recent_usage=recent_usage, granularity=granularity, **summary)
+
+    return app
+
+
+async def run_endpoint(client, tokens, path: str, requests: int, concurrency: int):
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}", "Accept-Encoding": "gzip"}
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start), latencies
+
+
+async def run(args):
+    import httpx
+    from app.main import app
+
+    tokens = seed(args.users, args.materials, args.days)
+    modes = [("thread pool", thread_pool_app()), ("async", app)]
+    print(f"{args.concurrency} clients, {args.requests} requests per endpoint")
+    print(f"{'mode':<12} {'endpoint':<24} {'requests/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, mode_app in modes:
+        transport = httpx.ASGITransport(app=mode_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as client:
+            for path in ENDPOINTS:
+                # Warm up the pool, thread pool and auth caches
+                await run_endpoint(client, tokens, path, len(tokens) * 2, args.concurrency)
+                rate, latencies = await run_endpoint(client, tokens, path, args.requests, args.concurrency)
+                print(
+                    f"{label:<12} {path:<24} {rate:>10.0f} "
+                    f"{statistics.median(latencies):>8.1f} {percentile(latencies, 99):>8.1f}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--materials", type=int, default=30)
+    parser.add_argument("--days", type=int, default=90, help="days of token usage per user")
+    parser.add_argument("--database-url", help="database to use instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    # Configure the database before the app is imported
+    db_dir = tempfile.mkdtemp(prefix="load_async_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(db_dir, 'load.db')}"
+    os.environ["EXPORT_CACHE_DIR"] = os.path.join(db_dir, "exports")
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Load test: many concurrent clients reading and editing materials.
+
+Seeds --users users with --materials small books each, then runs
+--concurrency clients that, for --seconds, repeatedly list, read and edit
+materials and chapters, with --write-ratio of requests being edits (PATCH
+a chapter, PUT a whole material). Prints throughput and latency per
+request type, every non-2xx response grouped by status and detail (e.g.
+"database is locked", pool timeouts), and the connection pool statistics
+from GET /health/db sampled during the run.
+
+Uses a throwaway SQLite database unless --database-url is given (e.g. a
+scratch Postgres database; its tables are created and filled). Requests go
+through httpx's ASGI transport, so the numbers cover the application, not
+the network.
+
+Run from the backend/ directory:
+    python -m benchmarks.load_materials_api --concurrency 50 --seconds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.bench_export_load import percentile
+
+
+def seed(users: int, materials: int, chapters: int):
+    from app.auth import create_access_token
+    from app.database import SessionLocal
+    from app.material_service import save_generated_material
+    from app.models import User
+
+    db = SessionLocal()
+    clients = []
+    for u in range(users):
+        user = User(email=f"load{u}@example.com", username=f"load{u}", hashed_password="x")
+        db.add(user)
+        db.commit()
+        material_ids = []
+        for m in range(materials):
+            toc = [{"title": f"Unit {i}", "description": ""} for i in range(1, chapters + 1)]
+            content = {
+                "title": f"Book {m}",
+                "chapters": [
+                    {"number": i, "title": f"Unit {i}", "content": f"INTRODUCTION\nChapter {i} of book {m}."}
+                    for i in range(1, chapters + 1)
+                ]
+            }
+            material = save_generated_material(db, user.id, f"Book {m}", toc, content, "gpt-4o-mini", 0, 0)
+            material_ids.append(material.id)
+        clients.append((create_access_token(data={"sub": user.username, "uid": user.id}), material_ids))
+    db.close()
+    return clients
+
+
+async def edit_material(client, material_id, headers):
+    """PUT a material back with one chapter changed, as the editor does."""
+    response = await client.get(f"/api/materials/{material_id}", headers=headers)
+    if response.status_code != 200:
+        return response
+    content = response.json()["generated_content"]
+    content["chapters"][0]["content"] += "\nMore."
+    return await client.put(
+        f"/api/materials/{material_id}",
+        json={"generated_content": json.dumps(content)},
+        headers=headers
+    )
+
+
+async def client_loop(client, token, material_ids, chapters, write_ratio, deadline, results, errors):
+    headers = {"Authorization": f"Bearer {token}"}
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        material_id = rng.choice(material_ids)
+        number = rng.randint(1, chapters)
+        if rng.random() < write_ratio:
+            if rng.random() < 0.8:
+                name = "PATCH chapter"
+                request = client.patch(
+                    f"/api/materials/{material_id}/chapters/{number}",
+                    json={"content": f"INTRODUCTION\nEdited {rng.random()}"},
+                    headers=headers
+                )
+            else:
+                name = "PUT material"
+                request = edit_material(client, material_id, headers)
+        else:
+            name, path = rng.choice([
+                ("GET summary", "/api/materials/summary"),
+                ("GET material", f"/api/materials/{material_id}"),
+                ("GET chapters", f"/api/materials/{material_id}/chapters"),
+                ("GET chapter", f"/api/materials/{material_id}/chapters/{number}"),
+            ])
+            request = client.get(path, headers=headers)
+        start = time.perf_counter()
+        try:
+            response = await request
+            status, detail = response.status_code, response.text[:120]
+        except Exception as e:
+            # Unhandled server errors are raised by the ASGI transport
+            status, detail = "exception", f"{e.__class__.__name__}: {str(e)[:100]}"
+        results[name].append((time.perf_counter() - start) * 1000)
+        if status == "exception" or status >= 300:
+            errors[(name, status, detail)] += 1
+
+
+async def sample_pool(client, stop: asyncio.Event, samples):
+    while not stop.is_set():
+        try:
+            response = await client.get("/health/db")
+            if response.status_code == 200:
+                samples.append(response.json())
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+
+
+async def run(args):
+    import httpx
+    from app.main import app
+
+    clients = seed(args.users, args.materials, args.chapters)
+    results = defaultdict(list)
+    errors = Counter()
+    pool_samples = []
+    deadline = time.perf_counter() + args.seconds
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as client:
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_pool(client, stop, pool_samples))
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client_loop(client, *clients[i % len(clients)], args.chapters, args.write_ratio, deadline, results, errors)
+            for i in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await sampler
+
+    total = sum(len(values) for values in results.values())
+    print(f"{args.concurrency} clients, {elapsed:.1f} s, {total / elapsed:.0f} requests/s, {sum(errors.values())} errors")
+    print(f"{'request':<16} {'count':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, values in sorted(results.items()):
+        print(f"{name:<16} {len(values):>7} {statistics.median(values):>8.1f} {percentile(values, 99):>8.1f}")
+    for (name, status, detail), count in errors.most_common():
+        print(f"error: {count} x {name} -> {status} {detail}")
+    if pool_samples:
+        print(f"pool: {pool_samples[-1]}")
+        print(f"pool: max checked out {max(sample.get('checked_out', 0) for sample in pool_samples)}, "
+              f"max overflow {max(sample.get('overflow', 0) for sample in pool_samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--materials", type=int, default=5)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--database-url", help="database to use instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    # Configure the database before the app is imported
+    db_dir = tempfile.mkdtemp(prefix="load_materials_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(db_dir, 'load.db')}"
+    os.environ["EXPORT_CACHE_DIR"] = os.path.join(db_dir, "exports")
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Shared fixtures: the app on a throwaway SQLite database, a stub OpenAI
+client, and registered users.
+
+Run from the backend/ directory:
+    python -m pytest
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+# Configure the app before it is imported
+_test_dir = tempfile.mkdtemp(prefix="backend_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_test_dir, 'test.db')}"
+os.environ["EXPORT_CACHE_DIR"] = os.path.join(_test_dir, "exports")
+os.environ["GENERATION_PASSWORD"] = "test-password"
+os.environ["EXPORT_RENDER_WORKERS"] = "0"  # render in a thread; no worker processes
+os.environ["BCRYPT_ROUNDS"] = "4"
+# Every TestClient request comes from one address; tests register many users
+os.environ["AUTH_ATTEMPTS_PER_IP"] = "100000"
+os.environ["OPENAI_API_KEY"] = ""
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.llm_service import LLMService, llm_service  # noqa: E402
+from app.generation_cache import generation_cache  # noqa: E402
+
+GENERATION_PASSWORD = "test-password"
+
+CHAPTER_CONTENT = """INTRODUCTION
+Welcome to the chapter.
+WARM-UP ACTIVITY
+Talk with a partner.
+EXERCISE 1: Fill the gaps
+Complete the sentences: ____
+SUMMARY
+We learned things."""
+
+
+def chapter_title(prompt: str) -> str:
+    """The chapter title a chapter prompt was built for."""
+    for line in prompt.splitlines():
+        if line.startswith("Chapter Title:"):
+            return line.split(":", 1)[1].strip()
+    return ""
+
+
+class StubOpenAI:
+    """Stands in for the OpenAI and AsyncOpenAI clients.
+
+    Every call returns CHAPTER_CONTENT prefixed with the chapter title, and
+    records its prompt. `in_flight`/`max_in_flight` count concurrent calls.
+    Calls for a chapter title in `fail_titles` raise RuntimeError.
+    """
+
+    prompt_tokens = 100
+    completion_tokens = 50
+
+    def __init__(self, latency: float = 0.01, fail_titles=()):
+        self.latency = latency
+        self.fail_titles = set(fail_titles)
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.sync = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self._create)))
+        self.async_ = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=self._create_async)),
+            close=self._close
+        )
+
+    async def _close(self):
+        pass
+
+    def _enter(self, messages):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return f"{chapter_title(prompt)}\n{CHAPTER_CONTENT}"
+
+    def _check_failure(self, content):
+        title = content.split("\n", 1)[0]
+        if title in self.fail_titles:
+            raise RuntimeError(f"OpenAI API error for {title}")
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _usage(self):
+        return SimpleNamespace(prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens)
+
+    def _response(self, content):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=self._usage()
+        )
+
+    def _chunks(self, content):
+        for part in content.split(" "):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part + " "))], usage=None)
+        yield SimpleNamespace(choices=[], usage=self._usage())
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        content = self._enter(messages)
+        try:
+            time.sleep(self.latency)
+        finally:
+            self._exit()
+        self._check_failure(content)
+        return iter(list(self._chunks(content))) if stream else self._response(content)
+
+    async def _create_async(self, model, messages, stream=False, **kwargs):
+        content = self._enter(messages)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self._exit()
+        self._check_failure(content)
+        if stream:
+            chunks = list(self._chunks(content))
+
+            async def iterate():
+                for chunk in chunks:
+                    yield chunk
+            return iterate()
+        return self._response(content)
+
+
+def stub_service(cache=None, latency: float = 0.02, fail_titles=()):
+    """An LLMService on StubOpenAI clients; returns (service, stub)."""
+    service = LLMService(cache=cache)
+    stub = StubOpenAI(latency=latency, fail_titles=fail_titles)
+    service.openai_client = stub.sync
+    service.async_openai_client = stub.async_
+    return service, stub
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+    shutil.rmtree(_test_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    stub = StubOpenAI()
+    monkeypatch.setattr(llm_service, "openai_client", stub.sync)
+    monkeypatch.setattr(llm_service, "async_openai_client", stub.async_)
+    generation_cache.clear()
+    yield stub
+    generation_cache.clear()
+
+
+def register(client, password: str = "password"):
+    """Register and log in a new user; returns (username, auth headers)."""
+    username = f"user-{uuid.uuid4().hex[:12]}"
+    response = client.post(
+        "/api/auth/register",
+        json={"email": f"{username}@example.com", "username": username, "password": password}
+    )
+    assert response.status_code == 201, response.text
+    response = client.post("/api/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return username, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user(client):
+    return register(client)
+
+
+@pytest.fixture
+def auth_headers(user):
+    return user[1]
+
+
+def generation_request(titles, title: str = "Book", **extra):
+    return {
+        "title": title,
+        "chapters": [{"title": chapter, "description": ""} for chapter in titles],
+        "generation_password": GENERATION_PASSWORD,
+        **extra
+    }
+
+
+@pytest.fixture
+def material(client, auth_headers, openai_stub):
+    """A generated three-chapter material owned by the `auth_headers` user; returns its id."""
+    response = client.post(
+        "/api/materials/generate",
+        json=generation_request(["Networks", "Servers", "Backups"]),
+        headers=auth_headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["material_id"]
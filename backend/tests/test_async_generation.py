@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from app.config import get_settings
+from app.llm_service import chapter_concurrency
+from tests.conftest import stub_service
+from tests.test_llm_service import CHAPTERS, check_material
+
+settings = get_settings()
+
+
+def test_generate_material_async_keeps_order_context_and_tokens():
+    service, stub = stub_service()
+    result, prompt_tokens, completion_tokens, cache_hits = asyncio.run(
+        service.generate_material_async("Book", CHAPTERS, concurrency=4)
+    )
+    check_material(stub, result, prompt_tokens, completion_tokens)
+    assert cache_hits == 0
+    assert 1 < stub.max_in_flight <= 4
+
+
+@pytest.mark.parametrize("requested", [None, 1, 3, 1000])
+def test_both_paths_clamp_concurrency(requested):
+    expected = chapter_concurrency(requested, len(CHAPTERS))
+    assert 1 <= expected <= min(settings.GENERATION_CONCURRENCY, len(CHAPTERS))
+
+    service, stub = stub_service()
+    service.generate_material("Book", CHAPTERS, concurrency=requested)
+    assert stub.max_in_flight <= expected
+
+    service, stub = stub_service()
+    asyncio.run(service.generate_material_async("Book", CHAPTERS, concurrency=requested))
+    assert stub.max_in_flight <= expected
+
+
+def test_chapter_concurrency_bounds():
+    assert chapter_concurrency(None, 10) == settings.GENERATION_CONCURRENCY
+    assert chapter_concurrency(1000, 10) == settings.GENERATION_CONCURRENCY
+    assert chapter_concurrency(8, 2) == 2
+    assert chapter_concurrency(0, 5) == 1
+    assert chapter_concurrency(4, 0) == 1
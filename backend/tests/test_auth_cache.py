@@ -0,0 +1,53 @@
+import base64
+import json
+
+from app.auth import _token_cache, _user_cache
+from app.database import SessionLocal
+from app.models import User
+from tests.conftest import register
+
+
+def test_register_and_me(client):
+    username, headers = register(client)
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == username
+
+    duplicate = client.post(
+        "/api/auth/register",
+        json={"email": f"other-{username}@example.com", "username": username, "password": "password"}
+    )
+    assert duplicate.status_code == 400
+
+
+def test_me_uses_cached_user_until_it_changes(client, user):
+    username, headers = user
+    client.get("/api/auth/me", headers=headers)
+    assert _user_cache.get(username) is not None
+
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.username == username).one().email = f"new-{username}@example.com"
+        db.commit()
+    finally:
+        db.close()
+
+    assert _user_cache.get(username) is None
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.json()["email"] == f"new-{username}@example.com"
+
+
+def test_token_cache_rejects_a_tampered_payload(client, user):
+    username, headers = user
+    token = headers["Authorization"].split(" ", 1)[1]
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    header, payload, signature = token.split(".")
+    assert _token_cache.get(signature) is not None
+
+    # Same signature, different claims
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    claims["sub"] = "someone-else"
+    forged_payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    forged = f"{header}.{forged_payload}.{signature}"
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {forged}"})
+    assert response.status_code == 401
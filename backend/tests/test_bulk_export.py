@@ -0,0 +1,47 @@
+import io
+import zipfile
+
+from tests.conftest import generation_request
+
+
+def test_bulk_export_streams_a_zip_of_every_export(client, auth_headers, openai_stub):
+    ids = []
+    for title in ("Book A", "Book A", "Book B"):
+        response = client.post(
+            "/api/materials/generate", json=generation_request(["One", "Two"], title=title), headers=auth_headers
+        )
+        ids.append(response.json()["material_id"])
+
+    response = client.post(
+        "/api/materials/export/bulk",
+        json={"material_ids": ids, "formats": ["pdf", "docx"]},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    names = archive.namelist()
+    assert len(names) == 6 and len(set(names)) == 6
+    assert "errors.txt" not in names
+    for name in names:
+        data = archive.read(name)
+        assert data.startswith(b"%PDF") if name.endswith(".pdf") else data[:2] == b"PK"
+
+
+def test_bulk_export_rejects_unknown_materials(client, auth_headers, material):
+    response = client.post(
+        "/api/materials/export/bulk", json={"material_ids": [material, 999999], "formats": ["pdf"]}, headers=auth_headers
+    )
+    assert response.status_code == 404
+    assert "999999" in response.json()["detail"]
+
+
+def test_bulk_export_rejects_non_json_content(client, auth_headers, material):
+    client.put(f"/api/materials/{material}", json={"generated_content": "plain text notes"}, headers=auth_headers)
+    response = client.post(
+        "/api/materials/export/bulk", json={"material_ids": [material], "formats": ["pdf"]}, headers=auth_headers
+    )
+    assert response.status_code == 400
+    assert str(material) in response.json()["detail"]
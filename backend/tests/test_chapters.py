@@ -0,0 +1,111 @@
+import json
+
+from app.database import SessionLocal
+from app.material_service import migrate_content_blobs, needs_migration
+from app.models import Material, User
+from tests.conftest import CHAPTER_CONTENT, register
+
+
+def test_generated_material_is_stored_as_chapters(client, auth_headers, material):
+    chapters = client.get(f"/api/materials/{material}/chapters", headers=auth_headers).json()
+    assert [(chapter["number"], chapter["title"]) for chapter in chapters] == [
+        (1, "Networks"), (2, "Servers"), (3, "Backups")
+    ]
+    assert all("content" not in chapter for chapter in chapters)
+
+    chapter = client.get(f"/api/materials/{material}/chapters/2", headers=auth_headers).json()
+    assert chapter["content"] == f"Servers\n{CHAPTER_CONTENT}"
+
+    document = client.get(f"/api/materials/{material}", headers=auth_headers).json()["generated_content"]
+    assert [chapter["content"] for chapter in document["chapters"]] == [
+        f"{title}\n{CHAPTER_CONTENT}" for title in ("Networks", "Servers", "Backups")
+    ]
+
+
+def test_patch_chapter_changes_only_that_chapter(client, auth_headers, material):
+    before = client.get(f"/api/materials/{material}/chapters", headers=auth_headers).json()
+    response = client.patch(
+        f"/api/materials/{material}/chapters/2",
+        json={"title": "Servers and services", "content": "INTRODUCTION\nEdited."},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    after = client.get(f"/api/materials/{material}/chapters", headers=auth_headers).json()
+
+    assert after[1]["title"] == "Servers and services"
+    assert after[1]["content_hash"] != before[1]["content_hash"]
+    assert [after[0], after[2]] == [before[0], before[2]]
+    document = client.get(f"/api/materials/{material}", headers=auth_headers).json()["generated_content"]
+    assert document["chapters"][1]["content"] == "INTRODUCTION\nEdited."
+
+
+def test_put_material_syncs_chapters(client, auth_headers, material):
+    document = client.get(f"/api/materials/{material}", headers=auth_headers).json()["generated_content"]
+    document["chapters"] = document["chapters"][:2]
+    document["chapters"][0]["content"] = "INTRODUCTION\nRewritten."
+    response = client.put(
+        f"/api/materials/{material}",
+        json={"generated_content": json.dumps(document)},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    chapters = client.get(f"/api/materials/{material}/chapters", headers=auth_headers).json()
+    assert [chapter["number"] for chapter in chapters] == [1, 2]
+    chapter = client.get(f"/api/materials/{material}/chapters/1", headers=auth_headers).json()
+    assert chapter["content"] == "INTRODUCTION\nRewritten."
+
+
+def test_chapters_of_other_users_are_not_found(client, material, user):
+    _, other_headers = register(client)
+    assert client.get(f"/api/materials/{material}/chapters", headers=other_headers).status_code == 404
+    assert client.get(f"/api/materials/{material}/chapters/1", headers=other_headers).status_code == 404
+
+
+def test_migrate_content_blobs_moves_books_and_keeps_other_content(user):
+    username, _ = user
+    document = {
+        "title": "Legacy",
+        "chapters": [{"number": 1, "title": "Old", "content": "INTRODUCTION\nOld text."}]
+    }
+    db = SessionLocal()
+    try:
+        user_id = db.query(User.id).filter(User.username == username).scalar()
+        book = Material(user_id=user_id, title="Legacy", table_of_contents="[]", generated_content=json.dumps(document))
+        notes = Material(user_id=user_id, title="Notes", table_of_contents="[]", generated_content="plain text notes")
+        db.add_all([book, notes])
+        db.commit()
+
+        assert migrate_content_blobs(db) >= 1
+        db.expire_all()
+        assert book.generated_content is None
+        assert [(chapter.number, chapter.title, chapter.content) for chapter in book.chapters] == [
+            (1, "Old", "INTRODUCTION\nOld text.")
+        ]
+        assert notes.generated_content == "plain text notes"
+        assert notes.chapters == []
+        # Nothing left to migrate the second time
+        assert migrate_content_blobs(db) == 0
+    finally:
+        db.close()
+
+
+def test_needs_migration_spots_unmigrated_books(user):
+    username, _ = user
+    db = SessionLocal()
+    try:
+        user_id = db.query(User.id).filter(User.username == username).scalar()
+        migrate_content_blobs(db)
+        db.add(Material(user_id=user_id, title="Other", table_of_contents="[]", generated_content='{"not": "a book"}'))
+        db.commit()
+        assert not needs_migration(db)
+
+        document = {"title": "Legacy", "chapters": [{"number": 1, "title": "Old", "content": "Text"}]}
+        db.add(Material(user_id=user_id, title="Legacy", table_of_contents="[]", generated_content=json.dumps(document)))
+        db.commit()
+        assert needs_migration(db)
+
+        migrate_content_blobs(db)
+        assert not needs_migration(db)
+    finally:
+        db.close()
@@ -0,0 +1,94 @@
+"""
+Many clients reading and writing materials at once on the SQLite (WAL)
+test database. Every request must succeed: no "database is locked" and no
+connection pool timeouts.
+"""
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.config import get_settings
+from app.database import pool_stats
+from tests.conftest import generation_request, register
+
+settings = get_settings()
+
+CLIENTS = 100
+REQUESTS_PER_CLIENT = 10
+WRITE_RATIO = 0.8
+
+
+@pytest.fixture
+def owners(client, openai_stub):
+    """A few users with a generated material each: [(headers, material_id)]."""
+    owners = []
+    for _ in range(4):
+        _, headers = register(client)
+        response = client.post(
+            "/api/materials/generate", json=generation_request(["One", "Two", "Three"]), headers=headers
+        )
+        assert response.status_code == 200, response.text
+        owners.append((headers, response.json()["material_id"]))
+    return owners
+
+
+def _run_client(client, owners, seed):
+    rng = random.Random(seed)
+    results = []
+    for step in range(REQUESTS_PER_CLIENT):
+        headers, material_id = rng.choice(owners)
+        base = f"/api/materials/{material_id}"
+        try:
+            if rng.random() < WRITE_RATIO:
+                if rng.random() < 0.7:
+                    response = client.patch(
+                        f"{base}/chapters/{rng.randint(1, 3)}",
+                        json={"content": f"INTRODUCTION\nEdit {seed}-{step}."},
+                        headers=headers
+                    )
+                else:
+                    document = client.get(base, headers=headers).json()["generated_content"]
+                    document["chapters"][0]["content"] = f"INTRODUCTION\nRewrite {seed}-{step}."
+                    response = client.put(base, json={"generated_content": json.dumps(document)}, headers=headers)
+            else:
+                path = rng.choice([base, f"{base}/chapters", f"{base}/chapters/2", "/api/materials/summary"])
+                response = client.get(path, headers=headers)
+            results.append((response.status_code, response.text))
+        except Exception as exc:  # e.g. OperationalError or a pool TimeoutError raised by the app
+            results.append((None, repr(exc)))
+    return results
+
+
+def test_concurrent_reads_and_writes_all_succeed(client, owners):
+    with ThreadPoolExecutor(max_workers=CLIENTS) as executor:
+        futures = [executor.submit(_run_client, client, owners, seed) for seed in range(CLIENTS)]
+        results = [result for future in futures for result in future.result()]
+
+    failures = [(status_code, text[:200]) for status_code, text in results if status_code != 200]
+    assert len(results) == CLIENTS * REQUESTS_PER_CLIENT
+    assert not failures, f"{len(failures)} failed requests, e.g. {failures[:3]}"
+    assert not any("database is locked" in text or "QueuePool limit" in text for _, text in results)
+
+    # Every connection went back to the pool
+    stats = pool_stats()
+    assert stats.get("checked_out", 0) == 0
+    assert stats["sync"].get("checked_out", 0) == 0
+
+    # The edits landed in a consistent state: chapters still read back
+    for headers, material_id in owners:
+        chapters = client.get(f"/api/materials/{material_id}/chapters", headers=headers).json()
+        assert [chapter["number"] for chapter in chapters] == [1, 2, 3]
+
+
+def test_health_db_requires_the_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    assert client.get("/health/db").status_code == 401
+    assert client.get("/health/db", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/health/db", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert "sync" in response.json()
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
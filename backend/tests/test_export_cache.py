@@ -0,0 +1,34 @@
+from app.export_cache import export_cache
+
+
+def test_export_etag_and_not_modified(client, auth_headers, material):
+    response = client.get(f"/api/materials/{material}/export/docx", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.content[:2] == b"PK"
+    etag = response.headers["etag"]
+
+    cached = client.get(f"/api/materials/{material}/export/docx", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    client.patch(f"/api/materials/{material}/chapters/1", json={"content": "INTRODUCTION\nNew."}, headers=auth_headers)
+    changed = client.get(f"/api/materials/{material}/export/docx", headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+    pdf = client.get(f"/api/materials/{material}/export/pdf", headers=auth_headers)
+    assert pdf.status_code == 200 and pdf.content.startswith(b"%PDF")
+
+
+def test_unchanged_material_is_served_from_disk(client, auth_headers, material):
+    first = client.get(f"/api/materials/{material}/export/pdf", headers=auth_headers)
+    etag = first.headers["etag"]
+    assert export_cache.get(material, etag.strip('"'), "pdf") is not None
+
+    hits = export_cache.hits
+    second = client.get(f"/api/materials/{material}/export/pdf", headers=auth_headers)
+    assert second.content == first.content
+    assert export_cache.hits == hits + 1
+
+    # Any edit drops the material's cached files
+    client.patch(f"/api/materials/{material}/chapters/2", json={"title": "Renamed"}, headers=auth_headers)
+    assert export_cache.get(material, etag.strip('"'), "pdf") is None
@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.generation_cache import DatabaseGenerationCache, GenerationCacheBackend, MemoryGenerationCache
+from tests.conftest import generation_request, stub_service
+
+CHAPTERS = [{"title": f"Topic {i}", "description": ""} for i in range(1, 7)]
+
+
+@pytest.mark.parametrize("backend", ["memory", "database"])
+def test_cache_hits_skip_the_api_and_report_zero_tokens(backend):
+    if backend == "memory":
+        cache = MemoryGenerationCache(max_entries=100, ttl_seconds=None)
+    else:
+        cache = DatabaseGenerationCache(max_entries=100, ttl_seconds=None)
+        cache.clear()
+    service, stub = stub_service(cache=cache)
+
+    first = service.generate_material("Book", CHAPTERS)
+    calls = len(stub.prompts)
+    second = service.generate_material("Book", CHAPTERS)
+
+    assert first[3] == 0
+    assert second[0] == first[0]
+    assert second[1:] == (0, 0, len(CHAPTERS))
+    assert len(stub.prompts) == calls
+
+    # bypass_cache always calls the API
+    third = service.generate_material("Book", CHAPTERS, bypass_cache=True)
+    assert third[3] == 0
+    assert len(stub.prompts) == calls + len(CHAPTERS)
+
+
+def test_cache_key_depends_on_model():
+    service, stub = stub_service(cache=MemoryGenerationCache(max_entries=100, ttl_seconds=None))
+    service.generate_chapter_content("Topic", "", [], model="gpt-4o-mini")
+    service.generate_chapter_content("Topic", "", [], model="gpt-4o")
+    assert len(stub.prompts) == 2
+
+
+def test_database_cache_evicts_beyond_max_entries():
+    cache = DatabaseGenerationCache(max_entries=2, ttl_seconds=None)
+    cache.clear()
+    for key in ("a", "b", "c"):
+        cache.set(key, f"content {key}", "gpt-4o-mini")
+    assert cache.get("a") is None
+    assert cache.get("b") == "content b"
+    assert cache.get("c") == "content c"
+    cache.clear()
+
+
+def test_memory_cache_expires_entries():
+    cache = MemoryGenerationCache(max_entries=10, ttl_seconds=0.01)
+    cache.set("key", "content", "gpt-4o-mini")
+    assert cache.get("key") == "content"
+    time.sleep(0.02)
+    assert cache.get("key") is None
+
+
+def test_generation_reports_cache_hits_and_records_zero_cost(client, auth_headers, openai_stub):
+    request = generation_request(["Firewalls", "Routing"])
+    first = client.post("/api/materials/generate", json=request, headers=auth_headers).json()
+    second = client.post("/api/materials/generate", json=request, headers=auth_headers).json()
+    forced = client.post(
+        "/api/materials/generate", json={**request, "force_regenerate": True}, headers=auth_headers
+    ).json()
+
+    assert first["cache_hits"] == 0 and first["tokens_used"] > 0
+    assert second["cache_hits"] == 2
+    assert second["tokens_used"] == 0 and second["estimated_cost"] == 0
+    assert second["generated_content"]["chapters"] == first["generated_content"]["chapters"]
+    assert forced["cache_hits"] == 0
+    assert len(openai_stub.prompts) == 4
+
+    usage = client.get("/api/tokens/usage", headers=auth_headers).json()
+    assert sorted(entry["total_tokens"] for entry in usage["recent_usage"]) == [0, first["tokens_used"], forced["tokens_used"]]
+    assert usage["total_tokens"] == first["tokens_used"] + forced["tokens_used"]
+
+
+def test_backends_must_implement_the_interface():
+    class Incomplete(GenerationCacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("backend", ["memory", "database"])
+def test_lookup_counts_are_per_instance_and_exact_across_threads(backend):
+    if backend == "memory":
+        cache = MemoryGenerationCache(max_entries=100, ttl_seconds=None)
+    else:
+        cache = DatabaseGenerationCache(max_entries=100, ttl_seconds=None)
+        cache.clear()
+    cache.set("present", "content", "gpt-4o-mini")
+
+    def look_up(i):
+        return cache.get("present" if i % 2 else "absent")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(look_up, range(200)))
+
+    assert (cache.hits, cache.misses) == (100, 100)
+    other = type(cache)(max_entries=100, ttl_seconds=None)
+    assert (other.hits, other.misses) == (0, 0)
+    cache.clear()
@@ -0,0 +1,101 @@
+import json
+
+import anyio
+
+from app.routers.materials import generate_material_stream
+from app.schemas import CurrentUser, MaterialGenerationRequest
+from tests.conftest import StubOpenAI, generation_request
+
+CHAPTER_TOKENS = StubOpenAI.prompt_tokens + StubOpenAI.completion_tokens
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def usage_and_materials(client, headers):
+    usage = client.get("/api/tokens/usage", headers=headers).json()
+    materials = client.get("/api/materials/summary", headers=headers).json()["items"]
+    return usage["total_tokens"], len(materials)
+
+
+def test_stream_sends_chapters_and_saves_the_material(client, auth_headers, openai_stub):
+    response = client.post(
+        "/api/materials/generate/stream", json=generation_request(["One", "Two"]), headers=auth_headers
+    )
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+
+    assert names[0] == "chapter_start" and names[-1] == "done"
+    assert names.count("chapter_end") == 2
+    streamed = "".join(data["content"] for name, data in events if name == "delta" and data["number"] == 1)
+    assert streamed.strip().startswith("One")
+
+    done = events[-1][1]
+    assert done["tokens_used"] == 2 * CHAPTER_TOKENS
+    chapters = client.get(f"/api/materials/{done['material_id']}/chapters", headers=auth_headers).json()
+    assert [chapter["title"] for chapter in chapters] == ["One", "Two"]
+    assert usage_and_materials(client, auth_headers) == (2 * CHAPTER_TOKENS, 1)
+
+
+def test_failed_chapter_still_records_tokens_of_finished_chapters(client, auth_headers, openai_stub):
+    openai_stub.fail_titles.add("Three")
+    response = client.post(
+        "/api/materials/generate/stream", json=generation_request(["One", "Two", "Three"]), headers=auth_headers
+    )
+    events = parse_events(response.text)
+
+    assert events[-1][0] == "error"
+    assert [data["number"] for name, data in events if name == "chapter_end"] == [1, 2]
+    # No material, but the two finished chapters were paid for
+    assert usage_and_materials(client, auth_headers) == (2 * CHAPTER_TOKENS, 0)
+
+
+def _open_stream(client, headers, titles):
+    user = CurrentUser(**client.get("/api/auth/me", headers=headers).json())
+    request = MaterialGenerationRequest(**generation_request(titles))
+
+    async def open_stream():
+        response = await generate_material_stream(request, user)
+        return response.body_iterator
+    return open_stream
+
+
+def test_disconnect_records_tokens_of_finished_chapters(client, auth_headers, openai_stub):
+    open_stream = _open_stream(client, auth_headers, ["One", "Two", "Three"])
+
+    async def disconnect_during_second_chapter():
+        body = await open_stream()
+        first_chapter_done = anyio.Event()
+
+        async def consume():
+            async for event in body:
+                if event.startswith("event: chapter_end"):
+                    first_chapter_done.set()
+
+        # Starlette cancels the response task like this when the client goes away
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(consume)
+            await first_chapter_done.wait()
+            task_group.cancel_scope.cancel()
+
+    client.portal.call(disconnect_during_second_chapter)
+    assert usage_and_materials(client, auth_headers) == (CHAPTER_TOKENS, 0)
+
+
+def test_closed_stream_records_tokens_of_finished_chapters(client, auth_headers, openai_stub):
+    open_stream = _open_stream(client, auth_headers, ["One", "Two"])
+
+    async def close_after_first_chapter():
+        body = await open_stream()
+        async for event in body:
+            if event.startswith("event: chapter_end"):
+                break
+        await body.aclose()
+
+    client.portal.call(close_after_first_chapter)
+    assert usage_and_materials(client, auth_headers) == (CHAPTER_TOKENS, 0)
@@ -0,0 +1,62 @@
+import gzip
+
+
+def test_html_export_whole_book_and_chapter(client, auth_headers, material):
+    response = client.get(
+        f"/api/materials/{material}/export/html", headers={**auth_headers, "Accept-Encoding": "identity"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert "<!DOCTYPE html>" in response.text
+    assert all(title in response.text for title in ("Networks", "Servers", "Backups"))
+
+    chapter = client.get(
+        f"/api/materials/{material}/export/html?chapter=2", headers={**auth_headers, "Accept-Encoding": "identity"}
+    )
+    assert chapter.status_code == 200
+    assert "<section" in chapter.text and "Servers" in chapter.text and "Backups" not in chapter.text
+
+    missing = client.get(f"/api/materials/{material}/export/html?chapter=9", headers=auth_headers)
+    assert missing.status_code == 404
+
+
+def test_html_export_is_precompressed_and_cacheable(client, auth_headers, material):
+    headers = {**auth_headers, "Accept-Encoding": "gzip"}
+    # Read the raw body to check the stored gzip variant
+    with client.stream("GET", f"/api/materials/{material}/export/html", headers=headers) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "<!DOCTYPE html>" in gzip.decompress(raw).decode("utf-8")
+
+    cached = client.get(
+        f"/api/materials/{material}/export/html",
+        headers={**headers, "If-None-Match": response.headers["etag"]}
+    )
+    assert cached.status_code == 304
+
+
+def test_exports_of_non_json_content_are_rejected(client, auth_headers, material):
+    response = client.put(
+        f"/api/materials/{material}", json={"generated_content": "plain text notes"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["generated_content"] == "plain text notes"
+
+    for fmt in ("html", "docx", "pdf"):
+        response = client.get(f"/api/materials/{material}/export/{fmt}", headers=auth_headers)
+        assert response.status_code == 400, fmt
+        assert "cannot be exported" in response.json()["detail"]
+
+
+def test_html_export_escapes_titles_and_content(client, auth_headers, material):
+    client.patch(
+        f"/api/materials/{material}/chapters/1",
+        json={"title": "<script>alert(1)</script>", "content": "INTRODUCTION\nUse <b> & <i> tags."},
+        headers=auth_headers
+    )
+    html = client.get(
+        f"/api/materials/{material}/export/html?chapter=1", headers={**auth_headers, "Accept-Encoding": "identity"}
+    ).text
+    assert "<script>" not in html and "&lt;script&gt;" in html
+    assert "&lt;b&gt; &amp; &lt;i&gt;" in html
@@ -0,0 +1,60 @@
+import pytest
+
+from tests.conftest import CHAPTER_CONTENT, StubOpenAI, chapter_title, stub_service
+
+TITLES = [f"Topic {i}" for i in range(1, 7)]
+CHAPTERS = [{"title": title, "description": ""} for title in TITLES]
+
+
+def previous_chapters_in(prompt: str):
+    if "Previous chapters covered:" not in prompt:
+        return []
+    block = prompt.split("Previous chapters covered:\n", 1)[1].split("\n\n", 1)[0]
+    return block.splitlines()
+
+
+def check_material(stub, result, prompt_tokens, completion_tokens):
+    assert [chapter["number"] for chapter in result["chapters"]] == list(range(1, len(TITLES) + 1))
+    assert [chapter["title"] for chapter in result["chapters"]] == TITLES
+    for chapter in result["chapters"]:
+        assert chapter["content"] == f"{chapter['title']}\n{CHAPTER_CONTENT}"
+    assert prompt_tokens == len(TITLES) * StubOpenAI.prompt_tokens
+    assert completion_tokens == len(TITLES) * StubOpenAI.completion_tokens
+    # Each chapter still sees the titles of every chapter before it
+    for prompt in stub.prompts:
+        title = chapter_title(prompt)
+        assert previous_chapters_in(prompt) == TITLES[:TITLES.index(title)]
+
+
+def test_generate_material_in_parallel_keeps_order_context_and_tokens():
+    service, stub = stub_service()
+    result, prompt_tokens, completion_tokens, cache_hits = service.generate_material(
+        "Book", CHAPTERS, concurrency=4
+    )
+    check_material(stub, result, prompt_tokens, completion_tokens)
+    assert cache_hits == 0
+    assert 1 < stub.max_in_flight <= 4
+
+
+def test_worker_pool_is_bounded_by_concurrency():
+    service, stub = stub_service(latency=0.05)
+    completed = []
+    service.generate_material(
+        "Book", CHAPTERS, concurrency=3, on_chapter_complete=lambda number, title: completed.append(number)
+    )
+    # Six chapters on three workers: the pool fills up but never overflows
+    assert stub.max_in_flight == 3
+    assert sorted(completed) == list(range(1, len(TITLES) + 1))
+
+
+def test_failing_chapter_fails_the_material():
+    service, stub = stub_service(fail_titles={"Topic 4"})
+    with pytest.raises(RuntimeError, match="Topic 4"):
+        service.generate_material("Book", CHAPTERS, concurrency=3)
+
+
+def test_concurrency_one_generates_sequentially():
+    service, stub = stub_service()
+    result, *_ = service.generate_material("Book", CHAPTERS, concurrency=1)
+    assert stub.max_in_flight == 1
+    assert [chapter_title(prompt) for prompt in stub.prompts] == TITLES
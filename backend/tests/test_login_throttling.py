@@ -0,0 +1,95 @@
+import asyncio
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import User
+from app.password_hasher import HashQueueFull, PasswordHasher, password_hasher
+from app.routers.auth import username_limiter
+
+settings = get_settings()
+
+
+def stored_hash(username: str) -> str:
+    db = SessionLocal()
+    try:
+        return db.query(User.hashed_password).filter(User.username == username).scalar()
+    finally:
+        db.close()
+
+
+def test_wrong_password_is_unauthorized(client, user):
+    username, _ = user
+    response = client.post("/api/auth/login", json={"username": username, "password": "wrong"})
+    assert response.status_code == 401
+    username_limiter.reset(username)
+
+
+def test_login_is_limited_after_repeated_failures(client, user):
+    username, _ = user
+    try:
+        for _ in range(settings.LOGIN_FAILURES_PER_USERNAME):
+            response = client.post("/api/auth/login", json={"username": username, "password": "wrong"})
+            assert response.status_code == 401
+
+        # Even the right password is refused until the window ends
+        response = client.post("/api/auth/login", json={"username": username, "password": "password"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+    finally:
+        username_limiter.reset(username)
+
+    response = client.post("/api/auth/login", json={"username": username, "password": "password"})
+    assert response.status_code == 200
+
+
+def test_successful_login_resets_the_failure_count(client, user):
+    username, _ = user
+    try:
+        for _ in range(settings.LOGIN_FAILURES_PER_USERNAME - 1):
+            client.post("/api/auth/login", json={"username": username, "password": "wrong"})
+        assert client.post("/api/auth/login", json={"username": username, "password": "password"}).status_code == 200
+        assert client.post("/api/auth/login", json={"username": username, "password": "wrong"}).status_code == 401
+        assert username_limiter.retry_after(username) is None
+    finally:
+        username_limiter.reset(username)
+
+
+def test_login_upgrades_hashes_made_with_other_rounds(client, user, monkeypatch):
+    username, _ = user
+    assert stored_hash(username).startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+
+    monkeypatch.setattr(password_hasher, "rounds", settings.BCRYPT_ROUNDS + 1)
+    response = client.post("/api/auth/login", json={"username": username, "password": "password"})
+    assert response.status_code == 200
+    upgraded = stored_hash(username)
+    assert upgraded.startswith(f"$2b${settings.BCRYPT_ROUNDS + 1:02d}$")
+
+    # The upgraded hash still verifies, and isn't upgraded again
+    response = client.post("/api/auth/login", json={"username": username, "password": "password"})
+    assert response.status_code == 200
+    assert stored_hash(username) == upgraded
+
+
+def test_full_hash_queue_returns_503(client, user, monkeypatch):
+    username, _ = user
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+    response = client.post("/api/auth/login", json={"username": username, "password": "password"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    # Not counted as a failed attempt
+    assert username_limiter.retry_after(username) is None
+
+
+def test_hasher_bounds_pending_hashes():
+    hasher = PasswordHasher(workers=1, max_pending=1, rounds=10)
+
+    async def hash_twice():
+        return await asyncio.gather(hasher.hash("a"), hasher.hash("b"), return_exceptions=True)
+
+    try:
+        first, second = asyncio.run(hash_twice())
+    finally:
+        hasher.shutdown()
+    assert first.startswith("$2b$10$")
+    assert isinstance(second, HashQueueFull)
+    assert hasher.pending == 0
@@ -0,0 +1,26 @@
+from tests.conftest import generation_request
+
+
+def test_material_summaries_page_through_every_material(client, auth_headers, openai_stub):
+    ids = []
+    for number in range(5):
+        response = client.post(
+            "/api/materials/generate", json=generation_request(["One"], title=f"Book {number}"), headers=auth_headers
+        )
+        ids.append(response.json()["material_id"])
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/materials/summary", params=params, headers=auth_headers).json()
+        assert len(page["items"]) <= 2
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [item["id"] for item in seen] == list(reversed(ids))
+    assert all(item["chapter_count"] == 1 for item in seen)
+
+    response = client.get("/api/materials/summary?cursor=not-a-cursor", headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,49 @@
+import pytest
+
+from app.config import get_settings
+from app.metrics import Metric
+
+settings = get_settings()
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    return {"Authorization": "Bearer secret"}
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/health/db"])
+def test_not_served_without_a_token_configured(client, monkeypatch, path):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get(path).status_code == 404
+    assert client.get(path, headers={"Authorization": "Bearer "}).status_code == 404
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/health/db"])
+def test_served_with_the_token(client, metrics_token, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get(path, headers=metrics_token).status_code == 200
+
+
+def test_metrics_count_requests_by_route(client, metrics_token):
+    client.get("/health")
+    text = client.get("/metrics", headers=metrics_token).text
+    assert "# TYPE http_requests_total counter" in text
+    assert 'method="GET"' in text and 'route="/health"' in text
+
+
+def test_unknown_methods_share_one_label(client, metrics_token):
+    for verb in ("FOO", "BAR"):
+        client.request(verb, "/health")
+    text = client.get("/metrics", headers=metrics_token).text
+    assert 'method="FOO"' not in text and 'method="BAR"' not in text
+    assert 'method="other"' in text
+
+
+def test_metric_subclasses_must_provide_samples():
+    class Incomplete(Metric):
+        kind = "gauge"
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "Missing samples().")
@@ -0,0 +1,48 @@
+import time
+
+from app import rate_limit
+from app.rate_limit import RateLimiter
+
+
+def test_allows_limit_hits_per_window():
+    limiter = RateLimiter(limit=3, window_seconds=60)
+    assert [limiter.hit("key") for _ in range(3)] == [None, None, None]
+    retry_after = limiter.hit("key")
+    assert retry_after is not None and 0 < retry_after <= 60
+    assert limiter.retry_after("key") is not None
+    # Other keys have their own window
+    assert limiter.hit("other") is None
+
+
+def test_retry_after_does_not_count_a_hit():
+    limiter = RateLimiter(limit=1, window_seconds=60)
+    for _ in range(5):
+        assert limiter.retry_after("key") is None
+    assert limiter.hit("key") is None
+    assert limiter.hit("key") is not None
+
+
+def test_window_expires():
+    limiter = RateLimiter(limit=1, window_seconds=0.05)
+    assert limiter.hit("key") is None
+    assert limiter.hit("key") is not None
+    time.sleep(0.06)
+    assert limiter.retry_after("key") is None
+    assert limiter.hit("key") is None
+
+
+def test_reset_clears_a_key():
+    limiter = RateLimiter(limit=1, window_seconds=60)
+    limiter.hit("key")
+    limiter.reset("key")
+    assert limiter.hit("key") is None
+
+
+def test_expired_windows_are_swept(monkeypatch):
+    monkeypatch.setattr(rate_limit, "SWEEP_THRESHOLD", 3)
+    limiter = RateLimiter(limit=1, window_seconds=0.01)
+    for key in range(3):
+        limiter.hit(key)
+    time.sleep(0.02)
+    limiter.hit("new")
+    assert list(limiter._windows) == ["new"]
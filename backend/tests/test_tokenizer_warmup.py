@@ -0,0 +1,35 @@
+import threading
+import time
+
+from app import llm_service as llm_module
+from app.llm_service import LLMService, llm_service
+from app.main import warm_tokenizers
+
+
+def test_startup_does_not_wait_for_tokenizers(monkeypatch):
+    release = threading.Event()
+    finished = threading.Event()
+
+    def slow_download(models=None):
+        release.wait(5)
+        finished.set()
+
+    monkeypatch.setattr(llm_service, "warm_encodings", slow_download)
+    start = time.perf_counter()
+    warm_tokenizers()
+    assert time.perf_counter() - start < 1
+    assert not finished.is_set()
+
+    release.set()
+    assert finished.wait(5)
+
+
+def test_warm_encodings_logs_and_swallows_download_errors(monkeypatch, capsys):
+    def offline(name):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(llm_module.tiktoken, "encoding_for_model", offline)
+    service = LLMService()
+    service.warm_encodings(["gpt-4o-mini"])
+    assert "Could not load tiktoken encoding for gpt-4o-mini" in capsys.readouterr().out
+    assert "gpt-4o-mini" not in service._encodings
@@ -0,0 +1,107 @@
+import uuid
+from datetime import date, datetime
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import TokenUsage, User, UserUsageRollup
+from app.usage_rollups import backfill_rollups, needs_backfill, record_token_usage, summarize_usage
+from tests.conftest import generation_request
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user_id(db):
+    username = f"usage-{uuid.uuid4().hex[:12]}"
+    user = User(email=f"{username}@example.com", username=username, hashed_password="-")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def rollups(db, user_id):
+    return {
+        (rollup.model_used, rollup.bucket_date): (rollup.total_tokens, rollup.request_count, rollup.estimated_cost)
+        for rollup in db.query(UserUsageRollup).filter(UserUsageRollup.user_id == user_id)
+    }
+
+
+def test_record_token_usage_upserts_daily_buckets(db, user_id):
+    record_token_usage(db, user_id, "gpt-4o-mini", 100, 50, 0.5, timestamp=datetime(2024, 3, 4, 9))
+    record_token_usage(db, user_id, "gpt-4o-mini", 10, 5, 0.25, timestamp=datetime(2024, 3, 4, 18))
+    record_token_usage(db, user_id, "gpt-4o", 1, 1, 1.0, timestamp=datetime(2024, 3, 4, 12))
+    record_token_usage(db, user_id, "gpt-4o-mini", 1, 1, 0.0, timestamp=datetime(2024, 3, 5, 0))
+    db.commit()
+
+    assert rollups(db, user_id) == {
+        ("gpt-4o-mini", date(2024, 3, 4)): (165, 2, 0.75),
+        ("gpt-4o", date(2024, 3, 4)): (2, 1, 1.0),
+        ("gpt-4o-mini", date(2024, 3, 5)): (2, 1, 0.0),
+    }
+    assert db.query(TokenUsage).filter(TokenUsage.user_id == user_id).count() == 4
+
+
+def test_backfill_rebuilds_the_same_rollups(db, user_id):
+    for day in (1, 1, 2, 9):
+        record_token_usage(db, user_id, "gpt-4o-mini", 100, 50, 0.5, timestamp=datetime(2024, 4, day, 10))
+    db.commit()
+    recorded = rollups(db, user_id)
+
+    assert backfill_rollups(db) >= 3
+    assert rollups(db, user_id) == recorded
+
+
+def test_summarize_usage_groups_by_granularity(db, user_id):
+    # Monday 2024-04-01 and Wednesday 2024-04-03 share a week; 2024-04-08 starts the next
+    for day in (1, 3, 8):
+        record_token_usage(db, user_id, "gpt-4o-mini", 100, 50, 0.5, timestamp=datetime(2024, 4, day, 10))
+    record_token_usage(db, user_id, "gpt-4o", 10, 10, 2.0, timestamp=datetime(2024, 5, 2, 10))
+    db.commit()
+
+    summary = summarize_usage(db, user_id, granularity="week")
+    assert summary["total_tokens"] == 3 * 150 + 20
+    assert summary["total_cost"] == pytest.approx(3.5)
+    assert summary["usage_by_model"]["gpt-4o-mini"]["request_count"] == 3
+    assert [(entry["period_start"], entry["total_tokens"]) for entry in summary["timeline"]] == [
+        (date(2024, 4, 1), 300), (date(2024, 4, 8), 150), (date(2024, 4, 29), 20)
+    ]
+
+    monthly = summarize_usage(db, user_id, granularity="month")
+    assert [entry["period_start"] for entry in monthly["timeline"]] == [date(2024, 4, 1), date(2024, 5, 1)]
+
+    april = summarize_usage(db, user_id, start_date=date(2024, 4, 2), end_date=date(2024, 4, 30))
+    assert april["total_tokens"] == 300
+
+
+def test_usage_endpoint_reports_generation_tokens(client, auth_headers, openai_stub):
+    response = client.post(
+        "/api/materials/generate", json=generation_request(["One", "Two"]), headers=auth_headers
+    )
+    tokens_used = response.json()["tokens_used"]
+
+    usage = client.get("/api/tokens/usage?granularity=month", headers=auth_headers).json()
+    assert usage["granularity"] == "month"
+    assert usage["total_tokens"] == tokens_used
+    assert [entry["total_tokens"] for entry in usage["timeline"]] == [tokens_used]
+    assert len(usage["recent_usage"]) == 1
+
+    assert client.get("/api/tokens/usage?granularity=year", headers=auth_headers).status_code == 422
+
+
+def test_needs_backfill_only_when_usage_has_no_rollups(db, user_id):
+    record_token_usage(db, user_id, "gpt-4o-mini", 100, 50, 0.5)
+    db.commit()
+    assert not needs_backfill(db)
+    try:
+        db.query(UserUsageRollup).delete()
+        assert needs_backfill(db)
+    finally:
+        db.rollback()
@@ -1,3 +1,4 @@
+import { useEffect } from 'react'
 import { useEditor, EditorContent } from '@tiptap/react'
 import StarterKit from '@tiptap/starter-kit'
 import Underline from '@tiptap/extension-underline'
@@ -37,6 +38,13 @@ export default function RichTextEditor({ content, onChange, materialId }: RichTe
     },
   })
 
+  // Pick up content set from outside, e.g. chapters arriving while a material loads
+  useEffect(() => {
+    if (editor && content !== editor.getHTML()) {
+      editor.commands.setContent(content, false)
+    }
+  }, [editor, content])
+
   if (!editor) {
     return null
   }
@@ -7,6 +7,7 @@ import './Dashboard.css'
 interface Material {
   id: number
   title: string
+  chapter_count: number
   created_at: string
   updated_at: string
 }
@@ -21,8 +22,17 @@ export default function Dashboard() {
 
   const fetchMaterials = async () => {
     try {
-      const response = await api.get('/materials/')
-      setMaterials(response.data)
+      // Summaries only: the full content is fetched when a material is opened
+      const items: Material[] = []
+      let cursor: string | null = null
+      do {
+        const response = await api.get('/materials/summary', {
+          params: cursor ? { cursor } : {}
+        })
+        items.push(...response.data.items)
+        cursor = response.data.next_cursor
+      } while (cursor)
+      setMaterials(items)
     } catch (error) {
       console.error('Failed to fetch materials:', error)
     } finally {
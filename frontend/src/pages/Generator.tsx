@@ -10,6 +10,17 @@ interface Chapter {
   description: string
 }
 
+// Chapter HTML requests in flight at once while a book loads into the editor
+const CHAPTER_FETCH_CONCURRENCY = 4
+
+const escapeHtml = (text: string) =>
+  text
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;')
+    .replace(/'/g, '&#39;')
+
 export default function Generator() {
   const [searchParams] = useSearchParams()
   const urlMaterialId = searchParams.get('id')
@@ -69,17 +80,56 @@ export default function Generator() {
       setChapters(toc)
       
       if (response.data.generated_content) {
-        const content = JSON.parse(response.data.generated_content)
+        const content = response.data.generated_content
         setGeneratedContent(content)
-        setEditorContent(formatContentForEditor(content))
+        if (content.chapters) {
+          await loadChapterHtml(id, content.title)
+        } else {
+          setEditorContent(formatContentForEditor(content))
+        }
       }
     } catch (error) {
       console.error('Failed to load material:', error)
     }
   }
 
+  // Chapters are rendered to HTML by the server (escaped there) and fetched a
+  // few at a time. Each is added to the editor as soon as every chapter before
+  // it has arrived, so large books show their first chapters right away
+  const loadChapterHtml = async (id: string, bookTitle: string) => {
+    const response = await api.get(`/materials/${id}/chapters`)
+    const numbers: number[] = response.data.map((chapter: any) => chapter.number)
+    const fragments: (string | undefined)[] = new Array(numbers.length)
+    let html = `<h1>${escapeHtml(bookTitle)}</h1>`
+    let shown = 0
+    let next = 0
+    setEditorContent(html)
+    
+    const fetchChapters = async () => {
+      while (next < numbers.length) {
+        const index = next++
+        const chapterResponse = await api.get(`/materials/${id}/export/html`, {
+          params: { chapter: numbers[index] },
+          responseType: 'text'
+        })
+        fragments[index] = chapterResponse.data
+        
+        if (index === shown) {
+          while (shown < numbers.length && fragments[shown] !== undefined) {
+            html += fragments[shown]
+            shown++
+          }
+          setEditorContent(html)
+        }
+      }
+    }
+    
+    const workers = Math.min(CHAPTER_FETCH_CONCURRENCY, numbers.length)
+    await Promise.all(Array.from({ length: workers }, fetchChapters))
+  }
+
   const formatContentForEditor = (content: any) => {
-    let html = `<h1>${content.title}</h1>`
+    let html = `<h1>${escapeHtml(content.title)}</h1>`
     
     content.chapters?.forEach((chapter: any) => {
       html += `<h2>Chapter ${chapter.number}: ${chapter.title}</h2>`
@@ -152,7 +202,8 @@ export default function Generator() {
       // Capture the material ID from the response
       setMaterialId(response.data.material_id.toString())
       setGeneratedContent(response.data.generated_content)
-      setEditorContent(formatContentForEditor(response.data.generated_content))
+      loadChapterHtml(response.data.material_id.toString(), response.data.generated_content.title)
+        .catch((error) => console.error('Failed to load chapters:', error))
       setTokensUsed(response.data.tokens_used)
       setEstimatedCost(response.data.estimated_cost)
     } catch (error: any) {